@@ -1,15 +1,24 @@
+import os
+
 from dotenv import load_dotenv
 from flask import Flask, jsonify, make_response, Response, request
 # from flask_cors import CORS
 
-from meal_max.models import kitchen_model
+from meal_max.models import battle_analytics, kitchen_model
 from meal_max.models.battle_model import BattleModel
-from meal_max.utils.sql_utils import check_database_connection, check_table_exists
+from meal_max.utils.sql_utils import check_database_connection, check_table_exists, run_migrations, use_memory_database
 
 
 # Load environment variables from .env file
 load_dotenv()
 
+# DB_BACKEND=memory runs on a throwaway in-memory database, e.g. for simulations.
+# Otherwise CREATE_DB=true applies any pending schema migrations, keeping existing data.
+if os.getenv("DB_BACKEND") == "memory":
+    use_memory_database()
+elif os.getenv("CREATE_DB") == "true":
+    run_migrations()
+
 app = Flask(__name__)
 # This bypasses standard security stuff we'll talk about later
 # If you get errors that use words like cross origin or flight,
@@ -206,6 +215,53 @@ def battle() -> Response:
         app.logger.error(f"Battle error: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
+@app.route('/api/battles/batch', methods=['POST'])
+def battle_batch() -> Response:
+    """
+    Route to run many battles between explicit pairs of meals in one request.
+
+    Expected JSON Input:
+        - pairs (list): A list of [meal_a, meal_b] pairs of meal names, at most 10000.
+
+    Returns:
+        JSON response with the winner of each pair, in the same order as the input.
+    Raises:
+        400 error if the body is not JSON, the pairs are missing or malformed, a pair names the
+            same meal twice, or a meal does not exist or has been deleted.
+        500 error if there is an issue during the battles.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return make_response(jsonify({'error': 'Request body must be a JSON object with pairs'}), 400)
+        pairs = data.get('pairs')
+
+        if not isinstance(pairs, list) or not pairs or len(pairs) > 10000:
+            return make_response(jsonify({'error': 'pairs must be a list of between 1 and 10000 meal pairs'}), 400)
+        for index, pair in enumerate(pairs):
+            if not isinstance(pair, list) or len(pair) != 2 or not all(isinstance(meal, str) and meal for meal in pair):
+                return make_response(jsonify({'error': f'Pair {index} must be a list of two meal names, got {pair!r}'}), 400)
+            if pair[0] == pair[1]:
+                return make_response(jsonify({'error': f"Pair {index}: meal '{pair[0]}' cannot battle itself"}), 400)
+
+        app.logger.info('Running a batch of %d battles', len(pairs))
+
+        try:
+            meals = kitchen_model.get_meals_by_names([meal for pair in pairs for meal in pair])
+        except ValueError as e:
+            app.logger.error(f"Invalid meal in batch battle: {e}")
+            return make_response(jsonify({'error': str(e)}), 400)
+        winners = battle_model.battle_batch([(meals[meal_a], meals[meal_b]) for meal_a, meal_b in pairs])
+
+        results = [
+            {'meal_a': meal_a, 'meal_b': meal_b, 'winner': winner}
+            for (meal_a, meal_b), winner in zip(pairs, winners)
+        ]
+        return make_response(jsonify({'status': 'battles complete', 'results': results}), 200)
+    except Exception as e:
+        app.logger.error(f"Batch battle error: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 @app.route('/api/clear-combatants', methods=['POST'])
 def clear_combatants() -> Response:
     """
@@ -307,6 +363,136 @@ def get_leaderboard() -> Response:
         app.logger.error(f"Error generating leaderboard: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
+@app.route('/api/grouped-leaderboard', methods=['GET'])
+def get_grouped_leaderboard() -> Response:
+    """
+    Route to get the top meals within each cuisine or difficulty level.
+
+    Query Parameters:
+        - group_by (str): The field to group by ('cuisine' or 'difficulty'). Default is 'cuisine'.
+        - sort (str): The field to sort by ('wins' or 'win_pct'). Default is 'wins'.
+        - top_n (int): The number of meals to return per group. Default is 10.
+
+    Returns:
+        JSON response with a leaderboard for each group.
+    Raises:
+        400 error if top_n is not an integer.
+        500 error if there is an issue generating the leaderboard.
+    """
+    try:
+        group_by = request.args.get('group_by', 'cuisine')
+        sort_by = request.args.get('sort', 'wins')
+        try:
+            top_n = int(request.args.get('top_n', 10))
+        except ValueError:
+            return make_response(jsonify({'error': 'top_n must be an integer'}), 400)
+
+        app.logger.info("Generating leaderboard grouped by %s sorted by %s (top %d)", group_by, sort_by, top_n)
+
+        leaderboard_data = kitchen_model.get_grouped_leaderboard(group_by, sort_by, top_n)
+
+        return make_response(jsonify({'status': 'success', 'leaderboard': leaderboard_data}), 200)
+    except Exception as e:
+        app.logger.error(f"Error generating grouped leaderboard: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+############################################################
+#
+# Battle History
+#
+############################################################
+
+
+@app.route('/api/head-to-head', methods=['GET'])
+def get_head_to_head() -> Response:
+    """
+    Route to get how many times each meal has beaten each other meal.
+
+    Query Parameters:
+        - meal_ids (str, optional): Comma-separated IDs of the meals to include. Default is every meal that has battled.
+
+    Returns:
+        JSON response with the meal IDs and the head-to-head win matrix.
+    Raises:
+        400 error if meal_ids is not a list of integers.
+        500 error if there is an issue reading the battle history.
+    """
+    try:
+        meal_ids = request.args.get('meal_ids')
+        if meal_ids is not None:
+            try:
+                meal_ids = [int(meal_id) for meal_id in meal_ids.split(',')]
+            except ValueError:
+                return make_response(jsonify({'error': 'meal_ids must be a comma-separated list of integers'}), 400)
+
+        app.logger.info("Computing head-to-head matrix for meals: %s", meal_ids)
+        head_to_head = battle_analytics.get_head_to_head_matrix(meal_ids)
+
+        return make_response(jsonify({'status': 'success', 'head_to_head': head_to_head}), 200)
+    except Exception as e:
+        app.logger.error(f"Error computing head-to-head matrix: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/meal-streaks/<int:meal_id>', methods=['GET'])
+def get_meal_streaks(meal_id: int) -> Response:
+    """
+    Route to get the current and longest win and loss streaks of a meal.
+
+    Path Parameter:
+        - meal_id (int): The ID of the meal.
+
+    Returns:
+        JSON response with the meal's streaks or error message.
+    """
+    try:
+        app.logger.info(f"Computing streaks for meal ID: {meal_id}")
+        streaks = battle_analytics.get_streaks(meal_id)
+        return make_response(jsonify({'status': 'success', 'streaks': streaks}), 200)
+    except Exception as e:
+        app.logger.error(f"Error computing meal streaks: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/win-rate-over-time/<int:meal_id>', methods=['GET'])
+def get_win_rate_over_time(meal_id: int) -> Response:
+    """
+    Route to get a meal's win rate per time period.
+
+    Path Parameter:
+        - meal_id (int): The ID of the meal.
+
+    Query Parameters:
+        - period_seconds (int): The length of each period in seconds. Default is 86400 (one day).
+
+    Returns:
+        JSON response with the meal's win rate per period or error message.
+    Raises:
+        400 error if period_seconds is not a positive integer.
+        404 error if the meal does not exist or has been deleted.
+        500 error if there is an issue computing the win rate.
+    """
+    try:
+        try:
+            period_seconds = int(request.args.get('period_seconds', 86400))
+        except ValueError:
+            return make_response(jsonify({'error': 'period_seconds must be an integer'}), 400)
+
+        try:
+            kitchen_model.get_meal_by_id(meal_id)
+        except ValueError as e:
+            app.logger.error(f"Meal for win rate over time not found: {e}")
+            return make_response(jsonify({'error': str(e)}), 404)
+
+        app.logger.info(f"Computing win rate over time for meal ID: {meal_id}")
+        win_rate = battle_analytics.get_win_rate_over_time(meal_id, period_seconds)
+        return make_response(jsonify({'status': 'success', 'win_rate': win_rate}), 200)
+    except ValueError as e:
+        app.logger.error(f"Invalid request for win rate over time: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error computing win rate over time: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 
 
 if __name__ == '__main__':
@@ -5,12 +5,12 @@ if [ -f .env ]; then
     export $(cat .env | xargs)
 fi
 
-# Check if CREATE_DB is true, and run the database creation script if so
+# With CREATE_DB=true, app.py applies any pending schema migrations from sql/migrations
+# at startup. Existing tables and data are kept, so restarts are non-destructive.
 if [ "$CREATE_DB" = "true" ]; then
-    echo "Creating the database..."
-    /app/sql/create_db.sh
+    echo "Migrating the database at $DB_PATH..."
 else
-    echo "Skipping database creation."
+    echo "Skipping database migrations."
 fi
 
 # Start the Python application
@@ -0,0 +1,153 @@
+import logging
+import sqlite3
+from typing import Any, Optional
+
+import numpy as np
+
+from meal_max.utils.sql_utils import get_db_connection
+from meal_max.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+def _fetch_battle_columns(meal_id: Optional[int] = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Fetches the battle history in one query and splits it into NumPy columns.
+
+    Args:
+        meal_id (Optional[int]): If given, only the battles this meal took part in are fetched.
+
+    Returns:
+        The winner IDs, loser IDs and battle timestamps as int64 arrays, in the order the battles were fought.
+    """
+
+    query = "SELECT winner_id, loser_id, fought_at FROM battles"
+    params: tuple = ()
+    if meal_id is not None:
+        query += " WHERE winner_id = ? OR loser_id = ?"
+        params = (meal_id, meal_id)
+    query += " ORDER BY fought_at, id"
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+
+        columns = np.array(rows, dtype=np.int64).reshape(-1, 3)
+        logger.info("Fetched %d battles from the battle history", len(columns))
+        return columns[:, 0], columns[:, 1], columns[:, 2]
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+
+def get_head_to_head_matrix(meal_ids: Optional[list[int]] = None) -> dict[str, Any]:
+    """ Counts how many times each meal has beaten each other meal.
+
+    Args:
+        meal_ids (Optional[list[int]]): The meals to include. Defaults to every meal that has battled.
+
+    Returns:
+        A dictionary with the sorted meal IDs and a matrix where wins[i][j] is the number of times
+        meal_ids[i] beat meal_ids[j].
+    """
+
+    winners, losers, _ = _fetch_battle_columns()
+
+    if meal_ids is None:
+        ids = np.union1d(winners, losers)
+    else:
+        ids = np.unique(np.asarray(meal_ids, dtype=np.int64))
+        in_scope = np.isin(winners, ids) & np.isin(losers, ids)
+        winners, losers = winners[in_scope], losers[in_scope]
+
+    # Encode every (winner, loser) pair as one flat cell index and count them in a single pass
+    size = len(ids)
+    cells = np.searchsorted(ids, winners) * size + np.searchsorted(ids, losers)
+    matrix = np.bincount(cells, minlength=size * size).reshape(size, size)
+
+    logger.info("Head-to-head matrix computed for %d meals", size)
+    return {'meal_ids': ids.tolist(), 'wins': matrix.tolist()}
+
+
+def get_streaks(meal_id: int) -> dict[str, Any]:
+    """ Gets the current and longest win and loss streaks of a meal.
+
+    Args:
+        meal_id (int): The ID of the meal.
+
+    Returns:
+        A dictionary with the number of battles, the current streak and its type ('win', 'loss' or None),
+        and the longest win and loss streaks.
+    """
+
+    winners, _, _ = _fetch_battle_columns(meal_id)
+    won = (winners == meal_id).astype(np.int8)
+
+    current_streak = 0
+    current_streak_type = None
+    if len(won):
+        last_result = won[-1]
+        changes = np.flatnonzero(won != last_result)
+        current_streak = len(won) - (changes[-1] + 1 if len(changes) else 0)
+        current_streak_type = 'win' if last_result else 'loss'
+
+    return {
+        'meal_id': meal_id,
+        'battles': len(won),
+        'current_streak': int(current_streak),
+        'current_streak_type': current_streak_type,
+        'longest_win_streak': _longest_run(won),
+        'longest_loss_streak': _longest_run(1 - won)
+    }
+
+
+def get_win_rate_over_time(meal_id: int, period_seconds: int = 86400) -> list[dict[str, Any]]:
+    """ Gets a meal's battles, wins and win percentage per time period.
+
+    Args:
+        meal_id (int): The ID of the meal.
+        period_seconds (int): The length of each period in seconds. Default is one day.
+
+    Returns:
+        A list with one dictionary per period the meal battled in, oldest first, including the
+        cumulative win percentage up to the end of that period.
+
+    Raises:
+        ValueError: If period_seconds is not a positive integer.
+    """
+
+    if not isinstance(period_seconds, int) or period_seconds <= 0:
+        logger.error("Invalid period_seconds parameter: %s", period_seconds)
+        raise ValueError("Invalid period_seconds parameter: %s. Must be a positive integer." % period_seconds)
+
+    winners, _, fought_at = _fetch_battle_columns(meal_id)
+    won = (winners == meal_id).astype(np.int64)
+
+    periods, period_index = np.unique(fought_at // period_seconds, return_inverse=True)
+    battles = np.bincount(period_index, minlength=len(periods))
+    wins = np.bincount(period_index, weights=won, minlength=len(periods)).astype(np.int64)
+    cumulative_battles = np.cumsum(battles)
+    cumulative_wins = np.cumsum(wins)
+
+    return [
+        {
+            'period_start': int(periods[i] * period_seconds),
+            'battles': int(battles[i]),
+            'wins': int(wins[i]),
+            'win_pct': round(float(wins[i] * 100 / battles[i]), 1),
+            'cumulative_win_pct': round(float(cumulative_wins[i] * 100 / cumulative_battles[i]), 1)
+        }
+        for i in range(len(periods))
+    ]
+
+
+def _longest_run(flags: np.ndarray) -> int:
+    """ Gets the length of the longest run of ones in a 0/1 array."""
+    if not flags.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], flags, [0])))
+    return int((np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)).max())
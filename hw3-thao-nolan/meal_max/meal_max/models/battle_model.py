@@ -1,9 +1,9 @@
 import logging
-from typing import List
+from typing import List, Tuple
 
-from meal_max.models.kitchen_model import Meal, update_meal_stats
+from meal_max.models.kitchen_model import Meal, record_battle, record_battles
 from meal_max.utils.logger import configure_logger
-from meal_max.utils.random_utils import get_random
+from meal_max.utils.random_utils import get_random, get_random_batch
 
 
 logger = logging.getLogger(__name__)
@@ -47,46 +47,89 @@ class BattleModel:
         # Log the start of the battle
         logger.info("Battle started between %s and %s", combatant_1.meal, combatant_2.meal)
 
-        # Get battle scores for both combatants
-        score_1 = self.get_battle_score(combatant_1)
-        score_2 = self.get_battle_score(combatant_2)
-
-        # Log the scores for both combatants
-        logger.info("Score for %s: %.3f", combatant_1.meal, score_1)
-        logger.info("Score for %s: %.3f", combatant_2.meal, score_2)
-
-        # Compute the delta and normalize between 0 and 1
-        delta = abs(score_1 - score_2) / 100
-
-        # Log the delta and normalized delta
-        logger.info("Delta between scores: %.3f", delta)
-
         # Get random number from random.org
         random_number = get_random()
 
         # Log the random number
         logger.info("Random number from random.org: %.3f", random_number)
 
-        # Determine the winner based on the normalized delta
-        if delta > random_number:
-            winner = combatant_1
-            loser = combatant_2
-        else:
-            winner = combatant_2
-            loser = combatant_1
+        winner, loser = self._resolve_battle(combatant_1, combatant_2, random_number)
 
         # Log the winner
         logger.info("The winner is: %s", winner.meal)
 
-        # Update stats for both combatants
-        update_meal_stats(winner.id, 'win')
-        update_meal_stats(loser.id, 'loss')
+        # Update stats for both combatants and log the battle in one transaction
+        record_battle(winner.id, loser.id)
 
         # Remove the losing combatant from combatants
         self.combatants.remove(loser)
 
         return winner.meal
 
+    def battle_batch(self, pairs: List[Tuple[Meal, Meal]]) -> List[str]:
+        """Conducts many battles between explicit pairs of meals in one go.
+
+        The randomness for every battle is fetched in a single random.org request and all
+        results are committed in a single transaction. The combatants list is not touched.
+
+        Args:
+            pairs (List[Tuple[Meal, Meal]]): The two meals fighting in each battle, in order.
+
+        Raises:
+            ValueError: If there are no pairs or a meal is paired with itself.
+
+        Returns:
+            List[str]: The name of the winning meal of each battle, in the same order as the pairs.
+        """
+        logger.info("Starting a batch of %d battles", len(pairs))
+
+        if not pairs:
+            logger.error("No battles given in the batch.")
+            raise ValueError("At least one pair of meals is required for a batch of battles.")
+
+        for combatant_1, combatant_2 in pairs:
+            if combatant_1.id == combatant_2.id:
+                logger.error("Meal '%s' cannot battle itself", combatant_1.meal)
+                raise ValueError(f"Meal '{combatant_1.meal}' cannot battle itself.")
+
+        random_numbers = get_random_batch(len(pairs))
+
+        results = [
+            self._resolve_battle(combatant_1, combatant_2, random_number)
+            for (combatant_1, combatant_2), random_number in zip(pairs, random_numbers)
+        ]
+
+        record_battles([(winner.id, loser.id) for winner, loser in results])
+
+        logger.info("Finished a batch of %d battles", len(results))
+        return [winner.meal for winner, _ in results]
+
+    def _resolve_battle(self, combatant_1: Meal, combatant_2: Meal, random_number: float) -> Tuple[Meal, Meal]:
+        """Determines the winner of a battle from the combatants' scores and a random number.
+
+        Args:
+            combatant_1 (Meal): The first combatant.
+            combatant_2 (Meal): The second combatant.
+            random_number (float): A random number between 0 and 1.
+
+        Returns:
+            Tuple[Meal, Meal]: The winner and the loser.
+        """
+        # Get battle scores for both combatants
+        score_1 = self.get_battle_score(combatant_1)
+        score_2 = self.get_battle_score(combatant_2)
+
+        # Compute the delta and normalize between 0 and 1
+        delta = abs(score_1 - score_2) / 100
+
+        # Log the delta and normalized delta
+        logger.info("Delta between scores: %.3f", delta)
+
+        # Determine the winner based on the normalized delta
+        if delta > random_number:
+            return combatant_1, combatant_2
+        return combatant_2, combatant_1
+
     def clear_combatants(self):
         """
         Clear out the combatants list.
@@ -1,6 +1,9 @@
+from collections import Counter
 from dataclasses import dataclass
 import logging
 import sqlite3
+import threading
+import time
 from typing import Any
 
 from meal_max.utils.sql_utils import get_db_connection
@@ -11,6 +14,14 @@ logger = logging.getLogger(__name__)
 configure_logger(logger)
 
 
+# Grouped leaderboards keyed by (group_by, sort_by, top_n); cleared whenever meal stats change
+_grouped_leaderboard_cache: dict[tuple, dict[str, list[dict[str, Any]]]] = {}
+
+# Bumped by every clear, so a leaderboard read before a stats update is never cached after it
+_grouped_leaderboard_generation = 0
+_grouped_leaderboard_lock = threading.Lock()
+
+
 @dataclass
 class Meal:
     """Class meal represents a meal with the relevant attributes of the meal.
@@ -104,6 +115,7 @@ def delete_meal(meal_id: int) -> None:
 
             cursor.execute("UPDATE meals SET deleted = TRUE WHERE id = ?", (meal_id,))
             conn.commit()
+            clear_leaderboard_cache()
 
             logger.info("Meal with ID %s marked as deleted.", meal_id)
 
@@ -164,6 +176,104 @@ def get_leaderboard(sort_by: str="wins") -> dict[str, Any]:
         logger.error("Database error: %s", str(e))
         raise e
 
+def get_grouped_leaderboard(group_by: str = "cuisine", sort_by: str = "wins", top_n: int = 10) -> dict[str, list[dict[str, Any]]]:
+    """ Gets the top meals within each cuisine or difficulty level.
+
+    The ranking is done in a single query with ROW_NUMBER() OVER (PARTITION BY ...), and the
+    result is cached until the next stats update or deletion.
+
+    Args:
+        group_by (str): The column to group the meals by, either cuisine or difficulty.
+        sort_by (str): Organizes the field to sort the data based on wins or win percentage.
+        top_n (int): The number of meals to keep in each group.
+
+    Returns:
+        A dictionary mapping each group to its list of ranked meal dictionaries.
+
+    Raises:
+        ValueError: There is an invalid group_by, sort_by or top_n.
+    """
+
+    if group_by not in ("cuisine", "difficulty"):
+        logger.error("Invalid group_by parameter: %s", group_by)
+        raise ValueError("Invalid group_by parameter: %s" % group_by)
+
+    if sort_by == "win_pct":
+        order_by = "wins * 1.0 / battles DESC, id"
+    elif sort_by == "wins":
+        order_by = "wins DESC, id"
+    else:
+        logger.error("Invalid sort_by parameter: %s", sort_by)
+        raise ValueError("Invalid sort_by parameter: %s" % sort_by)
+
+    if not isinstance(top_n, int) or top_n <= 0:
+        logger.error("Invalid top_n parameter: %s", top_n)
+        raise ValueError("Invalid top_n parameter: %s. Must be a positive integer." % top_n)
+
+    cache_key = (group_by, sort_by, top_n)
+    with _grouped_leaderboard_lock:
+        cached = _grouped_leaderboard_cache.get(cache_key)
+        generation = _grouped_leaderboard_generation
+    if cached is not None:
+        logger.info("Grouped leaderboard by %s served from cache", group_by)
+        return _copy_grouped_leaderboard(cached)
+
+    # group_by and order_by are whitelisted above, so formatting them into the query is safe
+    query = f"""
+        SELECT id, meal, cuisine, price, difficulty, battles, wins, win_pct, rank
+        FROM (
+            SELECT id, meal, cuisine, price, difficulty, battles, wins,
+                   (wins * 1.0 / battles) AS win_pct,
+                   ROW_NUMBER() OVER (PARTITION BY {group_by} ORDER BY {order_by}) AS rank
+            FROM meals WHERE deleted = false AND battles > 0
+        )
+        WHERE rank <= ?
+        ORDER BY {group_by}, rank
+    """
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (top_n,))
+            rows = cursor.fetchall()
+
+        leaderboard: dict[str, list[dict[str, Any]]] = {}
+        for row in rows:
+            meal = {
+                'id': row[0],
+                'meal': row[1],
+                'cuisine': row[2],
+                'price': row[3],
+                'difficulty': row[4],
+                'battles': row[5],
+                'wins': row[6],
+                'win_pct': round(row[7] * 100, 1),  # Convert to percentage
+                'rank': row[8]
+            }
+            group = meal[group_by]
+            leaderboard.setdefault(group, []).append(meal)
+
+        with _grouped_leaderboard_lock:
+            if generation == _grouped_leaderboard_generation:
+                _grouped_leaderboard_cache[cache_key] = _copy_grouped_leaderboard(leaderboard)
+        logger.info("Grouped leaderboard by %s retrieved successfully", group_by)
+        return leaderboard
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+def clear_leaderboard_cache() -> None:
+    """ Drops every cached grouped leaderboard so the next request reads fresh stats."""
+    global _grouped_leaderboard_generation
+    with _grouped_leaderboard_lock:
+        _grouped_leaderboard_cache.clear()
+        _grouped_leaderboard_generation += 1
+
+def _copy_grouped_leaderboard(leaderboard: dict[str, list[dict[str, Any]]]) -> dict[str, list[dict[str, Any]]]:
+    """ Copies a grouped leaderboard down to the meal dictionaries, so callers cannot change the cached one."""
+    return {group: [dict(meal) for meal in meals] for group, meals in leaderboard.items()}
+
 def get_meal_by_id(meal_id: int) -> Meal:
     """ Get the meal based on its ID. 
 
@@ -229,6 +339,50 @@ def get_meal_by_name(meal_name: str) -> Meal:
         raise e
 
 
+def get_meals_by_names(meal_names: list[str]) -> dict[str, Meal]:
+    """ Get many meals by name in a single query.
+
+    Args:
+        meal_names (list[str]): The names of the meals that want to be selected.
+
+    Returns:
+        A dictionary mapping each meal name to the meal with all of its data.
+
+    Raises:
+        ValueError: If any of the meals has been deleted or does not exist.
+    """
+
+    unique_names = list(dict.fromkeys(meal_names))
+    if not unique_names:
+        return {}
+
+    placeholders = ", ".join("?" for _ in unique_names)
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id, meal, cuisine, price, difficulty, deleted FROM meals WHERE meal IN ({placeholders})", unique_names)
+            rows = cursor.fetchall()
+
+        meals = {}
+        for row in rows:
+            if row[5]:
+                logger.info("Meal with name %s has been deleted", row[1])
+                raise ValueError(f"Meal with name {row[1]} has been deleted")
+            meals[row[1]] = Meal(id=row[0], meal=row[1], cuisine=row[2], price=row[3], difficulty=row[4])
+
+        for meal_name in unique_names:
+            if meal_name not in meals:
+                logger.info("Meal with name %s not found", meal_name)
+                raise ValueError(f"Meal with name {meal_name} not found")
+
+        return meals
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+
 def update_meal_stats(meal_id: int, result: str) -> None:
     """ Update the battle statistics for the meal based on the battle results.
 
@@ -243,15 +397,7 @@ def update_meal_stats(meal_id: int, result: str) -> None:
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT deleted FROM meals WHERE id = ?", (meal_id,))
-            try:
-                deleted = cursor.fetchone()[0]
-                if deleted:
-                    logger.info("Meal with ID %s has been deleted", meal_id)
-                    raise ValueError(f"Meal with ID {meal_id} has been deleted")
-            except TypeError:
-                logger.info("Meal with ID %s not found", meal_id)
-                raise ValueError(f"Meal with ID {meal_id} not found")
+            _check_meal_active(cursor, meal_id)
 
             if result == 'win':
                 cursor.execute("UPDATE meals SET battles = battles + 1, wins = wins + 1 WHERE id = ?", (meal_id,))
@@ -261,7 +407,117 @@ def update_meal_stats(meal_id: int, result: str) -> None:
                 raise ValueError(f"Invalid result: {result}. Expected 'win' or 'loss'.")
 
             conn.commit()
+            clear_leaderboard_cache()
 
     except sqlite3.Error as e:
         logger.error("Database error: %s", str(e))
         raise e
+
+
+def record_battle(winner_id: int, loser_id: int) -> None:
+    """ Records the outcome of a battle in a single transaction.
+
+    Both meals' stats are updated and a row is appended to the battles table, so the
+    battle history can never drift from the counters on the meals table.
+
+    Args:
+        winner_id (int): The ID of the winning meal.
+        loser_id (int): The ID of the losing meal.
+
+    Raises:
+        ValueError: If either meal has been deleted or does not exist.
+    """
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            _check_meal_active(cursor, winner_id)
+            _check_meal_active(cursor, loser_id)
+
+            cursor.execute("UPDATE meals SET battles = battles + 1, wins = wins + 1 WHERE id = ?", (winner_id,))
+            cursor.execute("UPDATE meals SET battles = battles + 1 WHERE id = ?", (loser_id,))
+            cursor.execute("""
+                INSERT INTO battles (winner_id, loser_id, fought_at)
+                VALUES (?, ?, ?)
+            """, (winner_id, loser_id, int(time.time())))
+
+            conn.commit()
+            clear_leaderboard_cache()
+
+            logger.info("Battle recorded: meal %s beat meal %s", winner_id, loser_id)
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+
+def record_battles(results: list[tuple[int, int]]) -> None:
+    """ Records the outcomes of many battles in a single transaction.
+
+    The stat increments are summed per meal and applied with one executemany, and every
+    battle is appended to the battles table with another, followed by a single commit.
+
+    Args:
+        results (list[tuple[int, int]]): The (winner_id, loser_id) of each battle, in the order they were fought.
+
+    Raises:
+        ValueError: If any of the meals has been deleted or does not exist.
+    """
+
+    if not results:
+        return
+
+    wins = Counter(winner_id for winner_id, _ in results)
+    battles = wins + Counter(loser_id for _, loser_id in results)
+    meal_ids = list(battles)
+    placeholders = ", ".join("?" for _ in meal_ids)
+    fought_at = int(time.time())
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id FROM meals WHERE deleted = FALSE AND id IN ({placeholders})", meal_ids)
+            active_ids = {row[0] for row in cursor.fetchall()}
+            for meal_id in meal_ids:
+                if meal_id not in active_ids:
+                    logger.info("Meal with ID %s has been deleted or not found", meal_id)
+                    raise ValueError(f"Meal with ID {meal_id} has been deleted or not found")
+
+            cursor.executemany(
+                "UPDATE meals SET battles = battles + ?, wins = wins + ? WHERE id = ?",
+                [(battles[meal_id], wins[meal_id], meal_id) for meal_id in meal_ids]
+            )
+            cursor.executemany("""
+                INSERT INTO battles (winner_id, loser_id, fought_at)
+                VALUES (?, ?, ?)
+            """, [(winner_id, loser_id, fought_at) for winner_id, loser_id in results])
+
+            conn.commit()
+            clear_leaderboard_cache()
+
+            logger.info("Recorded %d battles between %d meals", len(results), len(meal_ids))
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+
+def _check_meal_active(cursor: sqlite3.Cursor, meal_id: int) -> None:
+    """ Checks that the meal exists and has not been deleted.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the open connection to check with.
+        meal_id (int): The ID of the meal to check.
+
+    Raises:
+        ValueError: If the meal has been deleted or does not exist.
+    """
+    cursor.execute("SELECT deleted FROM meals WHERE id = ?", (meal_id,))
+    try:
+        deleted = cursor.fetchone()[0]
+        if deleted:
+            logger.info("Meal with ID %s has been deleted", meal_id)
+            raise ValueError(f"Meal with ID {meal_id} has been deleted")
+    except TypeError:
+        logger.info("Meal with ID %s not found", meal_id)
+        raise ValueError(f"Meal with ID {meal_id} not found")
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from meal_max.models.kitchen_model import clear_leaderboard_cache
+from meal_max.utils import sql_utils
+
+
+CUISINES = ["Italian", "Mexican", "Thai", "Indian", "French", "Japanese", "Greek", "Korean"]
+DIFFICULTIES = ["LOW", "MED", "HIGH"]
+
+
+@pytest.fixture
+def memory_db(request):
+    """Fixture providing a fresh in-memory database with the schema applied, dropped after the test."""
+    sql_utils.use_memory_database(name=request.node.name)
+    clear_leaderboard_cache()
+    yield sql_utils
+    sql_utils.close_memory_database()
+
+
+@pytest.fixture
+def seed_meals(memory_db):
+    """Fixture returning a function that bulk inserts synthetic meals (with stats) into the in-memory database.
+
+    The meals are generated from a fixed seed and inserted with one executemany, so even
+    hundreds of thousands of rows only take a moment.
+    """
+    def _seed_meals(count: int, seed: int = 411) -> int:
+        rng = random.Random(seed)
+        rows = []
+        for i in range(count):
+            battles = rng.randint(0, 50)
+            rows.append((
+                f"Meal {i}",
+                rng.choice(CUISINES),
+                round(rng.uniform(1, 40), 2),
+                rng.choice(DIFFICULTIES),
+                battles,
+                rng.randint(0, battles)
+            ))
+
+        with memory_db.get_db_connection() as conn:
+            conn.executemany("""
+                INSERT INTO meals (meal, cuisine, price, difficulty, battles, wins)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+        return count
+
+    return _seed_meals
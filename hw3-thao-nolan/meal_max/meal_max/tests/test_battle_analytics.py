@@ -0,0 +1,94 @@
+from contextlib import contextmanager
+
+import pytest
+
+from meal_max.models.battle_analytics import (
+    get_head_to_head_matrix,
+    get_streaks,
+    get_win_rate_over_time,
+)
+
+
+# (winner_id, loser_id, fought_at) rows in the order they were fought
+BATTLE_ROWS = [
+    (1, 2, 100),
+    (1, 2, 200),
+    (2, 1, 3700),
+    (1, 3, 3800),
+    (3, 1, 7300),
+    (3, 1, 7400),
+    (3, 1, 7500),
+]
+
+
+@pytest.fixture
+def mock_cursor(mocker):
+    mock_conn = mocker.Mock()
+    mock_cursor = mocker.Mock()
+
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = []
+
+    @contextmanager
+    def mock_get_db_connection():
+        yield mock_conn
+    mocker.patch("meal_max.models.battle_analytics.get_db_connection", mock_get_db_connection)
+
+    return mock_cursor
+
+
+def test_get_head_to_head_matrix(mock_cursor):
+    """Test counting wins between every pair of meals"""
+    mock_cursor.fetchall.return_value = BATTLE_ROWS
+
+    head_to_head = get_head_to_head_matrix()
+
+    assert head_to_head['meal_ids'] == [1, 2, 3]
+    assert head_to_head['wins'] == [[0, 2, 1], [1, 0, 0], [3, 0, 0]]
+
+def test_get_head_to_head_matrix_selected_meals(mock_cursor):
+    """Test the matrix only counts battles between the requested meals"""
+    mock_cursor.fetchall.return_value = BATTLE_ROWS
+
+    head_to_head = get_head_to_head_matrix([2, 1])
+
+    assert head_to_head == {'meal_ids': [1, 2], 'wins': [[0, 2], [1, 0]]}
+
+def test_get_streaks(mock_cursor):
+    """Test the current and longest streaks of a meal"""
+    mock_cursor.fetchall.return_value = BATTLE_ROWS
+
+    streaks = get_streaks(1)
+
+    assert streaks['battles'] == 7
+    assert streaks['current_streak'] == 3
+    assert streaks['current_streak_type'] == 'loss'
+    assert streaks['longest_win_streak'] == 2
+    assert streaks['longest_loss_streak'] == 3
+    assert mock_cursor.execute.call_args[0][1] == (1, 1), "Expected the query to be filtered by meal."
+
+def test_get_streaks_no_battles(mock_cursor):
+    """Test the streaks of a meal that never battled"""
+    streaks = get_streaks(1)
+
+    assert streaks['battles'] == 0
+    assert streaks['current_streak'] == 0
+    assert streaks['current_streak_type'] is None
+    assert streaks['longest_win_streak'] == 0
+
+def test_get_win_rate_over_time(mock_cursor):
+    """Test bucketing a meal's battles into hourly periods"""
+    mock_cursor.fetchall.return_value = BATTLE_ROWS
+
+    win_rate = get_win_rate_over_time(1, period_seconds=3600)
+
+    assert [period['period_start'] for period in win_rate] == [0, 3600, 7200]
+    assert [period['wins'] for period in win_rate] == [2, 1, 0]
+    assert [period['battles'] for period in win_rate] == [2, 2, 3]
+    assert win_rate[1]['win_pct'] == 50.0
+    assert win_rate[2]['cumulative_win_pct'] == 42.9
+
+def test_get_win_rate_over_time_invalid_period():
+    """Test error when the period length is not positive"""
+    with pytest.raises(ValueError, match="Invalid period_seconds parameter: 0"):
+        get_win_rate_over_time(1, period_seconds=0)
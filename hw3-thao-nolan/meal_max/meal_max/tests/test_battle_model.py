@@ -78,3 +78,26 @@ def test_prep_combatants(battle_model, sample_meal_1):
     assert battle_model.combatants[0].meal == 'Meal 1'
 
 
+
+
+def test_battle_batch(battle_model, sample_meal_1, sample_meal_2, mocker):
+    """Test running many battles with one random.org call and one transaction"""
+    mock_get_random_batch = mocker.patch("meal_max.models.battle_model.get_random_batch", return_value=[0.0, 0.99])
+    mock_record_battles = mocker.patch("meal_max.models.battle_model.record_battles")
+
+    # Meal 1 scores 5.5 and Meal 2 scores 4.5, so the delta is 0.01
+    winners = battle_model.battle_batch([(sample_meal_1, sample_meal_2), (sample_meal_1, sample_meal_2)])
+
+    assert winners == ["Meal 1", "Meal 2"]
+    mock_get_random_batch.assert_called_once_with(2)
+    mock_record_battles.assert_called_once_with([(1, 2), (2, 1)])
+    assert len(battle_model.combatants) == 0, "Batch battles should not touch the combatants list"
+
+def test_battle_batch_meal_against_itself(battle_model, sample_meal_1, mocker):
+    """Test error when a meal is paired with itself in a batch"""
+    mock_record_battles = mocker.patch("meal_max.models.battle_model.record_battles")
+
+    with pytest.raises(ValueError, match="Meal 'Meal 1' cannot battle itself."):
+        battle_model.battle_batch([(sample_meal_1, sample_meal_1)])
+
+    mock_record_battles.assert_not_called()
@@ -6,11 +6,16 @@ import pytest
 
 from meal_max.models.kitchen_model import (
     Meal,
+    clear_leaderboard_cache,
     create_meal,
     delete_meal,
+    get_grouped_leaderboard,
     get_leaderboard,
     get_meal_by_id,
     get_meal_by_name,
+    get_meals_by_names,
+    record_battle,
+    record_battles,
     update_meal_stats,
 )
 ######################################################
@@ -41,6 +46,9 @@ def mock_cursor(mocker):
         yield mock_conn  # Yield the mocked connection object
     mocker.patch("meal_max.models.kitchen_model.get_db_connection", mock_get_db_connection)
 
+    # Start every test without grouped leaderboards cached by a previous test
+    clear_leaderboard_cache()
+
     return mock_cursor  # Return the mock cursor so we can set expectations per test
 
 ######################################################
@@ -188,6 +196,70 @@ def test_get_leaderboard_sorted_by_wins(mock_cursor):
     
     assert leaderboard == expected_leaderboard, f"Expected {expected_leaderboard}, got {leaderboard}"
 
+
+
+def test_get_grouped_leaderboard_by_cuisine(mock_cursor):
+    """Test get_grouped_leaderboard ranks meals within each cuisine in one query."""
+
+    mock_cursor.fetchall.return_value = [
+        (1, "Meal A", "Cuisine A", 10.0, "LOW", 10, 8, 0.8, 1),
+        (2, "Meal B", "Cuisine A", 12.0, "MED", 15, 7, 0.47, 2),
+        (3, "Meal C", "Cuisine B", 8.0, "HIGH", 20, 5, 0.25, 1)
+    ]
+
+    leaderboard = get_grouped_leaderboard(group_by="cuisine", sort_by="wins", top_n=2)
+
+    assert list(leaderboard.keys()) == ["Cuisine A", "Cuisine B"]
+    assert [meal['id'] for meal in leaderboard["Cuisine A"]] == [1, 2]
+    assert leaderboard["Cuisine A"][1]['rank'] == 2
+    assert leaderboard["Cuisine B"][0]['win_pct'] == 25.0
+
+    actual_query = normalize_whitespace(mock_cursor.execute.call_args[0][0])
+    assert "ROW_NUMBER() OVER (PARTITION BY cuisine ORDER BY wins DESC, id)" in actual_query
+    assert mock_cursor.execute.call_args[0][1] == (2,), "Expected top_n to be passed as a query parameter."
+
+def test_get_grouped_leaderboard_cached_until_stats_update(mock_cursor):
+    """Test the grouped leaderboard is served from cache until meal stats change."""
+
+    mock_cursor.fetchall.return_value = [(1, "Meal A", "Cuisine A", 10.0, "LOW", 10, 8, 0.8, 1)]
+
+    get_grouped_leaderboard(group_by="difficulty")
+    get_grouped_leaderboard(group_by="difficulty")
+    assert mock_cursor.execute.call_count == 1, "Expected the second call to be served from cache."
+
+    mock_cursor.fetchone.return_value = [False]
+    update_meal_stats(1, "win")
+    get_grouped_leaderboard(group_by="difficulty")
+    assert mock_cursor.execute.call_count == 4, "Expected the cache to be cleared by the stats update."
+
+def test_get_grouped_leaderboard_returns_copy(mock_cursor):
+    """Test that changing a returned grouped leaderboard does not change the cached one."""
+
+    mock_cursor.fetchall.return_value = [(1, "Meal A", "Cuisine A", 10.0, "LOW", 10, 8, 0.8, 1)]
+
+    first = get_grouped_leaderboard(group_by="difficulty")
+    first["LOW"][0]["wins"] = 0
+    first["HIGH"] = []
+
+    second = get_grouped_leaderboard(group_by="difficulty")
+    assert second == {"LOW": [{'id': 1, 'meal': "Meal A", 'cuisine': "Cuisine A", 'price': 10.0, 'difficulty': "LOW",
+                               'battles': 10, 'wins': 8, 'win_pct': 80.0, 'rank': 1}]}
+
+def test_get_grouped_leaderboard_not_cached_across_stats_update(mock_cursor):
+    """Test that a leaderboard read before a stats update is not cached after it."""
+
+    mock_cursor.fetchall.return_value = [(1, "Meal A", "Cuisine A", 10.0, "LOW", 10, 8, 0.8, 1)]
+    # The stats change while the leaderboard query is running
+    mock_cursor.execute.side_effect = lambda *args: clear_leaderboard_cache()
+
+    get_grouped_leaderboard(group_by="difficulty")
+    get_grouped_leaderboard(group_by="difficulty")
+    assert mock_cursor.execute.call_count == 2, "Expected the stale leaderboard not to be cached."
+
+def test_get_grouped_leaderboard_invalid_group_by():
+    """Test error when grouping the leaderboard by an unsupported column."""
+    with pytest.raises(ValueError, match="Invalid group_by parameter: price"):
+        get_grouped_leaderboard(group_by="price")
         
         
 ######################################################
@@ -268,4 +340,84 @@ def test_update_meal_stats_deleted_meal(mock_cursor):
     with pytest.raises(ValueError, match="Meal with ID 1 has been deleted"):
         update_meal_stats(1, "win")
         
-    mock_cursor.execute.assert_called_once_with("SELECT deleted FROM meals WHERE id = ?", (1,))
\ No newline at end of file
+    mock_cursor.execute.assert_called_once_with("SELECT deleted FROM meals WHERE id = ?", (1,))
+
+
+def test_record_battle(mock_cursor):
+    """Test recording a battle updates both meals and logs the battle in one transaction"""
+
+    mock_cursor.fetchone.return_value = [False]
+
+    record_battle(1, 2)
+
+    executed = [normalize_whitespace(call[0][0]) for call in mock_cursor.execute.call_args_list]
+    assert executed[2] == "UPDATE meals SET battles = battles + 1, wins = wins + 1 WHERE id = ?"
+    assert executed[3] == "UPDATE meals SET battles = battles + 1 WHERE id = ?"
+    assert executed[4] == "INSERT INTO battles (winner_id, loser_id, fought_at) VALUES (?, ?, ?)"
+
+    actual_arguments = mock_cursor.execute.call_args_list[4][0][1]
+    assert actual_arguments[:2] == (1, 2), f"Expected the winner and loser IDs, got {actual_arguments[:2]}."
+    assert isinstance(actual_arguments[2], int), "Expected the battle time to be stored as integer seconds."
+
+
+def test_record_battle_deleted_meal(mock_cursor):
+    """Test error when recording a battle with a deleted meal, before anything is written"""
+
+    mock_cursor.fetchone.side_effect = [[False], [True]]
+
+    with pytest.raises(ValueError, match="Meal with ID 2 has been deleted"):
+        record_battle(1, 2)
+
+    assert mock_cursor.execute.call_count == 2, "Expected no writes after the failed check."
+
+
+def test_get_meals_by_names(mock_cursor):
+    """Test loading many meals by name with a single query"""
+
+    mock_cursor.fetchall.return_value = [
+        (1, "Meal A", "Cuisine A", 10.0, "LOW", False),
+        (2, "Meal B", "Cuisine B", 12.0, "MED", False)
+    ]
+
+    meals = get_meals_by_names(["Meal A", "Meal B", "Meal A"])
+
+    assert meals == {
+        "Meal A": Meal(1, "Meal A", "Cuisine A", 10.0, "LOW"),
+        "Meal B": Meal(2, "Meal B", "Cuisine B", 12.0, "MED")
+    }
+    mock_cursor.execute.assert_called_once()
+    assert mock_cursor.execute.call_args[0][1] == ["Meal A", "Meal B"], "Expected each name to be queried once."
+
+def test_get_meals_by_names_missing_meal(mock_cursor):
+    """Test error when one of the meals does not exist"""
+
+    mock_cursor.fetchall.return_value = [(1, "Meal A", "Cuisine A", 10.0, "LOW", False)]
+
+    with pytest.raises(ValueError, match="Meal with name Meal B not found"):
+        get_meals_by_names(["Meal A", "Meal B"])
+
+
+def test_record_battles(mock_cursor):
+    """Test recording many battles with summed stat updates and a single commit"""
+
+    mock_cursor.fetchall.return_value = [(1,), (2,), (3,)]
+
+    record_battles([(1, 2), (1, 3), (2, 1)])
+
+    stats_query, stats_arguments = mock_cursor.executemany.call_args_list[0][0]
+    assert normalize_whitespace(stats_query) == "UPDATE meals SET battles = battles + ?, wins = wins + ? WHERE id = ?"
+    assert sorted(stats_arguments, key=lambda args: args[2]) == [(3, 2, 1), (2, 1, 2), (1, 0, 3)]
+
+    battles_query, battles_arguments = mock_cursor.executemany.call_args_list[1][0]
+    assert normalize_whitespace(battles_query) == "INSERT INTO battles (winner_id, loser_id, fought_at) VALUES (?, ?, ?)"
+    assert [args[:2] for args in battles_arguments] == [(1, 2), (1, 3), (2, 1)]
+
+def test_record_battles_deleted_meal(mock_cursor):
+    """Test error when recording battles with a deleted meal, before anything is written"""
+
+    mock_cursor.fetchall.return_value = [(1,)]
+
+    with pytest.raises(ValueError, match="Meal with ID 2 has been deleted or not found"):
+        record_battles([(1, 2)])
+
+    mock_cursor.executemany.assert_not_called()
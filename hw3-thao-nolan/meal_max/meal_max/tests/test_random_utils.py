@@ -1,6 +1,6 @@
 import pytest
 import requests 
-from meal_max.utils.random_utils import get_random
+from meal_max.utils.random_utils import get_random, get_random_batch
 
 RANDOM_NUMBER = 0.42
 
@@ -56,3 +56,24 @@ def test_get_random_get_invalid_requests(mocker) :
     with pytest.raises(RuntimeError, match="Request to random.org failed: Connection error"):
         get_random()
 
+
+
+def test_get_random_batch(mocker):
+    """Test retrieving many random numbers from random.org in one request."""
+    mock_response = mocker.Mock()
+    mock_response.text = "0.42\n0.07\n0.91\n"
+    mocker.patch("requests.get", return_value=mock_response)
+
+    result = get_random_batch(3)
+
+    assert result == [0.42, 0.07, 0.91], f"Expected [0.42, 0.07, 0.91], but got {result}"
+    requests.get.assert_called_once_with("https://www.random.org/decimal-fractions/?num=3&dec=2&col=1&format=plain&rnd=new", timeout=5)
+
+def test_get_random_batch_short_response(mocker):
+    """Simulate random.org returning fewer numbers than requested."""
+    mock_response = mocker.Mock()
+    mock_response.text = "0.42\n"
+    mocker.patch("requests.get", return_value=mock_response)
+
+    with pytest.raises(ValueError, match="Expected 2 random numbers from random.org, got 1"):
+        get_random_batch(2)
@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+
+from meal_max.models.kitchen_model import get_grouped_leaderboard, get_leaderboard, get_meal_by_name, create_meal
+from meal_max.utils import sql_utils
+
+
+def test_memory_database_has_schema(memory_db):
+    """Test the in-memory database is created with the tables from the schema script."""
+    sql_utils.check_database_connection()
+    sql_utils.check_table_exists("meals")
+    sql_utils.check_table_exists("battles")
+    assert sql_utils.DB_PATH.startswith("file:"), "Expected connections to go to the in-memory database"
+
+def test_memory_database_shared_between_connections(memory_db):
+    """Test data written through one connection is visible through the next one."""
+    create_meal(meal="Pasta", cuisine="Italian", price=12.5, difficulty="MED")
+
+    meal = get_meal_by_name("Pasta")
+    assert meal.cuisine == "Italian"
+
+def test_close_memory_database_drops_data(request):
+    """Test closing the in-memory database drops it and restores the file database path."""
+    file_db_path = sql_utils.DB_PATH
+
+    sql_utils.use_memory_database(name=request.node.name)
+    create_meal(meal="Pasta", cuisine="Italian", price=12.5, difficulty="MED")
+    sql_utils.close_memory_database()
+    assert sql_utils.DB_PATH == file_db_path
+
+    sql_utils.use_memory_database(name=request.node.name)
+    with pytest.raises(ValueError, match="Meal with name Pasta not found"):
+        get_meal_by_name("Pasta")
+    sql_utils.close_memory_database()
+
+def test_grouped_leaderboard_on_synthetic_dataset(seed_meals):
+    """Test the window-function leaderboard against the global leaderboard on a large dataset."""
+    seed_meals(20000)
+
+    grouped = get_grouped_leaderboard(group_by="cuisine", sort_by="wins", top_n=5)
+    overall = get_leaderboard(sort_by="wins")
+
+    assert all(len(meals) == 5 for meals in grouped.values())
+    for cuisine, meals in grouped.items():
+        expected_wins = [meal['wins'] for meal in overall if meal['cuisine'] == cuisine][:5]
+        assert [meal['wins'] for meal in meals] == expected_wins
+
+
+def test_run_migrations_fresh_database(tmp_path):
+    """Test migrating an empty database applies every migration and records the version."""
+    conn = sqlite3.connect(tmp_path / "meal_max.db")
+
+    version = sql_utils.run_migrations(conn)
+
+    latest_version = sql_utils.get_migrations()[-1][0]
+    assert version == latest_version
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == latest_version
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"meals", "battles"} <= tables
+    conn.close()
+
+def test_run_migrations_keeps_existing_data(tmp_path):
+    """Test restarting on a migrated database is a no-op that keeps the data."""
+    conn = sqlite3.connect(tmp_path / "meal_max.db")
+    sql_utils.run_migrations(conn)
+    conn.execute("INSERT INTO meals (meal, cuisine, price, difficulty) VALUES ('Pasta', 'Italian', 12.5, 'MED')")
+    conn.commit()
+
+    sql_utils.run_migrations(conn)
+
+    assert conn.execute("SELECT meal FROM meals").fetchall() == [("Pasta",)]
+    conn.close()
+
+def test_run_migrations_only_applies_pending(tmp_path):
+    """Test only migrations newer than the recorded version are applied, and a failed one is rolled back."""
+    migrations_path = tmp_path / "migrations"
+    migrations_path.mkdir()
+    (migrations_path / "001_create_meals.sql").write_text("CREATE TABLE meals (id INTEGER PRIMARY KEY);")
+    conn = sqlite3.connect(tmp_path / "meal_max.db")
+    assert sql_utils.run_migrations(conn, str(migrations_path)) == 1
+
+    (migrations_path / "002_add_price.sql").write_text("ALTER TABLE meals ADD COLUMN price REAL;")
+    (migrations_path / "003_broken.sql").write_text("CREATE TABLE extra (id INTEGER); NOT VALID SQL;")
+
+    with pytest.raises(sqlite3.Error):
+        sql_utils.run_migrations(conn, str(migrations_path))
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "extra" not in tables, "Expected the failed migration to be rolled back"
+    conn.close()
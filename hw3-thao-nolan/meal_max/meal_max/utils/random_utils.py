@@ -36,3 +36,50 @@ def get_random() -> float:
     except requests.exceptions.RequestException as e:
         logger.error("Request to random.org failed: %s", e)
         raise RuntimeError("Request to random.org failed: %s" % e)
+
+
+def get_random_batch(count: int) -> list[float]:
+    """
+    Fetches many random decimal fractions from random.org in a single request.
+
+    Args:
+        count (int): The number of random numbers to fetch, at most 10000 (the random.org limit).
+
+    Returns:
+        list[float]: The random numbers fetched from random.org.
+
+    Raises:
+        ValueError: If count is out of range or the response from random.org is invalid.
+        RuntimeError: If the request to random.org fails.
+    """
+    if not isinstance(count, int) or count < 1 or count > 10000:
+        raise ValueError("Invalid count: %s. Must be an integer between 1 and 10000." % count)
+
+    url = f"https://www.random.org/decimal-fractions/?num={count}&dec=2&col=1&format=plain&rnd=new"
+
+    try:
+        logger.info("Fetching %d random numbers from %s", count, url)
+
+        response = requests.get(url, timeout=5)
+        response.raise_for_status()
+
+        random_number_strs = response.text.split()
+
+        try:
+            random_numbers = [float(random_number_str) for random_number_str in random_number_strs]
+        except ValueError:
+            raise ValueError("Invalid response from random.org: %s" % response.text.strip())
+
+        if len(random_numbers) != count:
+            raise ValueError("Expected %d random numbers from random.org, got %d" % (count, len(random_numbers)))
+
+        logger.info("Received %d random numbers", len(random_numbers))
+        return random_numbers
+
+    except requests.exceptions.Timeout:
+        logger.error("Request to random.org timed out.")
+        raise RuntimeError("Request to random.org timed out.")
+
+    except requests.exceptions.RequestException as e:
+        logger.error("Request to random.org failed: %s", e)
+        raise RuntimeError("Request to random.org failed: %s" % e)
@@ -13,10 +13,127 @@ configure_logger(logger)
 # load the db path from the environment with a default value
 DB_PATH = os.getenv("DB_PATH", "/app/sql/meal_max.db")
 
+# the directory of numbered schema migrations (NNN_description.sql), applied in order
+SQL_MIGRATIONS_PATH = os.getenv(
+    "SQL_MIGRATIONS_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "..", "sql", "migrations")
+)
+
+# A shared-cache in-memory database only lives while at least one connection to it is open,
+# so use_memory_database keeps one open here until close_memory_database is called.
+_memory_keeper_conn = None
+_file_db_path = DB_PATH
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a connection to DB_PATH, which may be a plain path or a file: URI."""
+    return sqlite3.connect(DB_PATH, uri=DB_PATH.startswith("file:"))
+
+
+def get_migrations(migrations_path: str = None) -> list[tuple[int, str]]:
+    """List the migration scripts in the order they must be applied.
+
+    Args:
+        migrations_path (str, optional): The migrations directory. Defaults to SQL_MIGRATIONS_PATH.
+
+    Returns:
+        list[tuple[int, str]]: The version number and path of each migration, sorted by version.
+
+    Raises:
+        ValueError: If a file name does not start with a version number or two share a version.
+    """
+    migrations_path = migrations_path or SQL_MIGRATIONS_PATH
+    migrations = {}
+    for file_name in os.listdir(migrations_path):
+        if not file_name.endswith(".sql"):
+            continue
+        prefix = file_name.split("_", 1)[0]
+        if not prefix.isdigit():
+            raise ValueError(f"Migration {file_name} must start with a version number")
+        version = int(prefix)
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {file_name}")
+        migrations[version] = os.path.join(migrations_path, file_name)
+    return sorted(migrations.items())
+
+
+def run_migrations(conn: sqlite3.Connection = None, migrations_path: str = None) -> int:
+    """Apply the migrations newer than the database's PRAGMA user_version, without the sqlite3 CLI.
+
+    Each migration runs in its own transaction together with the user_version bump, so a
+    failed migration leaves the database at the previous version. Existing data is kept.
+
+    Args:
+        conn (sqlite3.Connection, optional): The connection to migrate. Defaults to a new connection to DB_PATH.
+        migrations_path (str, optional): The migrations directory. Defaults to SQL_MIGRATIONS_PATH.
+
+    Returns:
+        int: The schema version of the database after migrating.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = _connect()
+
+    try:
+        current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        pending = [(version, path) for version, path in get_migrations(migrations_path) if version > current_version]
+        if not pending:
+            logger.info("Database schema is up to date at version %d", current_version)
+            return current_version
+
+        for version, path in pending:
+            logger.info("Applying migration %s", os.path.basename(path))
+            with open(path) as migration_file:
+                script = migration_file.read()
+            try:
+                conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {version};\nCOMMIT;")
+            except sqlite3.Error as e:
+                conn.rollback()
+                logger.error("Migration %s failed: %s", os.path.basename(path), str(e))
+                raise e
+            current_version = version
+
+        logger.info("Database schema migrated to version %d", current_version)
+        return current_version
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def use_memory_database(name: str = "meal_max") -> None:
+    """Point every connection at a shared-cache in-memory database with all migrations applied.
+
+    Nothing touches disk, which makes tests and simulation runs much faster. The database
+    is dropped again by close_memory_database.
+
+    Args:
+        name (str): The name of the in-memory database, so separate runs do not share data.
+    """
+    global DB_PATH, _memory_keeper_conn, _file_db_path
+
+    close_memory_database()
+    _file_db_path = DB_PATH
+    DB_PATH = f"file:{name}?mode=memory&cache=shared"
+    _memory_keeper_conn = _connect()
+    run_migrations(_memory_keeper_conn)
+    logger.info("Using in-memory database %s", name)
+
+
+def close_memory_database() -> None:
+    """Drop the in-memory database, if one is in use, and point back at the file database."""
+    global DB_PATH, _memory_keeper_conn
+
+    if _memory_keeper_conn is None:
+        return
+    _memory_keeper_conn.close()
+    _memory_keeper_conn = None
+    DB_PATH = _file_db_path
+    logger.info("In-memory database closed.")
+
 
 def check_database_connection():
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = _connect()
         cursor = conn.cursor()
         # This ensures the connection is actually active
         cursor.execute("SELECT 1;")
@@ -28,7 +145,7 @@ def check_database_connection():
 
 def check_table_exists(tablename: str):
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = _connect()
         cursor = conn.cursor()
         cursor.execute(f"SELECT 1 FROM {tablename} LIMIT 1;")
         conn.close()
@@ -47,7 +164,7 @@ def check_table_exists(tablename: str):
 def get_db_connection():
     conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = _connect()
         yield conn
     except sqlite3.Error as e:
         logger.error("Database connection error: %s", str(e))
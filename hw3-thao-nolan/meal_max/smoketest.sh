@@ -229,6 +229,22 @@ get_leader_board_by_win_pct() {
     exit 1
   fi
 }
+get_grouped_leader_board() {
+  group_by=$1
+
+  echo "Getting leaderboard of meals grouped by $group_by..."
+  response=$(curl -s -X GET "$BASE_URL/grouped-leaderboard?group_by=$group_by&top_n=3")
+  if echo "$response" | grep -q '"status": "success"'; then
+    echo "Grouped leaderboard retrieved successfully."
+    if [ "$ECHO_JSON" = true ]; then
+      echo "Meal Leaderboard JSON (grouped by $group_by):"
+      echo "$response" | jq .
+    fi
+  else
+    echo "Failed to get grouped meal leaderboard."
+    exit 1
+  fi
+}
 
 # Health checks
 check_health
@@ -260,6 +276,8 @@ battle
 get_leader_board_by_wins
 get_leader_board_by_battles
 get_leader_board_by_win_pct
+get_grouped_leader_board "cuisine"
+get_grouped_leader_board "difficulty"
 
 # Clear combatants list after testing
 clear_combatants
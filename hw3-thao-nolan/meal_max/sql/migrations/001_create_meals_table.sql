@@ -1,5 +1,4 @@
-DROP TABLE IF EXISTS meals;
-CREATE TABLE meals (
+CREATE TABLE IF NOT EXISTS meals (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     meal TEXT NOT NULL UNIQUE,
     cuisine TEXT NOT NULL,
@@ -8,4 +7,4 @@ CREATE TABLE meals (
     battles INTEGER DEFAULT 0,
     wins INTEGER DEFAULT 0,
     deleted BOOLEAN DEFAULT FALSE
-);
\ No newline at end of file
+);
@@ -0,0 +1,3 @@
+-- Support the per-cuisine and per-difficulty leaderboards (PARTITION BY ... ORDER BY wins)
+CREATE INDEX IF NOT EXISTS idx_meals_cuisine_wins ON meals (cuisine, wins DESC);
+CREATE INDEX IF NOT EXISTS idx_meals_difficulty_wins ON meals (difficulty, wins DESC);
@@ -0,0 +1,12 @@
+-- Append-only log of every battle, written in the same transaction as the meal stats.
+-- Meals are referenced by integer id and the time is stored as integer unix seconds.
+CREATE TABLE IF NOT EXISTS battles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    winner_id INTEGER NOT NULL REFERENCES meals(id),
+    loser_id INTEGER NOT NULL REFERENCES meals(id),
+    fought_at INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_battles_winner_id ON battles (winner_id);
+CREATE INDEX IF NOT EXISTS idx_battles_loser_id ON battles (loser_id);
+CREATE INDEX IF NOT EXISTS idx_battles_fought_at ON battles (fought_at);
@@ -1,8 +1,18 @@
+import atexit
+import functools
+import gzip
+import io
+import json
+import os
+from typing import Callable, Optional
+import uuid
+
 from dotenv import load_dotenv
-from flask import Flask, jsonify, make_response, Response, request
+from flask import Flask, g, jsonify, make_response, Response, request, stream_with_context
 
-from music_collection.models import song_model
+from music_collection.models import play_log_model, playlist_store, recommendation_model, song_model
 from music_collection.models.playlist_model import PlaylistModel
+from music_collection.utils.ingest_utils import read_csv_songs, read_ndjson_songs
 from music_collection.utils.sql_utils import check_database_connection, check_table_exists
 
 
@@ -11,7 +21,134 @@ load_dotenv()
 
 app = Flask(__name__)
 
-playlist_model = PlaylistModel()
+# Write plays still waiting for a batch when the service stops
+atexit.register(play_log_model.flush_plays)
+
+# Playlist used by the playlist routes when the request does not name one
+DEFAULT_PLAYLIST_NAME = 'default'
+
+
+def get_playlist_model() -> PlaylistModel:
+    """
+    Returns the playlist named by the 'playlist' query parameter, or the default playlist.
+
+    The default playlist is created on first use. It is looked up once per request, so a
+    conditional_get version and the route see the same playlist. It is saved after the
+    request by save_playlists, and pinned in memory until release_playlists.
+
+    Raises:
+        ValueError: If the named playlist does not exist.
+    """
+    if 'playlist_model' in g:
+        return g.playlist_model
+    name = request.args.get('playlist', DEFAULT_PLAYLIST_NAME)
+    playlist_model = playlist_store.get_playlist(name, create=(name == DEFAULT_PLAYLIST_NAME), pin=True)
+    g.setdefault('playlists', []).append(playlist_model)
+    g.playlist_model = playlist_model
+    return playlist_model
+
+
+@app.after_request
+def save_playlists(response: Response) -> Response:
+    """
+    Writes back the changed tracks of every playlist used by the request.
+    """
+    for playlist_model in g.get('playlists', []):
+        try:
+            playlist_store.save_playlist(playlist_model)
+        except Exception as e:
+            app.logger.error(f"Error saving playlist '{playlist_model.name}': {e}")
+            return make_response(jsonify({'error': str(e)}), 500)
+    return response
+
+
+@app.teardown_request
+def release_playlists(error: Optional[BaseException]) -> None:
+    """
+    Unpins the playlists used by the request, even if it failed, so they can be evicted again.
+    """
+    for playlist_model in g.pop('playlists', []):
+        playlist_store.release_playlist(playlist_model)
+
+
+# Responses smaller than this many bytes are sent uncompressed, since gzip would barely shrink them
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+
+# Part of every playlist ETag and new on every start, so versions counted by an earlier run never match
+ETAG_EPOCH = uuid.uuid4().hex[:8]
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """
+    Gzips large successful responses for clients that accept it.
+
+    Streamed responses are left alone, since compressing them would mean holding the whole body.
+    """
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def conditional_get(get_version: Callable[[], str]) -> Callable:
+    """
+    Makes a GET route answer 304 Not Modified, without running it, when the client's copy is current.
+
+    The ETag is the version returned by get_version plus the query string, since the same
+    version gives different bodies for different parameters. It is weak, so it still holds
+    for the gzipped body. The version must not repeat across restarts or worker processes.
+
+    Args:
+        get_version (Callable[[], str]): Returns a version that changes whenever the route's result may.
+            If it raises, the route runs as usual and reports the error.
+    """
+    def decorator(view: Callable[..., Response]) -> Callable[..., Response]:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs) -> Response:
+            try:
+                etag = f"{get_version()}-{request.query_string.decode()}"
+            except Exception:
+                return view(*args, **kwargs)
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = view(*args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _catalog_version() -> str:
+    """
+    Versions the catalog routes, which change with every created, deleted or played song.
+
+    The version is kept in the database, so it holds across restarts and every worker process.
+    """
+    return f"catalog{song_model.get_catalog_version()}"
+
+
+def _playlist_version() -> str:
+    """
+    Versions the playlist named by the request, which changes with every edit.
+
+    Playlists are held in this process's memory and their versions are counted by it, so the
+    version carries ETAG_EPOCH and never matches one made by an earlier run or another process.
+    """
+    playlist_model = get_playlist_model()
+    return f"playlist{ETAG_EPOCH}-{playlist_model.playlist_id}-{playlist_model.version}"
 
 
 ####################################################
@@ -101,6 +238,46 @@ def add_song() -> Response:
         return make_response(jsonify({'error': str(e)}), 500)
 
 
+@app.route('/api/create-songs-bulk', methods=['POST'])
+def add_songs_bulk() -> Response:
+    """
+    Route to add many songs to the catalog from a CSV or NDJSON request body, read as a stream.
+
+    Query Parameter:
+        - format (str, optional): 'csv' or 'ndjson'. Defaults to the Content-Type
+          (text/csv or application/x-ndjson).
+
+    The CSV header must name the artist, title, year, genre and duration columns;
+    each NDJSON line must be an object with those fields.
+
+    Returns:
+        JSON response with the number of songs inserted and the duplicate and invalid rows.
+    Raises:
+        400 error if the format is unknown or the body cannot be read.
+        500 error if there is an issue adding the songs.
+    """
+    app.logger.info('Adding songs to the catalog in bulk')
+    try:
+        body_format = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson'
+                                                     if request.mimetype in ('application/x-ndjson', 'application/jsonl')
+                                                     else None)
+        if body_format not in ('csv', 'ndjson'):
+            return make_response(jsonify({'error': 'Body must be CSV (text/csv) or NDJSON (application/x-ndjson)'}), 400)
+
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        songs = read_csv_songs(lines) if body_format == 'csv' else read_ndjson_songs(lines)
+        report = song_model.create_songs(songs)
+
+        app.logger.info("Bulk load added %d songs", report['inserted'])
+        return make_response(jsonify({'status': 'success', **report}), 201)
+    except ValueError as e:
+        app.logger.error("Failed to read songs: %s", str(e))
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error("Failed to add songs: %s", str(e))
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
 @app.route('/api/delete-song/<int:song_id>', methods=['DELETE'])
 def delete_song(song_id: int) -> Response:
     """
@@ -122,24 +299,30 @@ def delete_song(song_id: int) -> Response:
 
 
 @app.route('/api/get-all-songs-from-catalog', methods=['GET'])
+@conditional_get(_catalog_version)
 def get_all_songs() -> Response:
     """
     Route to retrieve all songs in the catalog (non-deleted), with an option to sort by play count.
 
     Query Parameter:
         - sort_by_play_count (bool, optional): If true, sort songs by play count.
+        - limit (int, optional): Return one page of at most this many songs.
+        - cursor (str, optional): The next_cursor of the previous page.
+        - format (str, optional): 'ndjson' to stream every song as one JSON object per line.
 
     Returns:
-        JSON response with the list of songs or error message.
+        JSON response with the list of songs (and next_cursor when paging), an NDJSON stream,
+        or error message.
     """
     try:
         # Extract query parameter for sorting by play count
         sort_by_play_count = request.args.get('sort_by_play_count', 'false').lower() == 'true'
 
         app.logger.info("Retrieving all songs from the catalog, sort_by_play_count=%s", sort_by_play_count)
-        songs = song_model.get_all_songs(sort_by_play_count=sort_by_play_count)
-
-        return make_response(jsonify({'status': 'success', 'songs': songs}), 200)
+        return _song_list_response('songs', sort_by_play_count)
+    except ValueError as e:
+        app.logger.error(f"Invalid request for songs: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
     except Exception as e:
         app.logger.error(f"Error retrieving songs: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
@@ -200,6 +383,54 @@ def get_song_by_compound_key() -> Response:
         app.logger.error(f"Error retrieving song by compound key: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
+@app.route('/api/search-songs', methods=['GET'])
+def search_songs() -> Response:
+    """
+    Route to search the catalog by artist, title and genre, best matches first.
+
+    Query Parameters:
+        - q (str): The words to search for.
+        - prefix (bool, optional): If true, the last word also matches words starting with it (type-ahead).
+        - limit (int, optional): The maximum number of songs to return. Default is 20.
+        - offset (int, optional): The number of matches to skip. Default is 0.
+
+    Returns:
+        JSON response with the matching songs and the next_offset, or error message.
+    Raises:
+        400 error if the query, limit or offset is invalid.
+        500 error if there is an issue searching the catalog.
+    """
+    try:
+        query = request.args.get('q', '')
+        prefix = request.args.get('prefix', 'false').lower() == 'true'
+        try:
+            limit = int(request.args.get('limit', 20))
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return make_response(jsonify({'error': 'Limit and offset must be integers'}), 400)
+
+        app.logger.info("Searching songs for '%s', prefix=%s", query, prefix)
+        results = song_model.search_songs(query, prefix=prefix, limit=limit, offset=offset)
+        return make_response(jsonify({'status': 'success', **results}), 200)
+    except ValueError as e:
+        app.logger.error(f"Invalid search: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error searching songs: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/song-cache-stats', methods=['GET'])
+def get_song_cache_stats() -> Response:
+    """
+    Route to retrieve the hit rate and size of the catalog song cache.
+
+    Returns:
+        JSON response with the cache statistics.
+    """
+    app.logger.info("Retrieving song cache stats")
+    stats = song_model.get_song_cache_stats()
+    return make_response(jsonify({'status': 'success', 'cache': stats}), 200)
+
 @app.route('/api/get-random-song', methods=['GET'])
 def get_random_song() -> Response:
     """
@@ -216,13 +447,165 @@ def get_random_song() -> Response:
         app.logger.error(f"Error retrieving a random song: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
+@app.route('/api/similar-songs/<int:song_id>', methods=['GET'])
+def get_similar_songs(song_id: int) -> Response:
+    """
+    Route to retrieve the songs most similar to a song: closest in year, duration and popularity, favoring its genre.
+
+    Path Parameter:
+        - song_id (int): The ID of the song.
+
+    Query Parameter:
+        - k (int, optional): The number of songs to return. Default is 10.
+
+    Returns:
+        JSON response with the similar songs and their scores, most similar first.
+    Raises:
+        400 error if k is invalid or the song does not exist.
+        500 error if there is an issue retrieving the songs.
+    """
+    try:
+        try:
+            k = int(request.args.get('k', 10))
+        except ValueError:
+            return make_response(jsonify({'error': 'k must be an integer'}), 400)
+
+        app.logger.info(f"Retrieving {k} songs similar to song {song_id}")
+        songs = recommendation_model.get_similar_songs(song_id, k)
+        return make_response(jsonify({'status': 'success', 'songs': songs}), 200)
+    except ValueError as e:
+        app.logger.error(f"Invalid similar songs request: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error retrieving similar songs: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 
 ############################################################
 #
 # Playlist Management
 #
+# Every playlist route takes an optional 'playlist' query parameter naming
+# a stored playlist. Without it the default playlist is used.
+#
 ############################################################
 
+@app.route('/api/create-playlist', methods=['POST'])
+def create_playlist() -> Response:
+    """
+    Route to create a new, empty named playlist.
+
+    Expected JSON Input:
+        - name (str): The unique name of the playlist.
+
+    Returns:
+        JSON response indicating success of the creation or error message.
+    Raises:
+        400 error if the name is missing or already used.
+        500 error if there is an issue creating the playlist.
+    """
+    try:
+        data = request.get_json()
+        name = data.get('name') if data else None
+        if not name:
+            return make_response(jsonify({'error': 'Invalid input. Playlist name is required.'}), 400)
+
+        app.logger.info(f"Creating playlist: {name}")
+        playlist_store.create_playlist(name)
+        return make_response(jsonify({'status': 'success', 'playlist': name}), 201)
+    except ValueError as e:
+        app.logger.error(f"Invalid playlist: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error creating playlist: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/delete-playlist/<string:name>', methods=['DELETE'])
+def delete_playlist(name: str) -> Response:
+    """
+    Route to delete a named playlist and its tracks.
+
+    Path Parameter:
+        - name (str): The name of the playlist to delete.
+
+    Returns:
+        JSON response indicating success of the operation or error message.
+    """
+    try:
+        app.logger.info(f"Deleting playlist: {name}")
+        playlist_store.delete_playlist(name)
+        return make_response(jsonify({'status': 'success', 'message': f'Playlist {name} deleted'}), 200)
+    except Exception as e:
+        app.logger.error(f"Error deleting playlist: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/list-playlists', methods=['GET'])
+def list_playlists() -> Response:
+    """
+    Route to list the stored playlists with their number of tracks.
+
+    Returns:
+        JSON response with the playlists or error message.
+    """
+    try:
+        app.logger.info("Listing playlists")
+        playlists = playlist_store.list_playlists()
+        return make_response(jsonify({'status': 'success', 'playlists': playlists}), 200)
+    except Exception as e:
+        app.logger.error(f"Error listing playlists: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/generate-playlist', methods=['POST'])
+def generate_playlist() -> Response:
+    """
+    Route to pick catalog songs whose total duration hits a target, optionally storing them as a new playlist.
+
+    Expected JSON Input:
+        - target_duration (int): The total duration wanted, in seconds.
+        - tolerance (int, optional): How far off the total may be, in seconds. Default is 60.
+        - genre (str, optional): Only pick songs of this genre.
+        - min_year (int, optional): Only pick songs released in or after this year.
+        - max_year (int, optional): Only pick songs released in or before this year.
+        - name (str, optional): If given, the songs are stored as a new playlist with this name.
+
+    Returns:
+        JSON response with the songs and their total duration.
+    Raises:
+        400 error if a parameter is invalid, the name is already used, or no combination of songs fits.
+        500 error if there is an issue generating the playlist.
+    """
+    try:
+        data = request.get_json() or {}
+        name = data.get('name')
+
+        app.logger.info(f"Generating songs lasting {data.get('target_duration')} seconds")
+        songs = song_model.generate_songs_for_duration(
+            data.get('target_duration'),
+            tolerance=data.get('tolerance', 60),
+            genre=data.get('genre'),
+            min_year=data.get('min_year'),
+            max_year=data.get('max_year')
+        )
+
+        if name:
+            app.logger.info(f"Storing {len(songs)} generated songs as playlist: {name}")
+            playlist_model = playlist_store.create_playlist(name)
+            playlist_model.add_songs(songs)
+            playlist_store.save_playlist(playlist_model)
+
+        return make_response(jsonify({
+            'status': 'success',
+            'playlist': name,
+            'songs': songs,
+            'duration': sum(song.duration for song in songs)
+        }), 201 if name else 200)
+    except ValueError as e:
+        app.logger.error(f"Invalid playlist generation: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error generating playlist: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 @app.route('/api/add-song-to-playlist', methods=['POST'])
 def add_song_to_playlist() -> Response:
     """
@@ -237,6 +620,7 @@ def add_song_to_playlist() -> Response:
         JSON response indicating success of the addition or error message.
     """
     try:
+        playlist_model = get_playlist_model()
         data = request.get_json()
 
         artist = data.get('artist')
@@ -259,6 +643,62 @@ def add_song_to_playlist() -> Response:
         app.logger.error(f"Error adding song to playlist: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
+@app.route('/api/add-songs-to-playlist', methods=['POST'])
+def add_songs_to_playlist() -> Response:
+    """
+    Route to add many songs to the playlist by compound key (artist, title, year) in one request.
+
+    Expected JSON Input:
+        - songs (list): Objects with the artist, title and year of each song, in playlist order.
+
+    Returns:
+        JSON response with the number of songs added and an error for each song that was skipped
+        (invalid, not in the catalog, deleted or already in the playlist).
+    Raises:
+        400 error if songs is missing or not a list.
+        500 error if there is an issue adding the songs.
+    """
+    try:
+        playlist_model = get_playlist_model()
+        data = request.get_json()
+        entries = data.get('songs') if data else None
+        if not isinstance(entries, list):
+            return make_response(jsonify({'error': 'Invalid input. songs must be a list of artist, title, and year.'}), 400)
+
+        errors = {}
+        keys = []
+        key_indexes = []
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict) or not entry.get('artist') or not entry.get('title') or not isinstance(entry.get('year'), int):
+                errors[index] = 'Invalid input. Artist, title, and year are required.'
+                continue
+            keys.append((entry['artist'], entry['title'], entry['year']))
+            key_indexes.append(index)
+
+        app.logger.info(f"Adding {len(entries)} songs to playlist")
+        songs = []
+        song_indexes = []
+        for index, result in zip(key_indexes, song_model.get_songs_by_compound_keys(keys)):
+            if isinstance(result, str):
+                errors[index] = result
+            else:
+                songs.append(result)
+                song_indexes.append(index)
+
+        for song_index, error in playlist_model.add_songs(songs).items():
+            errors[song_indexes[song_index]] = error
+
+        added = len(entries) - len(errors)
+        return make_response(jsonify({
+            'status': 'success',
+            'added': added,
+            'errors': [{'index': index, 'error': errors[index]} for index in sorted(errors)]
+        }), 200)
+
+    except Exception as e:
+        app.logger.error(f"Error adding songs to playlist: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 @app.route('/api/remove-song-from-playlist', methods=['DELETE'])
 def remove_song_by_song_id() -> Response:
     """
@@ -273,6 +713,7 @@ def remove_song_by_song_id() -> Response:
         JSON response indicating success of the removal or error message.
     """
     try:
+        playlist_model = get_playlist_model()
         data = request.get_json()
 
         artist = data.get('artist')
@@ -307,6 +748,7 @@ def remove_song_by_track_number(track_number: int) -> Response:
         JSON response indicating success of the removal or an error message.
     """
     try:
+        playlist_model = get_playlist_model()
         app.logger.info(f"Removing song from playlist by track number: {track_number}")
 
         # Remove song by track number
@@ -330,6 +772,7 @@ def clear_playlist() -> Response:
         JSON response indicating success of the operation or an error message.
     """
     try:
+        playlist_model = get_playlist_model()
         app.logger.info('Clearing the playlist')
 
         # Clear the entire playlist
@@ -358,9 +801,9 @@ def play_current_song() -> Response:
         500 error if there is an issue playing the current song.
     """
     try:
+        playlist_model = get_playlist_model()
         app.logger.info('Playing current song')
-        current_song = playlist_model.get_current_song()
-        playlist_model.play_current_song()
+        current_song = playlist_model.play_current_song()
 
         return make_response(jsonify({
             'status': 'success',
@@ -389,6 +832,7 @@ def play_entire_playlist() -> Response:
         500 error if there is an issue playing the playlist.
     """
     try:
+        playlist_model = get_playlist_model()
         app.logger.info('Playing entire playlist')
         playlist_model.play_entire_playlist()
         return make_response(jsonify({'status': 'success'}), 200)
@@ -407,6 +851,7 @@ def play_rest_of_playlist() -> Response:
         500 error if there is an issue playing the rest of the playlist.
     """
     try:
+        playlist_model = get_playlist_model()
         app.logger.info('Playing rest of the playlist')
         playlist_model.play_rest_of_playlist()
         return make_response(jsonify({'status': 'success'}), 200)
@@ -425,6 +870,7 @@ def rewind_playlist() -> Response:
         500 error if there is an issue rewinding the playlist.
     """
     try:
+        playlist_model = get_playlist_model()
         app.logger.info('Rewinding playlist to the first song')
         playlist_model.rewind_playlist()
         return make_response(jsonify({'status': 'success'}), 200)
@@ -432,21 +878,75 @@ def rewind_playlist() -> Response:
         app.logger.error(f"Error rewinding playlist: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
+@app.route('/api/shuffle-playlist', methods=['POST'])
+def shuffle_playlist() -> Response:
+    """
+    Route to shuffle the order of the songs in the playlist and rewind to the first song.
+
+    Returns:
+        JSON response indicating success of the operation.
+    Raises:
+        500 error if there is an issue shuffling the playlist.
+    """
+    try:
+        playlist_model = get_playlist_model()
+        app.logger.info('Shuffling playlist')
+        playlist_model.shuffle_playlist()
+        return make_response(jsonify({'status': 'success'}), 200)
+    except Exception as e:
+        app.logger.error(f"Error shuffling playlist: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/set-shuffle-play', methods=['POST'])
+def set_shuffle_play() -> Response:
+    """
+    Route to turn shuffle play on or off, so play-current-song moves on to a random unplayed track.
+
+    Expected JSON Input:
+        - enabled (bool): True to turn shuffle play on.
+
+    Returns:
+        JSON response indicating success of the operation.
+    Raises:
+        400 error if enabled is missing or not a boolean.
+        500 error if there is an issue changing the play mode.
+    """
+    try:
+        playlist_model = get_playlist_model()
+        data = request.get_json()
+        enabled = data.get('enabled') if data else None
+        if not isinstance(enabled, bool):
+            return make_response(jsonify({'error': 'Invalid input. enabled must be true or false.'}), 400)
+
+        app.logger.info(f"Setting shuffle play to {enabled}")
+        playlist_model.set_shuffle_play(enabled)
+        return make_response(jsonify({'status': 'success', 'shuffle_play': enabled}), 200)
+    except Exception as e:
+        app.logger.error(f"Error setting shuffle play: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 @app.route('/api/get-all-songs-from-playlist', methods=['GET'])
+@conditional_get(_playlist_version)
 def get_all_songs_from_playlist() -> Response:
     """
     Route to retrieve all songs in the playlist.
 
+    Answers 304 to a matching If-None-Match. Playlists live in the serving process, so this assumes
+    a single worker process; another process never matches the ETag and sends the full list.
+
     Returns:
-        JSON response with the list of songs or an error message.
+        JSON response with the list of songs and the playlist version they were read at, or an error message.
     """
     try:
+        playlist_model = get_playlist_model()
         app.logger.info("Retrieving all songs from the playlist")
 
-        # Get all songs from the playlist
-        songs = playlist_model.get_all_songs()
+        # Serialize one immutable snapshot, so concurrent edits cannot show through
+        snapshot = playlist_model.get_snapshot()
+        if not snapshot:
+            raise ValueError("Playlist is empty")
 
-        return make_response(jsonify({'status': 'success', 'songs': songs}), 200)
+        return make_response(jsonify({'status': 'success', 'songs': list(snapshot), 'version': snapshot.version}), 200)
 
     except Exception as e:
         app.logger.error(f"Error retrieving songs from playlist: {e}")
@@ -464,6 +964,7 @@ def get_song_by_track_number(track_number: int) -> Response:
         JSON response with the song details or error message.
     """
     try:
+        playlist_model = get_playlist_model()
         app.logger.info(f"Retrieving song from playlist by track number: {track_number}")
 
         # Get the song by track number
@@ -487,6 +988,7 @@ def get_current_song() -> Response:
         JSON response with the current song details or error message.
     """
     try:
+        playlist_model = get_playlist_model()
         app.logger.info("Retrieving the current song from the playlist")
 
         # Get the current song
@@ -507,6 +1009,7 @@ def get_playlist_length_and_duration() -> Response:
         JSON response with the playlist length and total duration or error message.
     """
     try:
+        playlist_model = get_playlist_model()
         app.logger.info("Retrieving playlist length and total duration")
 
         # Get playlist length and duration
@@ -523,6 +1026,55 @@ def get_playlist_length_and_duration() -> Response:
         app.logger.error(f"Error retrieving playlist length and duration: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
+@app.route('/api/get-playlist-stats', methods=['GET'])
+def get_playlist_stats() -> Response:
+    """
+    Route to retrieve the length, total duration, genre mix and year histogram of the playlist.
+
+    Returns:
+        JSON response with the playlist stats or error message.
+    """
+    try:
+        playlist_model = get_playlist_model()
+        app.logger.info("Retrieving playlist stats")
+        stats = playlist_model.get_playlist_stats()
+        return make_response(jsonify({'status': 'success', 'stats': stats}), 200)
+    except Exception as e:
+        app.logger.error(f"Error retrieving playlist stats: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/recommend-for-playlist', methods=['GET'])
+def recommend_for_playlist() -> Response:
+    """
+    Route to retrieve catalog songs that continue the playlist, excluding the songs already in it.
+
+    Query Parameter:
+        - k (int, optional): The number of songs to return. Default is 10.
+
+    Returns:
+        JSON response with the recommended songs and their scores, best first.
+    Raises:
+        400 error if k is invalid or the playlist is empty.
+        500 error if there is an issue retrieving the songs.
+    """
+    try:
+        playlist_model = get_playlist_model()
+        try:
+            k = int(request.args.get('k', 10))
+        except ValueError:
+            return make_response(jsonify({'error': 'k must be an integer'}), 400)
+
+        song_ids = [song.id for song in playlist_model.get_all_songs()]
+        app.logger.info(f"Recommending {k} songs to continue a playlist of {len(song_ids)} songs")
+        songs = recommendation_model.recommend_songs(song_ids, k)
+        return make_response(jsonify({'status': 'success', 'songs': songs}), 200)
+    except ValueError as e:
+        app.logger.error(f"Invalid recommendation request: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error recommending songs: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 @app.route('/api/go-to-track-number/<int:track_number>', methods=['POST'])
 def go_to_track_number(track_number: int) -> Response:
     """
@@ -535,6 +1087,7 @@ def go_to_track_number(track_number: int) -> Response:
         JSON response indicating success or an error message.
     """
     try:
+        playlist_model = get_playlist_model()
         app.logger.info(f"Going to track number: {track_number}")
 
         # Set the playlist to start at the given track number
@@ -566,8 +1119,9 @@ def move_song_to_beginning() -> Response:
 
     Returns:
         JSON response indicating success or an error message.
-    """T
+    """
     try:
+        playlist_model = get_playlist_model()
         data = request.get_json()
 
         artist = data.get('artist')
@@ -599,6 +1153,7 @@ def move_song_to_end() -> Response:
         JSON response indicating success or an error message.
     """
     try:
+        playlist_model = get_playlist_model()
         data = request.get_json()
 
         artist = data.get('artist')
@@ -631,6 +1186,7 @@ def move_song_to_track_number() -> Response:
         JSON response indicating success or an error message.
     """
     try:
+        playlist_model = get_playlist_model()
         data = request.get_json()
 
         artist = data.get('artist')
@@ -662,6 +1218,7 @@ def swap_songs_in_playlist() -> Response:
         JSON response indicating success or an error message.
     """
     try:
+        playlist_model = get_playlist_model()
         data = request.get_json()
 
         track_number_1 = data.get('track_number_1')
@@ -685,6 +1242,62 @@ def swap_songs_in_playlist() -> Response:
         app.logger.error(f"Error swapping songs in playlist: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
+@app.route('/api/patch-playlist', methods=['POST'])
+def patch_playlist() -> Response:
+    """
+    Route to apply a batch of edits to the playlist in one request, all or nothing.
+
+    Expected JSON Input:
+        - operations (list): The edits, in order. Each has an 'op' and its arguments:
+            - move: song_id, track_number
+            - swap: song1_id, song2_id
+            - remove: song_id or track_number
+            - insert: artist, title, year, and optionally track_number (defaults to the end)
+
+    Returns:
+        JSON response with the new playlist length.
+    Raises:
+        400 error if any operation is invalid. No operation is applied then.
+        500 error if there is an issue applying the operations.
+    """
+    try:
+        playlist_model = get_playlist_model()
+        data = request.get_json()
+        operations = data.get('operations') if data else None
+        if not isinstance(operations, list) or not all(isinstance(operation, dict) for operation in operations):
+            return make_response(jsonify({'error': 'Invalid input. operations must be a list of objects.'}), 400)
+
+        # Resolve the songs to insert in one query before touching the playlist
+        inserts = [operation for operation in operations if operation.get('op') == 'insert']
+        keys = [(operation.get('artist'), operation.get('title'), operation.get('year')) for operation in inserts]
+        for key in keys:
+            if not key[0] or not key[1] or not isinstance(key[2], int):
+                return make_response(jsonify({'error': 'Invalid input. Artist, title, and year are required to insert a song.'}), 400)
+        songs = iter(song_model.get_songs_by_compound_keys(keys))
+        patch = []
+        for operation in operations:
+            if operation.get('op') == 'insert':
+                song = next(songs)
+                if isinstance(song, str):
+                    return make_response(jsonify({'error': song}), 400)
+                operation = {**operation, 'song': song}
+            patch.append(operation)
+
+        app.logger.info(f"Applying {len(patch)} operations to playlist")
+        playlist_model.apply_operations(patch)
+
+        return make_response(jsonify({
+            'status': 'success',
+            'operations': len(patch),
+            'playlist_length': playlist_model.get_playlist_length()
+        }), 200)
+    except (ValueError, TypeError) as e:
+        app.logger.error(f"Invalid playlist patch: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error patching playlist: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 ############################################################
 #
 # Leaderboard / Stats
@@ -692,23 +1305,120 @@ def swap_songs_in_playlist() -> Response:
 ############################################################
 
 @app.route('/api/song-leaderboard', methods=['GET'])
+@conditional_get(_catalog_version)
 def get_song_leaderboard() -> Response:
     """
     Route to get a list of all sorted by play count.
 
+    Query Parameter:
+        - top_n (int, optional): Return only the top_n most played songs.
+        - limit (int, optional): Return one page of at most this many songs.
+        - cursor (str, optional): The next_cursor of the previous page.
+        - format (str, optional): 'ndjson' to stream every song as one JSON object per line.
+
     Returns:
-        JSON response with a sorted leaderboard of songs.
+        JSON response with a sorted leaderboard of songs (and next_cursor when paging) or an NDJSON stream.
     Raises:
+        400 error if top_n, the limit or cursor is invalid.
         500 error if there is an issue generating the leaderboard.
     """
     try:
+        top_n = request.args.get('top_n')
+        if top_n is not None:
+            try:
+                top_n = int(top_n)
+            except ValueError:
+                return make_response(jsonify({'error': 'top_n must be an integer'}), 400)
+            app.logger.info(f"Generating top {top_n} song leaderboard")
+            leaderboard_data = song_model.get_top_songs(top_n)
+            return make_response(jsonify({'status': 'success', 'leaderboard': leaderboard_data}), 200)
+
         app.logger.info("Generating song leaderboard sorted")
-        leaderboard_data = song_model.get_all_songs(sort_by_play_count=True)
-        return make_response(jsonify({'status': 'success', 'leaderboard': leaderboard_data}), 200)
+        return _song_list_response('leaderboard', sort_by_play_count=True)
+    except ValueError as e:
+        app.logger.error(f"Invalid request for leaderboard: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
     except Exception as e:
         app.logger.error(f"Error generating leaderboard: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
 
+@app.route('/api/trending-songs', methods=['GET'])
+def get_trending_songs() -> Response:
+    """
+    Route to get the most played songs over a recent window of time.
+
+    Query Parameters:
+        - window_minutes (int, optional): The length of the window in minutes. Default is 60.
+        - top_n (int, optional): The number of songs to return. Default is 10.
+
+    Returns:
+        JSON response with the trending songs and their number of plays in the window.
+    Raises:
+        400 error if window_minutes or top_n is invalid.
+        500 error if there is an issue retrieving the trending songs.
+    """
+    try:
+        try:
+            window_minutes = int(request.args.get('window_minutes', 60))
+            top_n = int(request.args.get('top_n', 10))
+        except ValueError:
+            return make_response(jsonify({'error': 'window_minutes and top_n must be integers'}), 400)
+
+        app.logger.info(f"Retrieving top {top_n} trending songs over the last {window_minutes} minutes")
+        trending = play_log_model.get_trending_songs(window_minutes=window_minutes, top_n=top_n)
+        return make_response(jsonify({'status': 'success', 'window_minutes': window_minutes, 'trending': trending}), 200)
+    except ValueError as e:
+        app.logger.error(f"Invalid trending request: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error retrieving trending songs: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+def _song_list_response(key: str, sort_by_play_count: bool) -> Response:
+    """
+    Builds the response for a list of catalog songs from the limit, cursor and format query parameters.
+
+    Without any of them the whole list is returned in one JSON response, as before.
+
+    Args:
+        key (str): The JSON key the songs are returned under.
+        sort_by_play_count (bool): If true, sort songs by play count.
+
+    Returns:
+        A JSON response with every song, a JSON response with one page and its next_cursor,
+        or a streamed NDJSON response with every song.
+
+    Raises:
+        ValueError: If the limit or cursor is invalid.
+    """
+    if request.args.get('format', 'json').lower() == 'ndjson':
+        # Pull the first page now so errors are still reported with a proper status code
+        songs = song_model.iter_songs(sort_by_play_count=sort_by_play_count)
+        first_song = next(songs, None)
+
+        def generate():
+            if first_song is not None:
+                yield json.dumps(first_song) + "\n"
+            for song in songs:
+                yield json.dumps(song) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    if limit is None and cursor is None:
+        songs = song_model.get_all_songs(sort_by_play_count=sort_by_play_count)
+        return make_response(jsonify({'status': 'success', key: songs}), 200)
+
+    try:
+        limit = int(limit) if limit is not None else 100
+    except ValueError:
+        raise ValueError(f"Invalid page size: {limit} (must be an integer).")
+    page = song_model.get_songs_page(sort_by_play_count=sort_by_play_count, limit=limit, cursor=cursor)
+    return make_response(jsonify({'status': 'success', key: page['songs'], 'next_cursor': page['next_cursor']}), 200)
+
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
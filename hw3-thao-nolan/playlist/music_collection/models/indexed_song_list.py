@@ -0,0 +1,413 @@
+from collections import Counter
+from itertools import islice
+import logging
+import random
+from typing import Any, Iterable, Iterator, Optional, Tuple, Union
+
+from music_collection.models.song_model import Song
+from music_collection.utils.logger import configure_logger
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+class _Node:
+    """
+    A node of the implicit treap behind IndexedSongList.
+
+    The tree is ordered by position rather than by a key, and every node knows the size of
+    its subtree, so the node at a position (and the position of a node) is found in O(log n).
+    """
+    __slots__ = ("song", "priority", "size", "left", "right", "parent")
+
+    def __init__(self, song: Song):
+        self.song = song
+        self.priority = random.random()
+        self.size = 1
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+        self.parent: Optional["_Node"] = None
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node else 0
+
+
+def _update(node: _Node) -> None:
+    """Recomputes the subtree size of a node and re-links its children to it."""
+    node.size = 1 + _size(node.left) + _size(node.right)
+    if node.left:
+        node.left.parent = node
+    if node.right:
+        node.right.parent = node
+
+
+def _split(node: Optional[_Node], count: int) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """Splits a tree into its first count nodes and the rest."""
+    if node is None:
+        return None, None
+    if _size(node.left) >= count:
+        left, right = _split(node.left, count)
+        node.left = right
+        _update(node)
+        return left, node
+    left, right = _split(node.right, count - _size(node.left) - 1)
+    node.right = left
+    _update(node)
+    return node, right
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    """Concatenates two trees, every node of left coming before every node of right."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _build(nodes: list[_Node]) -> Optional[_Node]:
+    """Builds a tree from nodes already in order in O(n), instead of inserting them one by one."""
+    stack: list[_Node] = []
+    for node in nodes:
+        last = None
+        while stack and stack[-1].priority < node.priority:
+            last = stack.pop()
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    if not stack:
+        return None
+
+    # Every child comes after its parent in pre-order, so the reverse order updates children first
+    pre_order = []
+    pending = [stack[0]]
+    while pending:
+        node = pending.pop()
+        pre_order.append(node)
+        if node.right:
+            pending.append(node.right)
+        if node.left:
+            pending.append(node.left)
+    for node in reversed(pre_order):
+        _update(node)
+    return stack[0]
+
+
+class IndexedSongList:
+    """
+    An ordered list of songs with an index from song ID to song and position.
+
+    The order is kept in an implicit treap (a randomized balanced tree with subtree sizes),
+    so getting, inserting or removing the song at a position, finding the position of a song,
+    and moving a song are all O(log n). Membership checks and lookups by song ID are O(1).
+
+    The total duration, the count and duration per genre and the count per year are kept up to
+    date in O(1) per song added or removed, so reading them never scans the list.
+
+    Song IDs must be unique within the list.
+    """
+
+    def __init__(self, songs: Optional[Iterable[Song]] = None):
+        """
+        Initializes the list, optionally with the given songs in order.
+
+        Args:
+            songs (Iterable[Song], optional): The songs to start with.
+        """
+        self._root: Optional[_Node] = None
+        self._nodes_by_id: dict[int, _Node] = {}
+        self.total_duration = 0
+        self._genre_counts: Counter = Counter()
+        self._genre_durations: Counter = Counter()
+        self._year_counts: Counter = Counter()
+        if songs is not None:
+            self.extend(songs)
+
+    ##################################################
+    # List Interface
+    ##################################################
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def __iter__(self) -> Iterator[Song]:
+        stack = []
+        node = self._root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.song
+            node = node.right
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Song, list[Song]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return list(self)[index]
+            return list(islice(self._iter_from(start), max(0, stop - start)))
+        return self._node_at(self._normalize_index(index)).song
+
+    def __delitem__(self, index: int) -> None:
+        self._remove_at(self._normalize_index(index))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, IndexedSongList):
+            other = list(other)
+        return list(self) == other
+
+    def __repr__(self) -> str:
+        return f"IndexedSongList({list(self)!r})"
+
+    def append(self, song: Song) -> None:
+        """
+        Appends a song to the end of the list.
+
+        Raises:
+            ValueError: If a song with the same ID is already in the list.
+        """
+        self.insert(len(self), song)
+
+    def extend(self, songs: Iterable[Song]) -> None:
+        """
+        Appends every given song to the end of the list, in order.
+
+        Raises:
+            ValueError: If a song's ID is already in the list or repeated in songs. Nothing is added then.
+        """
+        nodes = []
+        new_ids = set()
+        for song in songs:
+            if song.id in self._nodes_by_id or song.id in new_ids:
+                logger.error("Song with ID %d already exists in the list", song.id)
+                raise ValueError(f"Song with ID {song.id} already exists in the playlist")
+            new_ids.add(song.id)
+            nodes.append(_Node(song))
+
+        for node in nodes:
+            self._nodes_by_id[node.song.id] = node
+            self._count_song(node.song, 1)
+        self._set_root(_merge(self._root, _build(nodes)))
+
+    def insert(self, index: int, song: Song) -> None:
+        """
+        Inserts a song before the given position (0-indexed).
+
+        Raises:
+            ValueError: If a song with the same ID is already in the list.
+        """
+        if song.id in self._nodes_by_id:
+            logger.error("Song with ID %d already exists in the list", song.id)
+            raise ValueError(f"Song with ID {song.id} already exists in the playlist")
+
+        index = max(0, min(index, len(self)))
+        node = _Node(song)
+        self._nodes_by_id[song.id] = node
+        self._count_song(song, 1)
+        left, right = _split(self._root, index)
+        self._set_root(_merge(_merge(left, node), right))
+
+    def clear(self) -> None:
+        """
+        Removes every song from the list.
+        """
+        self._root = None
+        self._nodes_by_id.clear()
+        self.total_duration = 0
+        self._genre_counts.clear()
+        self._genre_durations.clear()
+        self._year_counts.clear()
+
+    ##################################################
+    # Song ID Index
+    ##################################################
+
+    def has_song_id(self, song_id: int) -> bool:
+        """
+        Returns True if a song with the given ID is in the list.
+        """
+        return song_id in self._nodes_by_id
+
+    def get_by_song_id(self, song_id: int) -> Song:
+        """
+        Returns the song with the given ID.
+
+        Raises:
+            KeyError: If no song with the given ID is in the list.
+        """
+        return self._nodes_by_id[song_id].song
+
+    def index_of_song_id(self, song_id: int) -> int:
+        """
+        Returns the position (0-indexed) of the song with the given ID.
+
+        Raises:
+            KeyError: If no song with the given ID is in the list.
+        """
+        node = self._nodes_by_id[song_id]
+        index = _size(node.left)
+        while node.parent:
+            if node is node.parent.right:
+                index += _size(node.parent.left) + 1
+            node = node.parent
+        return index
+
+    def remove_song_id(self, song_id: int) -> Song:
+        """
+        Removes the song with the given ID and returns it.
+
+        Raises:
+            KeyError: If no song with the given ID is in the list.
+        """
+        return self._remove_at(self.index_of_song_id(song_id))
+
+    def move_song_id(self, song_id: int, index: int) -> None:
+        """
+        Moves the song with the given ID to the given position (0-indexed).
+
+        Raises:
+            KeyError: If no song with the given ID is in the list.
+        """
+        song = self.remove_song_id(song_id)
+        self.insert(index, song)
+
+    def swap_song_ids(self, song1_id: int, song2_id: int) -> None:
+        """
+        Swaps the positions of the two songs with the given IDs.
+
+        Raises:
+            KeyError: If either song is not in the list.
+        """
+        node1 = self._nodes_by_id[song1_id]
+        node2 = self._nodes_by_id[song2_id]
+        node1.song, node2.song = node2.song, node1.song
+        self._nodes_by_id[song1_id], self._nodes_by_id[song2_id] = node2, node1
+
+    def shuffle(self, rng: random.Random) -> None:
+        """
+        Shuffles the songs in place with Fisher–Yates in O(n).
+
+        The tree keeps its shape; only the songs held by its nodes are permuted.
+
+        Args:
+            rng (random.Random): The random number generator to draw from.
+        """
+        nodes = []
+        stack = []
+        node = self._root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            nodes.append(node)
+            node = node.right
+
+        for i in range(len(nodes) - 1, 0, -1):
+            j = rng.randrange(i + 1)
+            nodes[i].song, nodes[j].song = nodes[j].song, nodes[i].song
+        for node in nodes:
+            self._nodes_by_id[node.song.id] = node
+
+    ##################################################
+    # Aggregates
+    ##################################################
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        Returns the running aggregates of the list.
+
+        Returns:
+            dict[str, Any]: The length, the total duration, the count and duration per genre,
+                and the count per year (sorted by year).
+        """
+        return {
+            "length": len(self),
+            "duration": self.total_duration,
+            "genres": {
+                genre: {"count": count, "duration": self._genre_durations[genre]}
+                for genre, count in self._genre_counts.items()
+            },
+            "years": dict(sorted(self._year_counts.items())),
+        }
+
+    def _count_song(self, song: Song, sign: int) -> None:
+        """Adds (sign 1) or removes (sign -1) a song from the running aggregates."""
+        self.total_duration += sign * song.duration
+        self._genre_counts[song.genre] += sign
+        self._genre_durations[song.genre] += sign * song.duration
+        self._year_counts[song.year] += sign
+        # Drop genres and years that no longer have any song
+        if not self._genre_counts[song.genre]:
+            del self._genre_counts[song.genre]
+            del self._genre_durations[song.genre]
+        if not self._year_counts[song.year]:
+            del self._year_counts[song.year]
+
+    ##################################################
+    # Helpers
+    ##################################################
+
+    def _normalize_index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("IndexedSongList index out of range")
+        return index
+
+    def _node_at(self, index: int) -> _Node:
+        node = self._root
+        while True:
+            left_size = _size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node
+            else:
+                index -= left_size + 1
+                node = node.right
+
+    def _iter_from(self, index: int) -> Iterator[Song]:
+        """Yields the songs from the given position (0-indexed) on, in O(log n) plus O(1) per song."""
+        # Keep the nodes still to visit, as in __iter__, starting from the path down to index
+        stack = []
+        node = self._root
+        while node:
+            left_size = _size(node.left)
+            if index <= left_size:
+                stack.append(node)
+                if index == left_size:
+                    break
+                node = node.left
+            else:
+                index -= left_size + 1
+                node = node.right
+        while stack:
+            node = stack.pop()
+            yield node.song
+            node = node.right
+            while node:
+                stack.append(node)
+                node = node.left
+
+    def _remove_at(self, index: int) -> Song:
+        left, rest = _split(self._root, index)
+        node, right = _split(rest, 1)
+        self._set_root(_merge(left, right))
+        del self._nodes_by_id[node.song.id]
+        self._count_song(node.song, -1)
+        return node.song
+
+    def _set_root(self, root: Optional[_Node]) -> None:
+        self._root = root
+        if root:
+            root.parent = None
@@ -0,0 +1,194 @@
+from collections import Counter
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Mapping, Optional
+
+from music_collection.utils.logger import configure_logger
+from music_collection.utils.sql_utils import get_db_connection
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Plays are held in memory and written together once this many are pending...
+PLAY_LOG_BATCH_SIZE = int(os.getenv("PLAY_LOG_BATCH_SIZE", "100"))
+# ...or once the oldest pending play is this many seconds old
+PLAY_LOG_FLUSH_SECONDS = int(os.getenv("PLAY_LOG_FLUSH_SECONDS", "5"))
+
+# Longest window get_trending_songs accepts. Minute and hour buckets older than this (plus an hour,
+# for the partial hour at the start of a window) are pruned as plays are written.
+MAX_TRENDING_WINDOW_MINUTES = 7 * 24 * 60
+
+# Plays recorded but not written yet, as (song_id, ts)
+_pending_plays: list[tuple[int, int]] = []
+_pending_lock = threading.Lock()
+
+
+def record_plays(play_counts: Mapping[int, int], ts: Optional[int] = None) -> None:
+    """
+    Records plays in the play log. They are written in batches, see flush_plays.
+
+    If a batch is due but cannot be written, the error is logged and the plays stay pending
+    for the next flush, so a failing play log never fails the play itself.
+
+    Args:
+        play_counts (Mapping[int, int]): The number of plays, by song ID.
+        ts (int, optional): When the songs were played, in seconds since the epoch. Defaults to now.
+    """
+    ts = int(time.time()) if ts is None else ts
+    with _pending_lock:
+        for song_id, count in play_counts.items():
+            _pending_plays.extend([(song_id, ts)] * count)
+        due = len(_pending_plays) >= PLAY_LOG_BATCH_SIZE or (
+            _pending_plays and ts - _pending_plays[0][1] >= PLAY_LOG_FLUSH_SECONDS
+        )
+    if due:
+        try:
+            flush_plays()
+        except sqlite3.Error:
+            logger.warning("Keeping %d plays pending until the next flush", len(_pending_plays))
+
+
+def flush_plays() -> int:
+    """
+    Writes every pending play to the plays table and rolls them up into the minute and hour buckets,
+    in one transaction.
+
+    Returns:
+        int: The number of plays written.
+
+    Raises:
+        sqlite3.Error: If writing fails. The plays stay pending and are retried on the next flush.
+    """
+    global _pending_plays
+
+    with _pending_lock:
+        plays, _pending_plays = _pending_plays, []
+    if not plays:
+        return 0
+
+    minute_counts = Counter((ts // 60, song_id) for song_id, ts in plays)
+    hour_counts = Counter((ts // 3600, song_id) for song_id, ts in plays)
+    oldest_minute = max(ts for _, ts in plays) // 60 - MAX_TRENDING_WINDOW_MINUTES - 60
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("INSERT INTO plays (song_id, ts) VALUES (?, ?)", plays)
+            for table, counts in (("play_counts_minute", minute_counts), ("play_counts_hour", hour_counts)):
+                cursor.executemany(f"""
+                    INSERT INTO {table} (bucket, song_id, plays) VALUES (?, ?, ?)
+                    ON CONFLICT (bucket, song_id) DO UPDATE SET plays = plays + excluded.plays
+                """, [(bucket, song_id, count) for (bucket, song_id), count in counts.items()])
+            cursor.execute("DELETE FROM play_counts_minute WHERE bucket < ?", (oldest_minute,))
+            cursor.execute("DELETE FROM play_counts_hour WHERE bucket < ?", (oldest_minute // 60,))
+            conn.commit()
+
+        logger.info("Wrote %d plays to the play log", len(plays))
+        return len(plays)
+
+    except sqlite3.Error as e:
+        with _pending_lock:
+            _pending_plays = plays + _pending_plays
+        logger.error("Database error while writing the play log: %s", str(e))
+        raise e
+
+
+def get_trending_songs(window_minutes: int = 60, top_n: int = 10, now: Optional[int] = None) -> list[dict[str, Any]]:
+    """
+    Gets the most played non-deleted songs over the last window_minutes minutes.
+
+    Whole hours in the window are read from the hour buckets and only the partial hours at
+    either end from the minute buckets, so the cost depends on the window, not on the number of plays.
+
+    Pending plays are written first. If that fails, the error is logged and the trending songs
+    are read from the plays already written.
+
+    Args:
+        window_minutes (int): The length of the window, up to MAX_TRENDING_WINDOW_MINUTES. Default is one hour.
+        top_n (int): The number of songs to return. Default is 10.
+        now (int, optional): The end of the window, in seconds since the epoch. Defaults to now.
+
+    Returns:
+        list[dict[str, Any]]: The songs with their number of plays in the window, most played first.
+
+    Raises:
+        ValueError: If window_minutes or top_n is invalid.
+        sqlite3.Error: For any database errors.
+    """
+    if not isinstance(window_minutes, int) or window_minutes < 1 or window_minutes > MAX_TRENDING_WINDOW_MINUTES:
+        logger.error("Invalid window_minutes parameter: %s", window_minutes)
+        raise ValueError(f"Invalid window_minutes: {window_minutes} (must be an integer between 1 and {MAX_TRENDING_WINDOW_MINUTES}).")
+    if not isinstance(top_n, int) or top_n < 1:
+        logger.error("Invalid top_n parameter: %s", top_n)
+        raise ValueError(f"Invalid top_n: {top_n} (must be a positive integer).")
+
+    try:
+        flush_plays()
+    except sqlite3.Error:
+        logger.warning("Serving trending songs without the %d pending plays", len(_pending_plays))
+
+    end_minute = (int(time.time()) if now is None else now) // 60
+    start_minute = end_minute - window_minutes + 1
+    first_hour, last_hour, minute_ranges = _window_buckets(start_minute, end_minute)
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT s.id, s.artist, s.title, s.year, s.genre, s.duration, t.plays
+                FROM (
+                    SELECT song_id, SUM(plays) AS plays
+                    FROM (
+                        SELECT song_id, plays FROM play_counts_hour WHERE bucket BETWEEN ? AND ?
+                        UNION ALL
+                        SELECT song_id, plays FROM play_counts_minute WHERE bucket BETWEEN ? AND ?
+                        UNION ALL
+                        SELECT song_id, plays FROM play_counts_minute WHERE bucket BETWEEN ? AND ?
+                    )
+                    GROUP BY song_id
+                ) t
+                JOIN songs s ON s.id = t.song_id
+                WHERE s.deleted = FALSE
+                ORDER BY t.plays DESC, s.id
+                LIMIT ?
+            """, (first_hour, last_hour, *minute_ranges[0], *minute_ranges[1], top_n))
+            rows = cursor.fetchall()
+
+        logger.info("Retrieved %d trending songs over the last %d minutes", len(rows), window_minutes)
+        return [
+            {
+                "id": row[0],
+                "artist": row[1],
+                "title": row[2],
+                "year": row[3],
+                "genre": row[4],
+                "duration": row[5],
+                "plays": row[6],
+            }
+            for row in rows
+        ]
+
+    except sqlite3.Error as e:
+        logger.error("Database error while retrieving trending songs: %s", str(e))
+        raise e
+
+
+def _window_buckets(start_minute: int, end_minute: int) -> tuple[int, int, list[tuple[int, int]]]:
+    """
+    Splits the minutes start_minute to end_minute (inclusive) into whole hours and the leftover minutes.
+
+    Returns:
+        The first and last whole hour (an empty range if there is none) and the two inclusive
+        ranges of leftover minutes before and after them (empty ranges have start > end).
+    """
+    first_hour = -(-start_minute // 60)  # first hour starting at or after start_minute
+    last_hour = (end_minute + 1) // 60 - 1  # last hour ending at or before end_minute
+    if first_hour > last_hour:
+        # No whole hour in the window: read every minute from the minute buckets
+        return 1, 0, [(start_minute, end_minute), (1, 0)]
+    return first_hour, last_hour, [(start_minute, first_hour * 60 - 1), ((last_hour + 1) * 60, end_minute)]
@@ -1,33 +1,98 @@
+from collections import Counter
+import functools
+import itertools
 import logging
-from typing import List
-from music_collection.models.song_model import Song, update_play_count
+import random
+import threading
+from typing import Any, Callable, List, Optional, TypeVar
+from music_collection.models.indexed_song_list import IndexedSongList
+from music_collection.models.playlist_snapshot import SNAPSHOT_CHUNK_SIZE, PlaylistSnapshot
+from music_collection.models.song_model import Song, update_play_count, update_play_counts
 from music_collection.utils.logger import configure_logger
+from music_collection.utils.random_utils import get_random_seed
+from music_collection.utils.rw_lock import RWLock
+from music_collection.utils.shuffle_utils import LazyShuffle
 
 logger = logging.getLogger(__name__)
 configure_logger(logger)
 
 
+_Method = TypeVar("_Method", bound=Callable[..., Any])
+
+# Shared by every playlist, so no two states of any playlist in this process get the same version
+_versions = itertools.count(1)
+
+
+def _reads(method: _Method) -> _Method:
+    """Runs the method holding the playlist's lock for reading."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.read_lock():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _writes(method: _Method) -> _Method:
+    """Runs the method holding the playlist's lock for writing."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.write_lock():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class PlaylistModel:
     """
     A class to manage a playlist of songs.
 
     Attributes:
         current_track_number (int): The current track number being played.
-        playlist (List[Song]): The list of songs in the playlist.
-
+        playlist (IndexedSongList): The songs in the playlist, indexed by song ID.
+        playlist_id (Optional[int]): The ID of the stored playlist, or None if it is not stored.
+        name (Optional[str]): The name of the stored playlist.
+        shuffle_play (bool): If True, play_current_song moves on to a random track that has not
+            been played yet in the current round, instead of the next one.
+        lock (RWLock): Taken for reading by the retrieval methods and for writing by the methods
+            that change the playlist, so a model can be shared between request threads.
+        version (int): Goes up every time the songs change, and is never shared with another playlist.
+        save_lock (threading.Lock): Held while the playlist is written to the database, so two saves
+            of one playlist never overlap. Readers and writers of the playlist do not wait for it.
+
+    Every change made through these methods is remembered until mark_saved is called, so a
+    stored playlist only rewrites the positions that changed.
     """
 
-    def __init__(self):
+    def __init__(self, playlist_id: Optional[int] = None, name: Optional[str] = None):
         """
         Initializes the PlaylistModel with an empty playlist and the current track set to 1.
+
+        Args:
+            playlist_id (int, optional): The ID of the stored playlist this model holds.
+            name (str, optional): The name of the stored playlist.
         """
         self.current_track_number = 1
-        self.playlist: List[Song] = []
+        self.playlist = IndexedSongList()
+        self.playlist_id = playlist_id
+        self.name = name
+        self._changed_positions: set[int] = set()
+        self._saved_length = 0
+        self._saved_track_number = 1
+        self.shuffle_play = False
+        self._saved_shuffle_play = False
+        self._rng: Optional[random.Random] = None
+        self._shuffle_order: Optional[LazyShuffle] = None
+        self.lock = RWLock()
+        self.save_lock = threading.Lock()
+        self.version = next(_versions)
+        self._snapshot: Optional[PlaylistSnapshot] = None
+        self._snapshot_lock = threading.Lock()
+        self._stale_chunks: set[int] = set()
 
     ##################################################
     # Song Management Functions
     ##################################################
 
+    @_writes
     def add_song_to_playlist(self, song: Song) -> None:
         """
         Adds a song to the playlist.
@@ -45,12 +110,49 @@ class PlaylistModel:
             raise TypeError("Song is not a valid song")
 
         song_id = self.validate_song_id(song.id, check_in_playlist=False)
-        if song_id in [song_in_playlist.id for song_in_playlist in self.playlist]:
+        if self.playlist.has_song_id(song_id):
             logger.error("Song with ID %d already exists in the playlist", song.id)
             raise ValueError(f"Song with ID {song.id} already exists in the playlist")
 
         self.playlist.append(song)
+        self._mark_changed(len(self.playlist) - 1)
+
+    @_writes
+    def add_songs(self, songs: List[Song]) -> dict[int, str]:
+        """
+        Adds many songs to the end of the playlist in one step, skipping the ones already in it.
+
+        Args:
+            songs (List[Song]): The songs to add, in order.
+
+        Returns:
+            dict[int, str]: An error message for each song that was skipped, by its index in songs.
 
+        Raises:
+            TypeError: If any song is not a valid Song instance. Nothing is added then.
+        """
+        logger.info("Adding %d songs to playlist", len(songs))
+        if not all(isinstance(song, Song) for song in songs):
+            logger.error("Song is not a valid song")
+            raise TypeError("Song is not a valid song")
+
+        errors = {}
+        new_songs = []
+        new_ids = set()
+        for index, song in enumerate(songs):
+            if self.playlist.has_song_id(song.id) or song.id in new_ids:
+                errors[index] = f"Song with ID {song.id} already exists in the playlist"
+                continue
+            new_ids.add(song.id)
+            new_songs.append(song)
+
+        start = len(self.playlist)
+        self.playlist.extend(new_songs)
+        self._mark_changed(start, len(self.playlist))
+        logger.info("Added %d songs to playlist, skipped %d", len(new_songs), len(errors))
+        return errors
+
+    @_writes
     def remove_song_by_song_id(self, song_id: int) -> None:
         """
         Removes a song from the playlist by its song ID.
@@ -64,9 +166,12 @@ class PlaylistModel:
         logger.info("Removing song with id %d from playlist", song_id)
         self.check_if_empty()
         song_id = self.validate_song_id(song_id)
-        self.playlist = [song_in_playlist for song_in_playlist in self.playlist if song_in_playlist.id != song_id]
+        playlist_index = self.playlist.index_of_song_id(song_id)
+        self.playlist.remove_song_id(song_id)
+        self._mark_changed(playlist_index, len(self.playlist))
         logger.info("Song with id %d has been removed", song_id)
 
+    @_writes
     def remove_song_by_track_number(self, track_number: int) -> None:
         """
         Removes a song from the playlist by its track number (1-indexed).
@@ -83,7 +188,9 @@ class PlaylistModel:
         playlist_index = track_number - 1
         logger.info("Removing song: %s", self.playlist[playlist_index].title)
         del self.playlist[playlist_index]
+        self._mark_changed(playlist_index, len(self.playlist))
 
+    @_writes
     def clear_playlist(self) -> None:
         """
         Clears all songs from the playlist. If the playlist is already empty, logs a warning.
@@ -92,6 +199,10 @@ class PlaylistModel:
         if self.get_playlist_length() == 0:
             logger.warning("Clearing an empty playlist")
         self.playlist.clear()
+        self._changed_positions.clear()
+        self._shuffle_order = None
+        self._stale_chunks.clear()
+        self.version = next(_versions)
 
     ##################################################
     # Playlist Retrieval Functions
@@ -99,12 +210,55 @@ class PlaylistModel:
 
     def get_all_songs(self) -> List[Song]:
         """
-        Returns a list of all songs in the playlist.
+        Returns a list of all songs in the playlist, copied from the current snapshot.
         """
-        self.check_if_empty()
+        snapshot = self.get_snapshot()
+        if not snapshot:
+            logger.error("Playlist is empty")
+            raise ValueError("Playlist is empty")
         logger.info("Getting all songs in the playlist")
-        return self.playlist
+        return list(snapshot)
+
+    def get_snapshot(self) -> PlaylistSnapshot:
+        """
+        Returns an immutable snapshot of the songs at the current version.
+
+        The snapshot is reused until the songs change, and returned without taking any lock
+        while it is current. A new one is built on the first read after a change, sharing
+        every chunk that did not change with the previous one.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
+
+        with self.lock.read_lock(), self._snapshot_lock:
+            if self._snapshot is None or self._snapshot.version != self.version:
+                self._snapshot = self._build_snapshot()
+            return self._snapshot
+
+    def _build_snapshot(self) -> PlaylistSnapshot:
+        """
+        Builds the snapshot of the current version, copying only the chunks that changed
+        since the previous one. Must be called holding the lock for reading.
+        """
+        previous = self._snapshot
+        length = len(self.playlist)
+        chunks = []
+        reused = 0
+        for chunk_index, start in enumerate(range(0, length, SNAPSHOT_CHUNK_SIZE)):
+            end = min(start + SNAPSHOT_CHUNK_SIZE, length)
+            chunk = previous.get_chunk(chunk_index) if previous is not None else None
+            if chunk is not None and chunk_index not in self._stale_chunks and len(chunk) == end - start:
+                reused += 1
+            else:
+                chunk = tuple(self.playlist[start:end])
+            chunks.append(chunk)
+        self._stale_chunks.clear()
 
+        logger.info("Built snapshot of version %d (%d of %d chunks reused)", self.version, reused, len(chunks))
+        return PlaylistSnapshot(self.version, tuple(chunks), self.playlist.total_duration)
+
+    @_reads
     def get_song_by_song_id(self, song_id: int) -> Song:
         """
         Retrieves a song from the playlist by its song ID.
@@ -118,8 +272,9 @@ class PlaylistModel:
         self.check_if_empty()
         song_id = self.validate_song_id(song_id)
         logger.info("Getting song with id %d from playlist", song_id)
-        return next((song for song in self.playlist if song.id == song_id), None)
+        return self.playlist.get_by_song_id(song_id)
 
+    @_reads
     def get_song_by_track_number(self, track_number: int) -> Song:
         """
         Retrieves a song from the playlist by its track number (1-indexed).
@@ -136,6 +291,7 @@ class PlaylistModel:
         logger.info("Getting song at track number %d from playlist", track_number)
         return self.playlist[playlist_index]
 
+    @_reads
     def get_current_song(self) -> Song:
         """
         Returns the current song being played.
@@ -143,22 +299,35 @@ class PlaylistModel:
         self.check_if_empty()
         return self.get_song_by_track_number(self.current_track_number)
 
+    @_reads
     def get_playlist_length(self) -> int:
         """
         Returns the number of songs in the playlist.
         """
         return len(self.playlist)
 
+    @_reads
     def get_playlist_duration(self) -> int:
         """
         Returns the total duration of the playlist in seconds.
         """
-        return sum(song.duration for song in self.playlist)
+        return self.playlist.total_duration
+
+    @_reads
+    def get_playlist_stats(self) -> dict:
+        """
+        Returns the length, total duration, count and duration per genre, and count per year of the playlist.
+
+        The aggregates are kept up to date as songs are added and removed, so this does not scan the playlist.
+        """
+        logger.info("Getting playlist stats")
+        return self.playlist.get_stats()
 
     ##################################################
     # Playlist Movement Functions
     ##################################################
 
+    @_writes
     def go_to_track_number(self, track_number: int) -> None:
         """
         Sets the current track number to the specified track number.
@@ -171,6 +340,7 @@ class PlaylistModel:
         logger.info("Setting current track number to %d", track_number)
         self.current_track_number = track_number
 
+    @_writes
     def move_song_to_beginning(self, song_id: int) -> None:
         """
         Moves a song to the beginning of the playlist.
@@ -181,11 +351,10 @@ class PlaylistModel:
         logger.info("Moving song with ID %d to the beginning of the playlist", song_id)
         self.check_if_empty()
         song_id = self.validate_song_id(song_id)
-        song = self.get_song_by_song_id(song_id)
-        self.playlist.remove(song)
-        self.playlist.insert(0, song)
+        self._move_song(song_id, 0)
         logger.info("Song with ID %d has been moved to the beginning", song_id)
 
+    @_writes
     def move_song_to_end(self, song_id: int) -> None:
         """
         Moves a song to the end of the playlist.
@@ -196,11 +365,10 @@ class PlaylistModel:
         logger.info("Moving song with ID %d to the end of the playlist", song_id)
         self.check_if_empty()
         song_id = self.validate_song_id(song_id)
-        song = self.get_song_by_song_id(song_id)
-        self.playlist.remove(song)
-        self.playlist.append(song)
+        self._move_song(song_id, self.get_playlist_length() - 1)
         logger.info("Song with ID %d has been moved to the end", song_id)
 
+    @_writes
     def move_song_to_track_number(self, song_id: int, track_number: int) -> None:
         """
         Moves a song to a specific track number in the playlist.
@@ -214,11 +382,10 @@ class PlaylistModel:
         song_id = self.validate_song_id(song_id)
         track_number = self.validate_track_number(track_number)
         playlist_index = track_number - 1
-        song = self.get_song_by_song_id(song_id)
-        self.playlist.remove(song)
-        self.playlist.insert(playlist_index, song)
+        self._move_song(song_id, playlist_index)
         logger.info("Song with ID %d has been moved to track number %d", song_id, track_number)
 
+    @_writes
     def swap_songs_in_playlist(self, song1_id: int, song2_id: int) -> None:
         """
         Swaps the positions of two songs in the playlist.
@@ -239,66 +406,287 @@ class PlaylistModel:
             logger.error("Cannot swap a song with itself, both song IDs are the same: %d", song1_id)
             raise ValueError(f"Cannot swap a song with itself, both song IDs are the same: {song1_id}")
 
-        song1 = self.get_song_by_song_id(song1_id)
-        song2 = self.get_song_by_song_id(song2_id)
-        index1 = self.playlist.index(song1)
-        index2 = self.playlist.index(song2)
-        self.playlist[index1], self.playlist[index2] = self.playlist[index2], self.playlist[index1]
+        self.playlist.swap_song_ids(song1_id, song2_id)
+        self._mark_changed(self.playlist.index_of_song_id(song1_id))
+        self._mark_changed(self.playlist.index_of_song_id(song2_id))
         logger.info("Swapped songs with IDs %d and %d", song1_id, song2_id)
 
+    @_writes
+    def apply_operations(self, operations: List[dict[str, Any]]) -> None:
+        """
+        Applies an ordered batch of edits to the playlist, all or nothing.
+
+        Each operation is a dict with an 'op' key and its arguments:
+            - move: song_id, track_number
+            - swap: song1_id, song2_id
+            - remove: song_id or track_number
+            - insert: song (Song), and optionally track_number (defaults to the end)
+
+        Each operation is checked against the playlist as left by the ones before it. If any
+        operation is invalid, the ones already applied are undone and the playlist is unchanged.
+        The changed positions are recorded once for the whole batch.
+
+        Args:
+            operations (List[dict[str, Any]]): The operations, in the order to apply them.
+
+        Raises:
+            ValueError: If an operation is unknown or invalid. The message names the operation (1-indexed).
+            TypeError: If an insert operation is not given a valid Song instance.
+        """
+        logger.info("Applying %d operations to playlist", len(operations))
+        undo: List[Callable[[], None]] = []
+        spans: List[tuple[int, int]] = []
+        try:
+            for number, operation in enumerate(operations, start=1):
+                try:
+                    inverse, changed = self._apply_operation(operation)
+                except (ValueError, TypeError) as e:
+                    raise type(e)(f"Operation {number}: {e}") from e
+                undo.append(inverse)
+                spans.extend(changed)
+        except Exception:
+            logger.error("Undoing %d applied operations", len(undo))
+            for inverse in reversed(undo):
+                inverse()
+            raise
+
+        # Merge the overlapping spans first, so each position is marked once
+        merged: List[tuple[int, int]] = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        for start, end in merged:
+            self._mark_changed(start, min(end, len(self.playlist)))
+        self._shuffle_order = None
+        logger.info("Applied %d operations to playlist", len(operations))
+
+    def _apply_operation(self, operation: dict[str, Any]) -> tuple[Callable[[], None], List[tuple[int, int]]]:
+        """
+        Applies a single patch operation, see apply_operations.
+
+        Returns:
+            The function that undoes it, and the spans of positions it changed (0-indexed, end exclusive).
+        """
+        op = operation.get('op') if isinstance(operation, dict) else None
+
+        if op == 'move':
+            song_id = self.validate_song_id(operation.get('song_id'))
+            index = self.validate_track_number(operation.get('track_number')) - 1
+            from_index = self.playlist.index_of_song_id(song_id)
+            self.playlist.move_song_id(song_id, index)
+            return (lambda: self.playlist.move_song_id(song_id, from_index),
+                    [(min(from_index, index), max(from_index, index) + 1)])
+
+        if op == 'swap':
+            song1_id = self.validate_song_id(operation.get('song1_id'))
+            song2_id = self.validate_song_id(operation.get('song2_id'))
+            if song1_id == song2_id:
+                raise ValueError(f"Cannot swap a song with itself, both song IDs are the same: {song1_id}")
+            index1 = self.playlist.index_of_song_id(song1_id)
+            index2 = self.playlist.index_of_song_id(song2_id)
+            self.playlist.swap_song_ids(song1_id, song2_id)
+            return lambda: self.playlist.swap_song_ids(song1_id, song2_id), [(index1, index1 + 1), (index2, index2 + 1)]
+
+        if op == 'remove':
+            if operation.get('song_id') is not None:
+                index = self.playlist.index_of_song_id(self.validate_song_id(operation['song_id']))
+            else:
+                index = self.validate_track_number(operation.get('track_number')) - 1
+            song = self.playlist[index]
+            del self.playlist[index]
+            return lambda: self.playlist.insert(index, song), [(index, len(self.playlist))]
+
+        if op == 'insert':
+            song = operation.get('song')
+            if not isinstance(song, Song):
+                raise TypeError("Song is not a valid song")
+            song_id = self.validate_song_id(song.id, check_in_playlist=False)
+            if self.playlist.has_song_id(song_id):
+                raise ValueError(f"Song with ID {song_id} already exists in the playlist")
+            index = len(self.playlist)
+            if operation.get('track_number') is not None:
+                try:
+                    index = int(operation['track_number']) - 1
+                except (TypeError, ValueError):
+                    index = -1
+                if index < 0 or index > len(self.playlist):
+                    raise ValueError(f"Invalid track number: {operation['track_number']}")
+            self.playlist.insert(index, song)
+            return lambda: self.playlist.remove_song_id(song_id), [(index, len(self.playlist))]
+
+        raise ValueError(f"Unknown operation: {op!r} (must be one of move, swap, remove, insert).")
+
     ##################################################
     # Playlist Playback Functions
     ##################################################
 
-    def play_current_song(self) -> None:
+    def play_current_song(self) -> Song:
         """
         Plays the current song.
 
+        The playlist is locked only while the track is picked, not while the play count is written.
+
+        Returns:
+            Song: The song that was played, picked under the same lock that moved the track number.
+
         Side-effects:
             Updates the current track number.
             Updates the play count for the song.
         """
-        self.check_if_empty()
-        current_song = self.get_song_by_track_number(self.current_track_number)
-        logger.info("Playing song: %s (ID: %d) at track number: %d", current_song.title, current_song.id, self.current_track_number)
-        update_play_count(current_song.id)
+        with self.lock.write_lock():
+            self.check_if_empty()
+            current_song = self.get_song_by_track_number(self.current_track_number)
+            logger.info("Playing song: %s (ID: %d) at track number: %d", current_song.title, current_song.id, self.current_track_number)
+            previous_track_number = self.current_track_number
+            if self.shuffle_play:
+                self.current_track_number = self._next_shuffled_track_number()
+            else:
+                self.current_track_number = (self.current_track_number % self.get_playlist_length()) + 1
+            track_number = self.current_track_number
+            logger.info("Track number updated from %d to %d", previous_track_number, track_number)
+
+        try:
+            update_play_count(current_song.id)
+        except Exception:
+            self._restore_track_number(previous_track_number, track_number)
+            raise
         logger.info("Updated play count for song: %s (ID: %d)", current_song.title, current_song.id)
-        previous_track_number = self.current_track_number
-        self.current_track_number = (self.current_track_number % self.get_playlist_length()) + 1
-        logger.info("Track number updated from %d to %d", previous_track_number, self.current_track_number)
+        return current_song
 
     def play_entire_playlist(self) -> None:
         """
         Plays the entire playlist.
 
+        The playlist is locked only while the tracks are picked, not while the play counts are written.
+
         Side-effects:
             Resets the current track number to 1.
             Updates the play count for each song.
         """
-        self.check_if_empty()
-        logger.info("Starting to play the entire playlist.")
-        self.current_track_number = 1
-        logger.info("Reset current track number to 1.")
-        for _ in range(self.get_playlist_length()):
-            logger.info("Playing track number: %d", self.current_track_number)
-            self.play_current_song()
+        with self.lock.write_lock():
+            self.check_if_empty()
+            logger.info("Starting to play the entire playlist.")
+            self.current_track_number = 1
+            logger.info("Reset current track number to 1.")
+            play_counts, previous_track_number = self._take_tracks(self.get_playlist_length())
+            track_number = self.current_track_number
+        self._update_play_counts(play_counts, previous_track_number, track_number)
         logger.info("Finished playing the entire playlist. Current track number reset to 1.")
 
     def play_rest_of_playlist(self) -> None:
         """
         Plays the rest of the playlist from the current track.
 
+        The playlist is locked only while the tracks are picked, not while the play counts are written.
+
         Side-effects:
             Updates the current track number back to 1.
             Updates the play count for each song in the rest of the playlist.
         """
-        self.check_if_empty()
-        logger.info("Starting to play the rest of the playlist from track number: %d", self.current_track_number)
-        for _ in range(self.get_playlist_length() - self.current_track_number + 1):
-            logger.info("Playing track number: %d", self.current_track_number)
-            self.play_current_song()
+        with self.lock.write_lock():
+            self.check_if_empty()
+            logger.info("Starting to play the rest of the playlist from track number: %d", self.current_track_number)
+            play_counts, previous_track_number = self._take_tracks(self.get_playlist_length() - self.current_track_number + 1)
+            track_number = self.current_track_number
+        self._update_play_counts(play_counts, previous_track_number, track_number)
         logger.info("Finished playing the rest of the playlist. Current track number reset to 1.")
 
+    def _take_tracks(self, num_tracks: int) -> tuple[Counter, int]:
+        """
+        Picks the given number of tracks starting from the current track, wrapping around at the end,
+        and advances the current track number past the last one. Must be called holding the write lock.
+
+        Args:
+            num_tracks (int): The number of tracks to play.
+
+        Returns:
+            tuple[Counter, int]: The number of plays by song ID, and the track number before advancing.
+        """
+        playlist_length = self.get_playlist_length()
+        start_index = self.current_track_number - 1
+        song_ids = [song.id for song in self.playlist]
+        play_counts = Counter(
+            song_ids[(start_index + offset) % playlist_length] for offset in range(num_tracks)
+        )
+
+        previous_track_number = self.current_track_number
+        self.current_track_number = (start_index + num_tracks) % playlist_length + 1
+        logger.info("Track number updated from %d to %d", previous_track_number, self.current_track_number)
+        return play_counts, previous_track_number
+
+    def _update_play_counts(self, play_counts: Counter, previous_track_number: int, track_number: int) -> None:
+        """
+        Writes the play counts of tracks taken by _take_tracks in a single transaction, without holding the lock.
+
+        If the write fails, the current track number goes back from track_number to previous_track_number,
+        unless another thread changed it in the meantime.
+        """
+        try:
+            update_play_counts(play_counts)
+        except Exception:
+            self._restore_track_number(previous_track_number, track_number)
+            raise
+        logger.info("Updated play counts for %d tracks (%d songs)", sum(play_counts.values()), len(play_counts))
+
+    def _restore_track_number(self, previous_track_number: int, track_number: int) -> None:
+        """
+        Puts the current track number back to previous_track_number after a failed play count write,
+        unless another thread moved it from track_number in the meantime.
+        """
+        with self.lock.write_lock():
+            if self.current_track_number == track_number:
+                self.current_track_number = previous_track_number
+                logger.info("Track number restored from %d to %d", track_number, previous_track_number)
+
+    @_writes
+    def shuffle_playlist(self) -> None:
+        """
+        Shuffles the order of the songs in the playlist and rewinds to the first track.
+
+        The shuffle runs locally; the random number generator is seeded once per playlist
+        from the configured entropy provider.
+        """
+        self.check_if_empty()
+        logger.info("Shuffling playlist of %d songs", self.get_playlist_length())
+        self.playlist.shuffle(self._get_rng())
+        self._mark_changed(0, self.get_playlist_length())
+        self.current_track_number = 1
+
+    @_writes
+    def set_shuffle_play(self, enabled: bool) -> None:
+        """
+        Turns shuffle play on or off. The order of the songs in the playlist is not changed.
+
+        Args:
+            enabled (bool): True to play the songs in a random order.
+        """
+        logger.info("Setting shuffle play to %s", enabled)
+        self.shuffle_play = bool(enabled)
+        self._shuffle_order = None
+
+    def _next_shuffled_track_number(self) -> int:
+        """
+        Returns the next track number of the shuffled play order, starting a new round once every
+        track has been played. The order is drawn lazily and never copies the playlist.
+
+        A new round never starts with the current track, so a track is not played twice in a row.
+        """
+        if self._shuffle_order is None or not self._shuffle_order.remaining():
+            self._shuffle_order = LazyShuffle(self.get_playlist_length(), self._get_rng(),
+                                              not_first=self.current_track_number - 1)
+        return next(self._shuffle_order) + 1
+
+    def _get_rng(self) -> random.Random:
+        """
+        Returns the random number generator of this playlist, seeding it on first use.
+        """
+        if self._rng is None:
+            self._rng = random.Random(get_random_seed())
+        return self._rng
+
+    @_writes
     def rewind_playlist(self) -> None:
         """
         Rewinds the playlist to the beginning.
@@ -307,6 +695,100 @@ class PlaylistModel:
         logger.info("Rewinding playlist to the beginning.")
         self.current_track_number = 1
 
+    ##################################################
+    # Change Tracking Functions
+    ##################################################
+
+    @_reads
+    def has_unsaved_changes(self) -> bool:
+        """
+        Returns True if the songs, the current track number or shuffle play changed since the last mark_saved.
+        """
+        return (bool(self._changed_positions) or len(self.playlist) != self._saved_length
+                or self.current_track_number != self._saved_track_number
+                or self.shuffle_play != self._saved_shuffle_play)
+
+    @_reads
+    def get_changed_tracks(self) -> List[tuple[int, int]]:
+        """
+        Returns the (position, song ID) of every track that changed since the last mark_saved,
+        ordered by position. Positions are 0-indexed.
+
+        Positions at or past the current length are not included; they were removed.
+        """
+        return [
+            (position, self.playlist[position].id)
+            for position in sorted(self._changed_positions)
+            if position < len(self.playlist)
+        ]
+
+    @_reads
+    def get_unsaved_changes(self) -> Optional[dict[str, Any]]:
+        """
+        Returns everything a save has to write, taken at one instant, or None if nothing changed.
+
+        Returns:
+            Optional[dict[str, Any]]: The version, the changed tracks (as get_changed_tracks),
+                the length, the current track number and shuffle play. Pass it to mark_saved
+                once it is written.
+        """
+        if not (self._changed_positions or len(self.playlist) != self._saved_length
+                or self.current_track_number != self._saved_track_number
+                or self.shuffle_play != self._saved_shuffle_play):
+            return None
+        return {
+            "version": self.version,
+            "tracks": [
+                (position, self.playlist[position].id)
+                for position in sorted(self._changed_positions)
+                if position < len(self.playlist)
+            ],
+            "length": len(self.playlist),
+            "current_track_number": self.current_track_number,
+            "shuffle_play": self.shuffle_play
+        }
+
+    @_writes
+    def mark_saved(self, changes: Optional[dict[str, Any]] = None) -> None:
+        """
+        Marks the current songs, track number and shuffle play as saved.
+
+        Args:
+            changes (dict, optional): What get_unsaved_changes returned, if only that was written.
+                The songs are then marked as saved only if they did not change since, and the
+                track number and shuffle play are remembered as written, so later changes stay unsaved.
+        """
+        if changes is None:
+            changes = {
+                "version": self.version,
+                "length": len(self.playlist),
+                "current_track_number": self.current_track_number,
+                "shuffle_play": self.shuffle_play
+            }
+        if changes["version"] == self.version:
+            self._changed_positions.clear()
+            self._saved_length = changes["length"]
+        self._saved_track_number = changes["current_track_number"]
+        self._saved_shuffle_play = changes["shuffle_play"]
+
+    def _mark_changed(self, start: int, end: Optional[int] = None) -> None:
+        """
+        Remembers that the tracks at positions start to end (exclusive, defaults to start + 1) changed.
+        """
+        end = start + 1 if end is None else end
+        self._changed_positions.update(range(start, end))
+        self._stale_chunks.update(range(start // SNAPSHOT_CHUNK_SIZE, (end - 1) // SNAPSHOT_CHUNK_SIZE + 1))
+        self._shuffle_order = None
+        self.version = next(_versions)
+
+    def _move_song(self, song_id: int, playlist_index: int) -> None:
+        """
+        Moves a song to the given position (0-indexed), remembering the positions that shifted.
+        """
+        from_index = self.playlist.index_of_song_id(song_id)
+        self.playlist.move_song_id(song_id, playlist_index)
+        self._mark_changed(min(from_index, playlist_index), max(from_index, playlist_index) + 1)
+
     ##################################################
     # Utility Functions
     ##################################################
@@ -333,7 +815,7 @@ class PlaylistModel:
             raise ValueError(f"Invalid song id: {song_id}")
 
         if check_in_playlist:
-            if song_id not in [song_in_playlist.id for song_in_playlist in self.playlist]:
+            if not self.playlist.has_song_id(song_id):
                 logger.error("Song with id %d not found in playlist", song_id)
                 raise ValueError(f"Song with id {song_id} not found in playlist")
 
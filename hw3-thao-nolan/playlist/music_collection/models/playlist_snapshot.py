@@ -0,0 +1,51 @@
+from itertools import chain
+from typing import Iterator, Optional
+
+from music_collection.models.song_model import Song
+
+
+# Number of songs per chunk of a snapshot. A new snapshot rebuilds only the chunks that
+# changed since the previous one and shares the others with it.
+SNAPSHOT_CHUNK_SIZE = 256
+
+
+class PlaylistSnapshot:
+    """
+    An immutable view of the songs of a playlist as they were at one version.
+
+    The songs are held in tuples of SNAPSHOT_CHUNK_SIZE songs, so a snapshot can share the
+    chunks that did not change with the one before it. Reading a snapshot needs no lock.
+
+    Attributes:
+        version (int): The version of the playlist the snapshot was taken at.
+        duration (int): The total duration of the songs, in seconds.
+    """
+    __slots__ = ("version", "duration", "_chunks", "_length")
+
+    def __init__(self, version: int, chunks: tuple[tuple[Song, ...], ...], duration: int):
+        self.version = version
+        self.duration = duration
+        self._chunks = chunks
+        self._length = sum(len(chunk) for chunk in chunks)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Song]:
+        return chain.from_iterable(self._chunks)
+
+    def __getitem__(self, index: int) -> Song:
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise IndexError("PlaylistSnapshot index out of range")
+        return self._chunks[index // SNAPSHOT_CHUNK_SIZE][index % SNAPSHOT_CHUNK_SIZE]
+
+    def __repr__(self) -> str:
+        return f"PlaylistSnapshot(version={self.version}, length={self._length})"
+
+    def get_chunk(self, chunk_index: int) -> Optional[tuple[Song, ...]]:
+        """
+        Returns the songs of the given chunk, or None if the snapshot has no such chunk.
+        """
+        return self._chunks[chunk_index] if chunk_index < len(self._chunks) else None
@@ -0,0 +1,351 @@
+from collections import Counter, OrderedDict
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Optional
+
+from music_collection.models.indexed_song_list import IndexedSongList
+from music_collection.models.playlist_model import PlaylistModel
+from music_collection.models.song_model import Song
+from music_collection.utils.logger import configure_logger
+from music_collection.utils.sql_utils import get_db_connection
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Most playlists kept loaded in memory before the least recently used one is dropped
+PLAYLIST_CACHE_SIZE = int(os.getenv("PLAYLIST_CACHE_SIZE", "1000"))
+
+# Loaded playlists by name, in least to most recently used order
+_hot_playlists: "OrderedDict[str, PlaylistModel]" = OrderedDict()
+# Evicted playlists waiting to be saved, by name. get_playlist takes them back rather than reload them
+_evicting: dict[str, PlaylistModel] = {}
+# How many requests are using each loaded playlist, by name. A pinned playlist is never evicted
+_pins: "Counter[str]" = Counter()
+# Guards _hot_playlists, _evicting and _pins, so request threads never load or create the same playlist twice
+_store_lock = threading.RLock()
+
+
+def create_playlist(name: str) -> PlaylistModel:
+    """
+    Creates a new, empty stored playlist.
+
+    Args:
+        name (str): The unique name of the playlist.
+
+    Returns:
+        PlaylistModel: The new playlist, already loaded.
+
+    Raises:
+        ValueError: If the name is empty or a playlist with the same name already exists.
+        sqlite3.Error: For any other database errors.
+    """
+    with _store_lock:
+        playlist_model = _create_playlist(name)
+    _save_evicted()
+    return playlist_model
+
+
+def _create_playlist(name: str) -> PlaylistModel:
+    """
+    Creates a playlist for create_playlist. Must be called holding _store_lock.
+    """
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError(f"Invalid playlist name: {name!r} (must be a non-empty string).")
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO playlists (name) VALUES (?)", (name,))
+            conn.commit()
+            playlist_id = cursor.lastrowid
+
+        logger.info("Playlist '%s' created with ID %d", name, playlist_id)
+        return _remember(PlaylistModel(playlist_id=playlist_id, name=name))
+
+    except sqlite3.IntegrityError as e:
+        logger.error("Playlist '%s' already exists.", name)
+        raise ValueError(f"Playlist '{name}' already exists.") from e
+    except sqlite3.Error as e:
+        logger.error("Database error while creating playlist: %s", str(e))
+        raise e
+
+
+def get_playlist(name: str, create: bool = False, pin: bool = False) -> PlaylistModel:
+    """
+    Returns the stored playlist with the given name, loading it from the database if it is not in memory.
+
+    Args:
+        name (str): The name of the playlist.
+        create (bool): If True, an empty playlist is created when none has this name.
+        pin (bool): If True, the playlist is not evicted until release_playlist is called for it,
+            so everyone using it meanwhile gets this instance.
+
+    Returns:
+        PlaylistModel: The playlist. The same instance is returned until it is evicted.
+
+    Raises:
+        ValueError: If no playlist has this name and create is False.
+        sqlite3.Error: For any database errors.
+    """
+    with _store_lock:
+        # Pinned first, so loading it cannot evict it
+        if pin:
+            _pins[name] += 1
+        try:
+            playlist_model = _get_playlist(name, create)
+        except Exception:
+            if pin:
+                _unpin(name)
+            raise
+    _save_evicted()
+    return playlist_model
+
+
+def release_playlist(playlist_model: PlaylistModel) -> None:
+    """
+    Unpins a playlist returned by get_playlist with pin=True, evicting (and saving) playlists over
+    PLAYLIST_CACHE_SIZE that were kept while pinned.
+    """
+    with _store_lock:
+        _unpin(playlist_model.name)
+        _evict()
+    _save_evicted()
+
+
+def _unpin(name: str) -> None:
+    """
+    Drops one pin from a playlist. Must be called holding _store_lock.
+    """
+    _pins[name] -= 1
+    if _pins[name] <= 0:
+        del _pins[name]
+
+
+def _get_playlist(name: str, create: bool) -> PlaylistModel:
+    """
+    Loads a playlist for get_playlist. Must be called holding _store_lock.
+    """
+    playlist_model = _hot_playlists.get(name)
+    if playlist_model is not None:
+        _hot_playlists.move_to_end(name)
+        return playlist_model
+    if name in _evicting:
+        # Its unsaved changes may not be written yet, so the database copy could be stale
+        return _remember(_evicting.pop(name))
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, current_track_number, shuffle_play FROM playlists WHERE name = ?", (name,))
+            row = cursor.fetchone()
+            if row is None:
+                if not create:
+                    logger.info("Playlist '%s' not found", name)
+                    raise ValueError(f"Playlist '{name}' not found")
+                rows = None
+            else:
+                playlist_id, current_track_number, shuffle_play = row
+                cursor.execute("""
+                    SELECT s.id, s.artist, s.title, s.year, s.genre, s.duration
+                    FROM playlist_tracks pt
+                    JOIN songs s ON s.id = pt.song_id
+                    WHERE pt.playlist_id = ?
+                    ORDER BY pt.position
+                """, (playlist_id,))
+                rows = cursor.fetchall()
+
+        if rows is None:
+            logger.info("Playlist '%s' not found, creating it", name)
+            return _create_playlist(name)
+
+        playlist_model = PlaylistModel(playlist_id=playlist_id, name=name)
+        playlist_model.playlist = IndexedSongList(
+            Song(id=row[0], artist=row[1], title=row[2], year=row[3], genre=row[4], duration=row[5])
+            for row in rows
+        )
+        playlist_model.current_track_number = current_track_number
+        playlist_model.shuffle_play = bool(shuffle_play)
+        playlist_model.mark_saved()
+
+        logger.info("Loaded playlist '%s' with %d songs", name, len(rows))
+        return _remember(playlist_model)
+
+    except sqlite3.Error as e:
+        logger.error("Database error while loading playlist '%s': %s", name, str(e))
+        raise e
+
+
+def save_playlist(playlist_model: PlaylistModel) -> None:
+    """
+    Writes the changes made to a stored playlist since it was last saved, in one transaction.
+
+    Only the positions that changed are rewritten, positions past the end are deleted,
+    and the current track number and shuffle play are updated.
+
+    The changes are copied under the playlist's read lock and written without it, so requests
+    reading the playlist never wait for the database. A change made while the copy is written
+    stays unsaved for the next save. Saves of one playlist are serialized by its save_lock.
+
+    Args:
+        playlist_model (PlaylistModel): The playlist to save. It must have been created or loaded here.
+
+    Raises:
+        ValueError: If the playlist is not stored.
+        sqlite3.Error: For any database errors. The changes are kept so the next save retries them.
+    """
+    if playlist_model.playlist_id is None:
+        raise ValueError("Playlist is not stored, it has no playlist ID.")
+    if playlist_model.get_unsaved_changes() is None:
+        return
+
+    with playlist_model.save_lock:
+        # Taken again under the save lock, so an older copy is never written after a newer one
+        changes = playlist_model.get_unsaved_changes()
+        if changes is None:
+            return
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO playlist_tracks (playlist_id, position, song_id)
+                    VALUES (?, ?, ?)
+                """, [(playlist_model.playlist_id, position, song_id) for position, song_id in changes["tracks"]])
+                cursor.execute(
+                    "DELETE FROM playlist_tracks WHERE playlist_id = ? AND position >= ?",
+                    (playlist_model.playlist_id, changes["length"])
+                )
+                cursor.execute(
+                    "UPDATE playlists SET current_track_number = ?, shuffle_play = ? WHERE id = ?",
+                    (changes["current_track_number"], changes["shuffle_play"], playlist_model.playlist_id)
+                )
+                conn.commit()
+
+            playlist_model.mark_saved(changes)
+            logger.info("Saved playlist '%s': %d tracks rewritten", playlist_model.name, len(changes["tracks"]))
+
+        except sqlite3.Error as e:
+            logger.error("Database error while saving playlist '%s': %s", playlist_model.name, str(e))
+            raise e
+
+
+def delete_playlist(name: str) -> None:
+    """
+    Deletes a stored playlist and its tracks.
+
+    Args:
+        name (str): The name of the playlist.
+
+    Raises:
+        ValueError: If no playlist has this name.
+        sqlite3.Error: For any database errors.
+    """
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM playlists WHERE name = ?", (name,))
+            row = cursor.fetchone()
+            if row is None:
+                logger.info("Playlist '%s' not found", name)
+                raise ValueError(f"Playlist '{name}' not found")
+
+            cursor.execute("DELETE FROM playlist_tracks WHERE playlist_id = ?", (row[0],))
+            cursor.execute("DELETE FROM playlists WHERE id = ?", (row[0],))
+            conn.commit()
+
+        with _store_lock:
+            _hot_playlists.pop(name, None)
+            _evicting.pop(name, None)
+        logger.info("Playlist '%s' deleted", name)
+
+    except sqlite3.Error as e:
+        logger.error("Database error while deleting playlist '%s': %s", name, str(e))
+        raise e
+
+
+def list_playlists() -> list[dict[str, Any]]:
+    """
+    Lists the stored playlists with their number of tracks.
+
+    Returns:
+        list[dict[str, Any]]: The ID, name and length of every playlist, ordered by name.
+    """
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT p.id, p.name, COUNT(pt.position)
+                FROM playlists p
+                LEFT JOIN playlist_tracks pt ON pt.playlist_id = p.id
+                GROUP BY p.id
+                ORDER BY p.name
+            """)
+            rows = cursor.fetchall()
+
+        return [{"id": row[0], "name": row[1], "length": row[2]} for row in rows]
+
+    except sqlite3.Error as e:
+        logger.error("Database error while listing playlists: %s", str(e))
+        raise e
+
+
+def clear_playlist_cache() -> None:
+    """
+    Drops every loaded playlist that is not pinned from memory, saving unsaved changes first.
+    """
+    with _store_lock:
+        for name in [name for name in _hot_playlists if not _pins[name]]:
+            _evicting[name] = _hot_playlists.pop(name)
+    _save_evicted()
+
+
+def _remember(playlist_model: PlaylistModel) -> PlaylistModel:
+    """
+    Keeps a loaded playlist in memory, evicting the least recently used ones over PLAYLIST_CACHE_SIZE.
+    Must be called holding _store_lock.
+    """
+    _hot_playlists[playlist_model.name] = playlist_model
+    _hot_playlists.move_to_end(playlist_model.name)
+    _evict(keep=playlist_model.name)
+    return playlist_model
+
+
+def _evict(keep: Optional[str] = None) -> None:
+    """
+    Moves the least recently used playlists that are not pinned over PLAYLIST_CACHE_SIZE to _evicting,
+    for _save_evicted to save. The playlist named keep is never moved. Must be called holding _store_lock.
+    """
+    excess = len(_hot_playlists) - PLAYLIST_CACHE_SIZE
+    names: list[str] = []
+    for name in _hot_playlists:
+        if len(names) >= excess:
+            break
+        if not _pins[name] and name != keep:
+            names.append(name)
+    for name in names:
+        _evicting[name] = _hot_playlists.pop(name)
+        logger.info("Evicted playlist '%s' from memory", name)
+
+
+def _save_evicted() -> None:
+    """
+    Saves the evicted playlists and forgets them. Must be called without holding _store_lock,
+    so other requests can get their playlists while the evicted ones are written.
+
+    A playlist that fails to save is kept in _evicting, so its changes are retried by the next call
+    and get_playlist still returns it instead of the stale database copy.
+    """
+    with _store_lock:
+        evicted = list(_evicting.values())
+    for playlist_model in evicted:
+        try:
+            save_playlist(playlist_model)
+        except sqlite3.Error:
+            continue
+        with _store_lock:
+            # It may have been taken back, changed and evicted again while it was saved
+            if _evicting.get(playlist_model.name) is playlist_model and not playlist_model.has_unsaved_changes():
+                del _evicting[playlist_model.name]
@@ -0,0 +1,429 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from music_collection.utils.logger import configure_logger
+from music_collection.utils.sql_utils import DB_PATH, get_db_connection
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Where the feature matrix is saved, as <path>.npy (vectors), <path>.ids.npy and <path>.json
+SONG_FEATURES_PATH = os.getenv("SONG_FEATURES_PATH", os.path.splitext(DB_PATH)[0] + "_features")
+
+# Score added for sharing the genre of the query, against the squared distance in the
+# (z-scored) year, duration and log play count
+GENRE_WEIGHT = 1.0
+
+# Most songs get_similar_songs and recommend_songs will return
+MAX_RECOMMENDATIONS = 100
+
+
+class _GenreBlock:
+    """
+    The feature rows of the songs of one genre, ordered by song ID.
+
+    Each row is [year, duration, log play count, squared norm], the first three z-scored, so
+    the score of a row against a query point q is the dot product with [2q, -1], which ranks
+    rows like -|row - q|^2.
+    """
+    __slots__ = ("ids", "vectors", "live")
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray):
+        self.ids = ids
+        self.vectors = vectors
+        self.live = np.ones(len(ids), dtype=bool)
+
+
+class _SongFeatures:
+    """
+    The feature matrix of the catalog, split into one block per genre (the one-hot genre column),
+    with the means and standard deviations the numeric features were scaled with.
+
+    blocks is copy-on-write: it is replaced, never changed in place, so queries can iterate it
+    without _features_lock.
+    """
+
+    def __init__(self, means: np.ndarray, stds: np.ndarray, blocks: dict[str, _GenreBlock],
+                 signature: tuple[int, int, int]):
+        self.means = means
+        self.stds = stds
+        self.blocks = blocks
+        self.signature = signature
+
+    def point(self, year: Any, duration: Any, play_count: Any) -> np.ndarray:
+        """Returns the scaled numeric features of songs (arrays or single values)."""
+        raw = np.stack([np.asarray(year, dtype=np.float64), np.asarray(duration, dtype=np.float64),
+                        np.log1p(np.asarray(play_count, dtype=np.float64))], axis=-1)
+        return ((raw - self.means) / self.stds).astype(np.float32)
+
+
+# The loaded feature matrix, or None until the first query
+_features: Optional[_SongFeatures] = None
+_features_lock = threading.Lock()
+
+
+def get_similar_songs(song_id: int, k: int = 10) -> list[dict[str, Any]]:
+    """
+    Finds the non-deleted songs most similar to a song: the closest in year, duration and
+    popularity, with GENRE_WEIGHT added for sharing its genre.
+
+    Args:
+        song_id (int): The ID of the song.
+        k (int): The number of songs to return, up to MAX_RECOMMENDATIONS.
+
+    Returns:
+        list[dict[str, Any]]: The songs with their similarity score, most similar first.
+
+    Raises:
+        ValueError: If k is invalid, or the song does not exist or is deleted.
+        sqlite3.Error: For any database errors.
+    """
+    return recommend_songs([song_id], k)
+
+
+def recommend_songs(song_ids: Iterable[int], k: int = 10) -> list[dict[str, Any]]:
+    """
+    Finds the non-deleted songs that best continue a list of songs, such as a playlist.
+
+    The query is the centroid of the songs' features, with each genre weighted by its share
+    of the songs. The genre blocks are scored with one matrix-vector product each, best
+    genre first, and blocks that cannot beat the k-th best score so far are skipped.
+
+    Args:
+        song_ids (Iterable[int]): The IDs of the songs to continue. They are never recommended.
+            Songs that do not exist or are deleted, as stored playlists may hold, are skipped.
+        k (int): The number of songs to return, up to MAX_RECOMMENDATIONS.
+
+    Returns:
+        list[dict[str, Any]]: The songs with their score, best first.
+
+    Raises:
+        ValueError: If k is invalid, no song ID is given, or none of the songs exists and is not deleted.
+        sqlite3.Error: For any database errors.
+    """
+    if not isinstance(k, int) or k < 1 or k > MAX_RECOMMENDATIONS:
+        logger.error("Invalid k: %s", k)
+        raise ValueError(f"Invalid k: {k} (must be an integer between 1 and {MAX_RECOMMENDATIONS}).")
+    song_ids = list(dict.fromkeys(song_ids))
+    if not song_ids:
+        raise ValueError("At least one song ID is required.")
+
+    features = _get_features()
+    seeds = _fetch_seed_songs(song_ids)
+    if not seeds:
+        if len(song_ids) == 1:
+            logger.info("Song with ID %s not found", song_ids[0])
+            raise ValueError(f"Song with ID {song_ids[0]} not found")
+        logger.info("None of the %d songs to recommend for was found", len(song_ids))
+        raise ValueError("None of the songs was found, they are all deleted or do not exist.")
+
+    genres, genre_counts = np.unique([genre.casefold() for genre, *_ in seeds], return_counts=True)
+    genre_scores = dict(zip(genres.tolist(), (GENRE_WEIGHT * genre_counts / len(seeds)).tolist()))
+    centroid = features.point(*zip(*[seed[1:] for seed in seeds])).mean(axis=0)
+    weights = np.append(2 * centroid, np.float32(-1)).astype(np.float32)
+    best_numeric = float(centroid @ centroid)  # the highest score -|row - q|^2 + |q|^2 can reach
+
+    excluded = np.array(song_ids, dtype=np.int64)
+    wanted = k + len(song_ids)
+    best_ids = np.empty(0, dtype=np.int64)
+    best_scores = np.empty(0, dtype=np.float32)
+    blocks = features.blocks  # read once, since add_song_features may replace it meanwhile
+    for genre, block in sorted(blocks.items(), key=lambda item: -genre_scores.get(item[0], 0.0)):
+        genre_score = genre_scores.get(genre, 0.0)
+        if len(best_scores) >= wanted and genre_score + best_numeric <= best_scores.min():
+            break
+        scores = block.vectors @ weights + np.float32(genre_score)
+        scores[~block.live] = -np.inf
+        if len(scores) > wanted:
+            top = np.argpartition(scores, -wanted)[-wanted:]
+            ids, scores = block.ids[top], scores[top]
+        else:
+            ids = block.ids
+        best_ids = np.concatenate([best_ids, ids])
+        best_scores = np.concatenate([best_scores, scores])
+        if len(best_scores) > wanted:
+            top = np.argpartition(best_scores, -wanted)[-wanted:]
+            best_ids, best_scores = best_ids[top], best_scores[top]
+
+    keep = np.isfinite(best_scores) & ~np.isin(best_ids, excluded)
+    best_ids, best_scores = best_ids[keep], best_scores[keep]
+    order = np.lexsort((best_ids, -best_scores))[:k]
+    scores_by_id = dict(zip(best_ids[order].tolist(), best_scores[order].tolist()))
+    logger.info("Recommended %d songs for %d songs", len(scores_by_id), len(song_ids))
+    return _fetch_recommended_songs(scores_by_id)
+
+
+def add_song_features(song_id: int, genre: str, year: int, duration: int, play_count: int = 0) -> None:
+    """
+    Adds a new song to the loaded feature matrix. Only the block of its genre and the dict of
+    blocks are copied, so queries iterating the old blocks are not disturbed.
+    Does nothing if the matrix is not loaded; it will include the song when it is.
+    """
+    with _features_lock:
+        if _features is None:
+            return
+        key = genre.casefold()
+        row = _with_squared_norm(_features.point([year], [duration], [play_count]))
+        block = _features.blocks.get(key)
+        if block is None:
+            new_block = _GenreBlock(np.array([song_id], dtype=np.int64), row)
+        else:
+            new_block = _GenreBlock(np.append(block.ids, np.int64(song_id)), np.concatenate([block.vectors, row]))
+            new_block.live[:-1] = block.live
+        _features.blocks = {**_features.blocks, key: new_block}
+        logger.info("Added song %d to the feature matrix", song_id)
+
+
+def remove_song_features(song_id: int) -> None:
+    """
+    Excludes a deleted song from the loaded feature matrix. Does nothing if the matrix is not loaded.
+    """
+    with _features_lock:
+        if _features is None:
+            return
+        for block in _features.blocks.values():
+            row = int(np.searchsorted(block.ids, song_id))
+            if row < len(block.ids) and block.ids[row] == song_id:
+                block.live[row] = False
+                logger.info("Removed song %d from the feature matrix", song_id)
+                return
+
+
+def invalidate_song_features() -> None:
+    """
+    Drops the loaded feature matrix, so the next query loads or rebuilds it. Used after bulk loads.
+    """
+    global _features
+    with _features_lock:
+        _features = None
+
+
+def rebuild_song_features() -> None:
+    """
+    Builds the feature matrix from the songs table and saves it to SONG_FEATURES_PATH.
+
+    Play counts are read when the matrix is built; call this to refresh them.
+
+    Raises:
+        sqlite3.Error: For any database errors.
+    """
+    global _features
+    with _features_lock:
+        _features = _build_features()
+        _save_features(_features)
+
+
+##################################################
+# Loading and building
+##################################################
+
+def _get_features() -> _SongFeatures:
+    """
+    Returns the loaded feature matrix. On first use it is memory-mapped from SONG_FEATURES_PATH
+    if the saved one still matches the catalog, and built (and saved) otherwise.
+    """
+    global _features
+    features = _features
+    if features is not None:
+        return features
+
+    with _features_lock:
+        if _features is None:
+            signature = _fetch_signature()
+            _features = _load_features(signature)
+            if _features is None:
+                _features = _build_features(signature)
+                _save_features(_features)
+        return _features
+
+
+def _fetch_signature(cursor: Optional[sqlite3.Cursor] = None) -> tuple[int, int, int]:
+    """
+    Returns the number of songs, the highest song ID and the number of deleted songs, which
+    change whenever a song is created or deleted.
+    """
+    query = "SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(SUM(deleted), 0) FROM songs"
+    try:
+        if cursor is not None:
+            cursor.execute(query)
+            return tuple(cursor.fetchone())
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            return tuple(cursor.fetchone())
+
+    except sqlite3.Error as e:
+        logger.error("Database error while reading the catalog signature: %s", str(e))
+        raise e
+
+
+def _build_features(signature: Optional[tuple[int, int, int]] = None) -> _SongFeatures:
+    """
+    Reads every non-deleted song and builds the feature matrix, one block per genre.
+    """
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            signature = _fetch_signature(cursor) if signature is None else signature
+            cursor.execute("""
+                SELECT id, genre, year, duration, play_count
+                FROM songs
+                WHERE deleted = FALSE
+                ORDER BY id
+            """)
+            rows = cursor.fetchall()
+
+    except sqlite3.Error as e:
+        logger.error("Database error while building the feature matrix: %s", str(e))
+        raise e
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    genres = np.array([row[1].casefold() for row in rows], dtype=object)
+    raw = np.array([row[2:] for row in rows], dtype=np.float64).reshape(-1, 3)
+    raw[:, 2] = np.log1p(raw[:, 2])
+    means = raw.mean(axis=0) if len(raw) else np.zeros(3)
+    stds = raw.std(axis=0) if len(raw) else np.ones(3)
+    stds[stds == 0] = 1.0
+    vectors = _with_squared_norm(((raw - means) / stds).astype(np.float32))
+
+    blocks = {}
+    if len(rows):
+        genre_names, codes = np.unique(genres, return_inverse=True)
+        order = np.argsort(codes, kind="stable")  # by genre, then by ID
+        bounds = np.searchsorted(codes[order], np.arange(len(genre_names) + 1))
+        for code, genre in enumerate(genre_names.tolist()):
+            rows_of_genre = order[bounds[code]:bounds[code + 1]]
+            blocks[genre] = _GenreBlock(ids[rows_of_genre], vectors[rows_of_genre])
+
+    logger.info("Built the feature matrix of %d songs in %d genres", len(rows), len(blocks))
+    return _SongFeatures(means, stds, blocks, signature)
+
+
+def _save_features(features: _SongFeatures) -> None:
+    """
+    Saves the feature matrix with its blocks laid out one after the other, so it can be memory-mapped.
+    A failure to save is logged, not raised: the matrix can always be rebuilt.
+    """
+    genres = list(features.blocks)
+    ids = np.concatenate([features.blocks[genre].ids for genre in genres] or [np.empty(0, dtype=np.int64)])
+    vectors = np.concatenate([features.blocks[genre].vectors for genre in genres] or [np.empty((0, 4), dtype=np.float32)])
+    offsets = np.cumsum([0] + [len(features.blocks[genre].ids) for genre in genres]).tolist()
+    meta = {
+        "signature": list(features.signature),
+        "means": features.means.tolist(),
+        "stds": features.stds.tolist(),
+        "genres": [[genre, offsets[i], offsets[i + 1]] for i, genre in enumerate(genres)],
+    }
+    try:
+        for suffix, array in ((".npy", vectors), (".ids.npy", ids)):
+            with open(SONG_FEATURES_PATH + suffix + ".tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(SONG_FEATURES_PATH + suffix + ".tmp", SONG_FEATURES_PATH + suffix)
+        with open(SONG_FEATURES_PATH + ".json.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(SONG_FEATURES_PATH + ".json.tmp", SONG_FEATURES_PATH + ".json")
+        logger.info("Saved the feature matrix to %s", SONG_FEATURES_PATH)
+    except OSError as e:
+        logger.warning("Could not save the feature matrix to %s: %s", SONG_FEATURES_PATH, str(e))
+
+
+def _load_features(signature: tuple[int, int, int]) -> Optional[_SongFeatures]:
+    """
+    Memory-maps the saved feature matrix. Returns None if there is none, or if it was saved for
+    a different catalog (songs were created or deleted since).
+    """
+    try:
+        with open(SONG_FEATURES_PATH + ".json") as f:
+            meta = json.load(f)
+        if tuple(meta["signature"]) != tuple(signature):
+            logger.info("The saved feature matrix is out of date")
+            return None
+        vectors = np.load(SONG_FEATURES_PATH + ".npy", mmap_mode="r")
+        ids = np.load(SONG_FEATURES_PATH + ".ids.npy", mmap_mode="r")
+    except (OSError, ValueError, KeyError) as e:
+        logger.info("No saved feature matrix to load: %s", str(e))
+        return None
+
+    blocks = {genre: _GenreBlock(ids[start:end], vectors[start:end]) for genre, start, end in meta["genres"]}
+    logger.info("Loaded the feature matrix of %d songs from %s", len(ids), SONG_FEATURES_PATH)
+    return _SongFeatures(np.array(meta["means"]), np.array(meta["stds"]), blocks, signature)
+
+
+##################################################
+# Helpers
+##################################################
+
+def _with_squared_norm(points: np.ndarray) -> np.ndarray:
+    """Appends the squared norm of every row as a last column."""
+    return np.hstack([points, (points * points).sum(axis=1, keepdims=True)]).astype(np.float32)
+
+
+def _fetch_seed_songs(song_ids: list[int]) -> list[tuple[str, int, int, int]]:
+    """
+    Returns the genre, year, duration and play count of each song that exists and is not deleted,
+    reading them in chunks below SQLite's parameter limit. The other songs are left out.
+    """
+    rows = {}
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(song_ids), 500):
+                chunk = song_ids[start:start + 500]
+                cursor.execute(f"""
+                    SELECT id, genre, year, duration, play_count
+                    FROM songs
+                    WHERE id IN ({", ".join("?" * len(chunk))}) AND deleted = FALSE
+                """, chunk)
+                rows.update((row[0], row[1:]) for row in cursor.fetchall())
+
+    except sqlite3.Error as e:
+        logger.error("Database error while retrieving songs to recommend for: %s", str(e))
+        raise e
+
+    if len(rows) < len(song_ids):
+        logger.info("Skipping %d songs that are deleted or do not exist", len(song_ids) - len(rows))
+    return [rows[song_id] for song_id in song_ids if song_id in rows]
+
+
+def _fetch_recommended_songs(scores_by_id: dict[int, float]) -> list[dict[str, Any]]:
+    """
+    Returns the recommended songs with their scores, in the order of scores_by_id.
+    """
+    if not scores_by_id:
+        return []
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ", ".join("?" * len(scores_by_id))
+            cursor.execute(f"""
+                SELECT id, artist, title, year, genre, duration
+                FROM songs
+                WHERE id IN ({placeholders}) AND deleted = FALSE
+            """, list(scores_by_id))
+            rows = {row[0]: row for row in cursor.fetchall()}
+
+    except sqlite3.Error as e:
+        logger.error("Database error while retrieving recommended songs: %s", str(e))
+        raise e
+
+    return [
+        {
+            "id": row[0],
+            "artist": row[1],
+            "title": row[2],
+            "year": row[3],
+            "genre": row[4],
+            "duration": row[5],
+            "score": round(scores_by_id[row[0]], 4),
+        }
+        for row in (rows.get(song_id) for song_id in scores_by_id)
+        if row is not None
+    ]
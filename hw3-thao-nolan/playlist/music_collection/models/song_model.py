@@ -1,17 +1,73 @@
+from collections import OrderedDict
 from dataclasses import dataclass
 import logging
+import os
+import random
+import re
 import sqlite3
-from typing import Any
+import threading
+from typing import Any, Iterable, Iterator, Optional, Union
 
+from music_collection.models.play_log_model import record_plays
+from music_collection.models.recommendation_model import add_song_features, invalidate_song_features, remove_song_features
 from music_collection.utils.logger import configure_logger
-from music_collection.utils.random_utils import get_random
+from music_collection.utils.random_utils import get_random, get_random_batch, get_random_seed
 from music_collection.utils.sql_utils import get_db_connection
+from music_collection.utils.subset_sum import solve_bounded_subset_sum
+from music_collection.utils.top_k import TopK
 
 
 logger = logging.getLogger(__name__)
 configure_logger(logger)
 
 
+# Largest page get_songs_page will return
+MAX_PAGE_SIZE = 1000
+
+# Largest page search_songs will return, and how deep it will page into the ranked matches
+MAX_SEARCH_RESULTS = 100
+MAX_SEARCH_OFFSET = 1000
+
+# Rows written per transaction by create_songs
+BULK_INSERT_CHUNK_SIZE = 5000
+
+# Most duplicate and invalid rows listed individually in a create_songs report
+MAX_REPORTED_ROWS = 1000
+
+# Most songs get_random_songs returns in one call
+MAX_RANDOM_SONGS = 1000
+
+# Rounds of random ID probes get_random_songs makes before sampling from every live ID
+RANDOM_SONG_PROBES = 4
+
+# Longest total generate_songs_for_duration will aim for, in seconds
+MAX_GENERATED_DURATION = 24 * 60 * 60
+
+# Number of non-deleted songs, cached for random selection and reset by create_song and delete_song.
+# The generation moves on with every reset, so a count read before a reset is not cached after it.
+_live_song_count: Optional[int] = None
+_song_count_generation = 0
+_song_count_lock = threading.Lock()
+
+# Most songs a catalog cache holds before evicting the least recently used one
+SONG_CACHE_SIZE = int(os.getenv("SONG_CACHE_SIZE", "10000"))
+
+# Non-deleted songs by ID in least to most recently used order, plus a compound key index into it
+_song_cache: "OrderedDict[int, Song]" = OrderedDict()
+_song_ids_by_key: dict[tuple[str, str, int], int] = {}
+_song_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+# Guards the cache, its key index and its statistics, which request threads share
+_song_cache_lock = threading.Lock()
+
+# Number of most played songs kept in memory by _top_songs for get_top_songs
+TOP_SONGS_TRACKED = int(os.getenv("TOP_SONGS_TRACKED", "100"))
+
+# The most played songs by play count, seeded from the database on first use and updated on every play
+_top_songs: Optional[TopK] = None
+# Guards seeding, updating, reading and dropping _top_songs, which request threads share
+_top_songs_lock = threading.Lock()
+
+
 @dataclass
 class Song:
     id: int
@@ -59,6 +115,10 @@ def create_song(artist: str, title: str, year: int, genre: str, duration: int) -
                 VALUES (?, ?, ?, ?, ?)
             """, (artist, title, year, genre, duration))
             conn.commit()
+            _invalidate_song_count()
+            _invalidate_top_songs()
+            _uncache_song(key=(artist, title, year))
+            add_song_features(cursor.lastrowid, genre, year, duration)
 
             logger.info("Song created successfully: %s - %s (%d)", artist, title, year)
 
@@ -70,6 +130,137 @@ def create_song(artist: str, title: str, year: int, genre: str, duration: int) -
         raise sqlite3.Error(f"Database error: {str(e)}")
 
 
+def create_songs(songs: Iterable[dict[str, Any]], chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> dict[str, Any]:
+    """
+    Creates many songs in the songs table, reading them lazily and inserting them in chunked transactions.
+
+    Each song is validated with the same rules as Song. Invalid songs and songs whose compound key
+    (artist, title, year) already exists, in the table or earlier in the input, are skipped and reported.
+    Loading the same input again is therefore safe: every song is reported as a duplicate.
+
+    Args:
+        songs (Iterable[dict[str, Any]]): The songs, each with artist, title, year, genre and duration.
+            Year and duration may be numeric strings, as read from CSV.
+        chunk_size (int): The number of songs inserted per transaction.
+
+    Returns:
+        dict[str, Any]: The number of songs inserted, duplicate and invalid, and the row number
+            (1-based position in the input) and details of up to MAX_REPORTED_ROWS duplicate and invalid rows.
+
+    Raises:
+        ValueError: If reading songs from the input fails, e.g. on malformed JSON.
+        sqlite3.Error: For any database errors.
+
+    Chunks committed before an error are kept.
+    """
+    report: dict[str, Any] = {"inserted": 0, "duplicate_count": 0, "invalid_count": 0, "duplicates": [], "invalid": []}
+    seen_keys: set[tuple[str, str, int]] = set()
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            chunk: list[tuple[int, tuple]] = []
+            for row_number, data in enumerate(songs, start=1):
+                try:
+                    values = _validate_song_row(data)
+                except ValueError as e:
+                    report["invalid_count"] += 1
+                    if len(report["invalid"]) < MAX_REPORTED_ROWS:
+                        report["invalid"].append({"row": row_number, "error": str(e)})
+                    continue
+
+                key = values[:3]
+                if key in seen_keys:
+                    _report_duplicate(report, row_number, key)
+                    continue
+                seen_keys.add(key)
+
+                chunk.append((row_number, values))
+                if len(chunk) >= chunk_size:
+                    _insert_song_chunk(conn, cursor, chunk, report)
+                    chunk = []
+            if chunk:
+                _insert_song_chunk(conn, cursor, chunk, report)
+
+        logger.info("Bulk load finished: %d inserted, %d duplicates, %d invalid",
+                    report["inserted"], report["duplicate_count"], report["invalid_count"])
+        return report
+
+    except sqlite3.Error as e:
+        logger.error("Database error while bulk creating songs: %s", str(e))
+        raise e
+    finally:
+        if report["inserted"]:
+            _invalidate_song_count()
+            _invalidate_top_songs()
+            invalidate_song_features()
+
+def _validate_song_row(data: Any) -> tuple[str, str, int, str, int]:
+    """
+    Converts one input song to (artist, title, year, genre, duration), checking it like Song does.
+
+    Raises:
+        ValueError: If a field is missing or invalid.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Song must be an object with artist, title, year, genre and duration")
+    missing = [field for field in ("artist", "title", "year", "genre", "duration") if data.get(field) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    # int() would turn true into 1 and truncate 215.7, so only whole numbers and their strings are taken
+    try:
+        if any(isinstance(data[field], bool) or (isinstance(data[field], float) and not data[field].is_integer())
+               for field in ("year", "duration")):
+            raise ValueError
+        year = int(data["year"])
+        duration = int(data["duration"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Year and duration must be integers, got {data['year']!r} and {data['duration']!r}")
+
+    # Build a Song so the rules stay exactly those of Song.__post_init__
+    song = Song(id=0, artist=str(data["artist"]), title=str(data["title"]), year=year,
+                genre=str(data["genre"]), duration=duration)
+    return song.artist, song.title, song.year, song.genre, song.duration
+
+def _insert_song_chunk(conn: sqlite3.Connection, cursor: sqlite3.Cursor,
+                       chunk: list[tuple[int, tuple]], report: dict[str, Any]) -> None:
+    """
+    Inserts one chunk of validated songs in a single transaction, reporting the ones that already existed.
+    """
+    # Index the whole chunk for search at once instead of through the per-row insert trigger.
+    # This write opens the transaction, so no other connection can add songs after MAX(id) is read.
+    cursor.execute("UPDATE songs_fts_sync SET paused = TRUE")
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM songs")
+    last_id = cursor.fetchone()[0]
+    cursor.executemany("""
+        INSERT OR IGNORE INTO songs (artist, title, year, genre, duration)
+        VALUES (?, ?, ?, ?, ?)
+    """, [values for _, values in chunk])
+    inserted = cursor.rowcount
+    cursor.execute("""
+        INSERT INTO songs_fts (rowid, artist, title, genre)
+        SELECT id, artist, title, genre FROM songs WHERE id > ?
+    """, (last_id,))
+    cursor.execute("UPDATE songs_version SET version = version + 1")
+    cursor.execute("UPDATE songs_fts_sync SET paused = FALSE")
+
+    # Only look up which songs were skipped when some were; new rows all get IDs above last_id
+    if inserted < len(chunk):
+        cursor.execute("SELECT artist, title, year FROM songs WHERE id > ?", (last_id,))
+        inserted_keys = set(cursor.fetchall())
+        for row_number, values in chunk:
+            if values[:3] not in inserted_keys:
+                _report_duplicate(report, row_number, values[:3])
+
+    conn.commit()
+    report["inserted"] += inserted
+    logger.info("Inserted %d of %d songs in chunk", inserted, len(chunk))
+
+def _report_duplicate(report: dict[str, Any], row_number: int, key: tuple[str, str, int]) -> None:
+    report["duplicate_count"] += 1
+    if len(report["duplicates"]) < MAX_REPORTED_ROWS:
+        report["duplicates"].append({"row": row_number, "artist": key[0], "title": key[1], "year": key[2]})
+
 def delete_song(song_id: int) -> None:
     """
     Soft deletes a song from the catalog by marking it as deleted.
@@ -99,6 +290,10 @@ def delete_song(song_id: int) -> None:
             # Perform the soft delete by setting 'deleted' to TRUE
             cursor.execute("UPDATE songs SET deleted = TRUE WHERE id = ?", (song_id,))
             conn.commit()
+            _invalidate_song_count()
+            _invalidate_top_songs()
+            _uncache_song(song_id)
+            remove_song_features(song_id)
 
             logger.info("Song with ID %s marked as deleted.", song_id)
 
@@ -119,6 +314,11 @@ def get_song_by_id(song_id: int) -> Song:
     Raises:
         ValueError: If the song is not found or is marked as deleted.
     """
+    song = _get_cached_song(song_id)
+    if song is not None:
+        logger.info("Song with ID %s served from cache", song_id)
+        return song
+
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
@@ -135,7 +335,7 @@ def get_song_by_id(song_id: int) -> Song:
                     logger.info("Song with ID %s has been deleted", song_id)
                     raise ValueError(f"Song with ID {song_id} has been deleted")
                 logger.info("Song with ID %s found", song_id)
-                return Song(id=row[0], artist=row[1], title=row[2], year=row[3], genre=row[4], duration=row[5])
+                return _cache_song(Song(id=row[0], artist=row[1], title=row[2], year=row[3], genre=row[4], duration=row[5]))
             else:
                 logger.info("Song with ID %s not found", song_id)
                 raise ValueError(f"Song with ID {song_id} not found")
@@ -159,6 +359,11 @@ def get_song_by_compound_key(artist: str, title: str, year: int) -> Song:
     Raises:
         ValueError: If the song is not found or is marked as deleted.
     """
+    song = _get_cached_song(key=(artist, title, year))
+    if song is not None:
+        logger.info("Song with artist '%s', title '%s', and year %d served from cache", artist, title, year)
+        return song
+
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
@@ -175,7 +380,7 @@ def get_song_by_compound_key(artist: str, title: str, year: int) -> Song:
                     logger.info("Song with artist '%s', title '%s', and year %d has been deleted", artist, title, year)
                     raise ValueError(f"Song with artist '{artist}', title '{title}', and year {year} has been deleted")
                 logger.info("Song with artist '%s', title '%s', and year %d found", artist, title, year)
-                return Song(id=row[0], artist=row[1], title=row[2], year=row[3], genre=row[4], duration=row[5])
+                return _cache_song(Song(id=row[0], artist=row[1], title=row[2], year=row[3], genre=row[4], duration=row[5]))
             else:
                 logger.info("Song with artist '%s', title '%s', and year %d not found", artist, title, year)
                 raise ValueError(f"Song with artist '{artist}', title '{title}', and year {year} not found")
@@ -184,6 +389,131 @@ def get_song_by_compound_key(artist: str, title: str, year: int) -> Song:
         logger.error("Database error while retrieving song by compound key (artist '%s', title '%s', year %d): %s", artist, title, year, str(e))
         raise e
 
+def get_song_cache_stats() -> dict[str, Any]:
+    """
+    Returns the hit, miss and eviction counts of the song cache used by get_song_by_id and
+    get_song_by_compound_key, with its current size and hit rate.
+
+    Returns:
+        dict[str, Any]: The cache statistics. hit_rate is None before the first lookup.
+    """
+    with _song_cache_lock:
+        lookups = _song_cache_stats["hits"] + _song_cache_stats["misses"]
+        return {
+            **_song_cache_stats,
+            "size": len(_song_cache),
+            "max_size": SONG_CACHE_SIZE,
+            "hit_rate": round(_song_cache_stats["hits"] / lookups, 4) if lookups else None,
+        }
+
+def clear_song_cache() -> None:
+    """
+    Drops every cached song and resets the cache statistics.
+    """
+    with _song_cache_lock:
+        _song_cache.clear()
+        _song_ids_by_key.clear()
+        for stat in _song_cache_stats:
+            _song_cache_stats[stat] = 0
+
+def _get_cached_song(song_id: Optional[int] = None, key: Optional[tuple[str, str, int]] = None) -> Optional[Song]:
+    """
+    Returns the cached song with the given ID or (artist, title, year) key and marks it as most
+    recently used, or None on a miss.
+    """
+    with _song_cache_lock:
+        if key is not None:
+            song_id = _song_ids_by_key.get(key)
+        song = _song_cache.get(song_id) if song_id is not None else None
+        if song is None:
+            _song_cache_stats["misses"] += 1
+            return None
+        _song_cache.move_to_end(song_id)
+        _song_cache_stats["hits"] += 1
+        return song
+
+def _cache_song(song: Song) -> Song:
+    """
+    Adds a song to the cache, evicting the least recently used songs over SONG_CACHE_SIZE, and returns it.
+    """
+    with _song_cache_lock:
+        _song_cache[song.id] = song
+        _song_cache.move_to_end(song.id)
+        _song_ids_by_key[(song.artist, song.title, song.year)] = song.id
+        while len(_song_cache) > SONG_CACHE_SIZE:
+            _, evicted = _song_cache.popitem(last=False)
+            _song_ids_by_key.pop((evicted.artist, evicted.title, evicted.year), None)
+            _song_cache_stats["evictions"] += 1
+    return song
+
+def _uncache_song(song_id: Optional[int] = None, key: Optional[tuple[str, str, int]] = None) -> None:
+    """
+    Removes the song with the given ID or (artist, title, year) key from the cache, if it is there.
+    """
+    with _song_cache_lock:
+        if key is not None:
+            song_id = _song_ids_by_key.get(key)
+        song = _song_cache.pop(song_id, None) if song_id is not None else None
+        if song is not None:
+            _song_ids_by_key.pop((song.artist, song.title, song.year), None)
+
+def get_songs_by_compound_keys(keys: list[tuple[str, str, int]]) -> list[Union[Song, str]]:
+    """
+    Retrieves many songs from the catalog by compound key (artist, title, year) in one query.
+
+    The keys are loaded into a temporary table and joined to songs on the UNIQUE(artist, title, year) index.
+
+    Args:
+        keys (list[tuple[str, str, int]]): The (artist, title, year) of each song.
+
+    Returns:
+        list[Union[Song, str]]: For each key in order, the Song, or an error message if the song
+            is not found or is marked as deleted.
+    """
+    if not keys:
+        return []
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            logger.info("Attempting to retrieve %d songs by compound key", len(keys))
+            cursor.execute("""
+                CREATE TEMP TABLE lookup_keys (
+                    position INTEGER PRIMARY KEY,
+                    artist TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    year INTEGER NOT NULL
+                )
+            """)
+            cursor.executemany(
+                "INSERT INTO lookup_keys (position, artist, title, year) VALUES (?, ?, ?, ?)",
+                [(position, artist, title, year) for position, (artist, title, year) in enumerate(keys)]
+            )
+            cursor.execute("""
+                SELECT k.position, s.id, s.artist, s.title, s.year, s.genre, s.duration, s.deleted
+                FROM lookup_keys k
+                LEFT JOIN songs s ON s.artist = k.artist AND s.title = k.title AND s.year = k.year
+                ORDER BY k.position
+            """)
+            rows = cursor.fetchall()
+            cursor.execute("DROP TABLE lookup_keys")
+
+        results: list[Union[Song, str]] = []
+        for (artist, title, year), row in zip(keys, rows):
+            if row[1] is None:
+                results.append(f"Song with artist '{artist}', title '{title}', and year {year} not found")
+            elif row[7]:
+                results.append(f"Song with artist '{artist}', title '{title}', and year {year} has been deleted")
+            else:
+                results.append(_cache_song(Song(id=row[1], artist=row[2], title=row[3], year=row[4], genre=row[5], duration=row[6])))
+
+        logger.info("Found %d of %d songs by compound key", sum(isinstance(result, Song) for result in results), len(keys))
+        return results
+
+    except sqlite3.Error as e:
+        logger.error("Database error while retrieving songs by compound key: %s", str(e))
+        raise e
+
 def get_all_songs(sort_by_play_count: bool = False) -> list[dict]:
     """
     Retrieves all songs that are not marked as deleted from the catalog.
@@ -237,10 +567,324 @@ def get_all_songs(sort_by_play_count: bool = False) -> list[dict]:
         logger.error("Database error while retrieving all songs: %s", str(e))
         raise e
 
+def get_songs_page(sort_by_play_count: bool = False, limit: int = 100, cursor: Optional[str] = None) -> dict[str, Any]:
+    """
+    Retrieves one page of non-deleted songs, continuing after the given cursor.
+
+    Pages are found with keyset pagination: each page resumes at the last (play_count, id) or id
+    of the previous one through an index seek, so a page costs the same however deep it is.
+
+    Args:
+        sort_by_play_count (bool): If True, sort by play count in descending order, then by id.
+            Otherwise sort by id.
+        limit (int): The maximum number of songs on the page, between 1 and 1000.
+        cursor (str, optional): The next_cursor of the previous page. Defaults to the first page.
+
+    Returns:
+        dict[str, Any]: The songs on the page (same fields as get_all_songs) and the next_cursor,
+            which is None on the last page.
+
+    Raises:
+        ValueError: If the limit or cursor is invalid.
+    """
+    if not isinstance(limit, int) or limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f"Invalid page size: {limit} (must be an integer between 1 and {MAX_PAGE_SIZE}).")
+
+    query = """
+        SELECT id, artist, title, year, genre, duration, play_count
+        FROM songs
+        WHERE deleted = FALSE
+    """
+    params: list[Any] = []
+    if cursor is not None:
+        last_play_count, last_id = _parse_page_cursor(cursor, sort_by_play_count)
+        if sort_by_play_count:
+            # The play_count <= ? bound lets SQLite seek in the index instead of scanning from the top
+            query += " AND play_count <= ? AND (play_count < ? OR id > ?)"
+            params += [last_play_count, last_play_count, last_id]
+        else:
+            query += " AND id > ?"
+            params.append(last_id)
+    query += " ORDER BY play_count DESC, id LIMIT ?" if sort_by_play_count else " ORDER BY id LIMIT ?"
+    params.append(limit)
+
+    try:
+        with get_db_connection() as conn:
+            db_cursor = conn.cursor()
+            logger.info("Retrieving a page of %d songs after cursor %s", limit, cursor)
+            db_cursor.execute(query, params)
+            rows = db_cursor.fetchall()
+
+        songs = [
+            {
+                "id": row[0],
+                "artist": row[1],
+                "title": row[2],
+                "year": row[3],
+                "genre": row[4],
+                "duration": row[5],
+                "play_count": row[6],
+            }
+            for row in rows
+        ]
+
+        next_cursor = None
+        if len(songs) == limit:
+            last = songs[-1]
+            next_cursor = f"{last['play_count']}:{last['id']}" if sort_by_play_count else str(last["id"])
+
+        logger.info("Retrieved %d songs, next cursor %s", len(songs), next_cursor)
+        return {"songs": songs, "next_cursor": next_cursor}
+
+    except sqlite3.Error as e:
+        logger.error("Database error while retrieving a page of songs: %s", str(e))
+        raise e
+
+def iter_songs(sort_by_play_count: bool = False, page_size: int = 500) -> Iterator[dict]:
+    """
+    Yields every non-deleted song, one page at a time, without holding the whole catalog in memory.
+
+    Each page is read over its own connection, so no connection stays open while a slow client reads.
+
+    Args:
+        sort_by_play_count (bool): If True, sort by play count in descending order, then by id.
+        page_size (int): The number of songs fetched per query.
+
+    Yields:
+        dict: Each song, with the same fields as get_all_songs.
+    """
+    cursor = None
+    while True:
+        page = get_songs_page(sort_by_play_count=sort_by_play_count, limit=page_size, cursor=cursor)
+        yield from page["songs"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
+
+def _parse_page_cursor(cursor: str, sort_by_play_count: bool) -> tuple[Optional[int], int]:
+    """
+    Splits a page cursor into the last play count (None when sorting by id) and the last id.
+
+    Raises:
+        ValueError: If the cursor was not produced by get_songs_page with the same sort order.
+    """
+    try:
+        if sort_by_play_count:
+            last_play_count, last_id = cursor.split(":")
+            return int(last_play_count), int(last_id)
+        return None, int(cursor)
+    except ValueError:
+        logger.info("Invalid page cursor: %s", cursor)
+        raise ValueError(f"Invalid page cursor: {cursor}")
+
+def search_songs(query: str, prefix: bool = False, limit: int = 20, offset: int = 0) -> dict[str, Any]:
+    """
+    Searches the artist, title and genre of non-deleted songs, best matches first.
+
+    Every word of the query must match. Matches in the title rank above matches in the artist,
+    which rank above matches in the genre.
+
+    Args:
+        query (str): The words to search for. Punctuation is ignored.
+        prefix (bool): If True, the last word also matches longer words starting with it,
+            for type-ahead as the user types.
+        limit (int): The maximum number of songs on the page, between 1 and MAX_SEARCH_RESULTS.
+        offset (int): The number of matches to skip, at most MAX_SEARCH_OFFSET.
+
+    Returns:
+        dict[str, Any]: The songs on the page (same fields as get_all_songs) and the next_offset,
+            which is None on the last page.
+
+    Raises:
+        ValueError: If the query has no words or the limit or offset is invalid.
+    """
+    if not isinstance(limit, int) or limit < 1 or limit > MAX_SEARCH_RESULTS:
+        raise ValueError(f"Invalid page size: {limit} (must be an integer between 1 and {MAX_SEARCH_RESULTS}).")
+    if not isinstance(offset, int) or offset < 0 or offset > MAX_SEARCH_OFFSET:
+        raise ValueError(f"Invalid offset: {offset} (must be an integer between 0 and {MAX_SEARCH_OFFSET}).")
+
+    match_expression = _build_match_expression(query, prefix)
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            logger.info("Searching songs for %s", match_expression)
+            cursor.execute("""
+                SELECT s.id, s.artist, s.title, s.year, s.genre, s.duration, s.play_count
+                FROM songs_fts
+                JOIN songs s ON s.id = songs_fts.rowid
+                WHERE songs_fts MATCH ? AND s.deleted = FALSE
+                ORDER BY bm25(songs_fts, 2.0, 3.0, 1.0), s.id
+                LIMIT ? OFFSET ?
+            """, (match_expression, limit + 1, offset))
+            rows = cursor.fetchall()
+
+        # One row past the page tells whether there is a next page
+        songs = [
+            {
+                "id": row[0],
+                "artist": row[1],
+                "title": row[2],
+                "year": row[3],
+                "genre": row[4],
+                "duration": row[5],
+                "play_count": row[6],
+            }
+            for row in rows[:limit]
+        ]
+        next_offset = offset + limit if len(rows) > limit else None
+
+        logger.info("Found %d songs for %s", len(songs), match_expression)
+        return {"songs": songs, "next_offset": next_offset}
+
+    except sqlite3.Error as e:
+        logger.error("Database error while searching songs: %s", str(e))
+        raise e
+
+def _build_match_expression(query: str, prefix: bool) -> str:
+    """
+    Turns free text into an FTS5 query where every word must match.
+
+    Each word is quoted, so user input cannot use FTS5 operators or column filters.
+
+    Raises:
+        ValueError: If the query has no words.
+    """
+    words = re.findall(r"\w+", query or "")
+    if not words:
+        logger.info("Search query has no words: %r", query)
+        raise ValueError("Search query must contain at least one word.")
+    terms = [f'"{word}"' for word in words]
+    if prefix:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+def get_top_songs(k: int = 10) -> list[dict]:
+    """
+    Retrieves the k most played non-deleted songs, most played first (ties by lowest id).
+
+    Up to TOP_SONGS_TRACKED songs are served from an in-memory top-K heap that every play count
+    update keeps current, with the song details from the song cache. Larger k read exactly k rows
+    through the (deleted, play_count DESC, id) index. Neither sorts the catalog.
+
+    Args:
+        k (int): The number of songs to return, between 1 and MAX_PAGE_SIZE.
+
+    Returns:
+        list[dict]: The songs with the same fields as get_all_songs.
+
+    Raises:
+        ValueError: If k is invalid.
+    """
+    global _top_songs
+
+    if not isinstance(k, int) or k < 1 or k > MAX_PAGE_SIZE:
+        raise ValueError(f"Invalid number of songs: {k} (must be an integer between 1 and {MAX_PAGE_SIZE}).")
+    if k > TOP_SONGS_TRACKED:
+        return get_songs_page(sort_by_play_count=True, limit=k)["songs"]
+
+    # Seeding holds the lock, so a play committed meanwhile is applied to the seeded heap once it is released
+    with _top_songs_lock:
+        if _top_songs is None:
+            songs = get_songs_page(sort_by_play_count=True, limit=TOP_SONGS_TRACKED)["songs"]
+            for song in songs:
+                _cache_song(Song(id=song["id"], artist=song["artist"], title=song["title"], year=song["year"],
+                                 genre=song["genre"], duration=song["duration"]))
+            _top_songs = TopK(TOP_SONGS_TRACKED, ((song["id"], song["play_count"]) for song in songs))
+            logger.info("Seeded the top songs with %d songs", len(songs))
+        top_items = _top_songs.items(k)
+
+    top_songs = []
+    for song_id, play_count in top_items:
+        song = get_song_by_id(song_id)
+        top_songs.append({
+            "id": song.id,
+            "artist": song.artist,
+            "title": song.title,
+            "year": song.year,
+            "genre": song.genre,
+            "duration": song.duration,
+            "play_count": play_count,
+        })
+    return top_songs
+
+def _invalidate_top_songs() -> None:
+    """
+    Drops the in-memory top songs, so they are seeded again from the database on next use.
+    """
+    global _top_songs
+    with _top_songs_lock:
+        _top_songs = None
+
+def _update_top_songs(play_counts: Optional[dict[int, int]]) -> None:
+    """
+    Reports committed play counts to the in-memory top songs, if they are seeded.
+
+    Args:
+        play_counts (Optional[dict[int, int]]): The new play counts by song ID, or None if they were
+            not read because the top songs were not seeded then. If they have been seeded since,
+            they are dropped, since they may have missed these plays.
+    """
+    global _top_songs
+    with _top_songs_lock:
+        if _top_songs is None:
+            return
+        if play_counts is None:
+            _top_songs = None
+            return
+        for song_id, play_count in play_counts.items():
+            _top_songs.update(song_id, play_count)
+
+def _fetch_play_counts(cursor: sqlite3.Cursor, song_ids: list[int]) -> dict[int, int]:
+    """
+    Reads the play counts of the given songs, in chunks below SQLite's parameter limit.
+    """
+    play_counts = {}
+    for start in range(0, len(song_ids), 500):
+        chunk = song_ids[start:start + 500]
+        cursor.execute(
+            f"SELECT id, play_count FROM songs WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+        )
+        play_counts.update(cursor.fetchall())
+    return play_counts
+
+def get_song_count() -> int:
+    """
+    Returns the number of songs in the catalog that are not marked as deleted.
+
+    The count is cached until the next create_song or delete_song.
+
+    Returns:
+        int: The number of non-deleted songs.
+    """
+    global _live_song_count
+
+    with _song_count_lock:
+        if _live_song_count is not None:
+            return _live_song_count
+        generation = _song_count_generation
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM songs WHERE deleted = FALSE")
+            song_count = cursor.fetchone()[0]
+            logger.info("Counted %d songs in the catalog", song_count)
+        with _song_count_lock:
+            if generation == _song_count_generation:
+                _live_song_count = song_count
+        return song_count
+
+    except sqlite3.Error as e:
+        logger.error("Database error while counting songs: %s", str(e))
+        raise e
+
 def get_random_song() -> Song:
     """
     Retrieves a random song from the catalog.
 
+    Only the chosen song is read from the database, so memory use does not grow with the catalog.
+
     Returns:
         Song: A randomly selected Song object.
 
@@ -248,31 +892,258 @@ def get_random_song() -> Song:
         ValueError: If the catalog is empty.
     """
     try:
-        all_songs = get_all_songs()
+        song_count = get_song_count()
 
-        if not all_songs:
+        if not song_count:
             logger.info("Cannot retrieve random song because the song catalog is empty.")
             raise ValueError("The song catalog is empty.")
 
         # Get a random index using the random.org API
-        random_index = get_random(len(all_songs))
-        logger.info("Random index selected: %d (total songs: %d)", random_index, len(all_songs))
-
-        # Return the song at the random index, adjust for 0-based indexing
-        song_data = all_songs[random_index - 1]
-        return Song(
-            id=song_data["id"],
-            artist=song_data["artist"],
-            title=song_data["title"],
-            year=song_data["year"],
-            genre=song_data["genre"],
-            duration=song_data["duration"]
-        )
+        random_index = get_random(song_count)
+        logger.info("Random index selected: %d (total songs: %d)", random_index, song_count)
+
+        # Fetch the song at the random index, adjust for 0-based indexing
+        return _get_songs_at_offsets([random_index - 1])[0]
 
     except Exception as e:
         logger.error("Error while retrieving random song: %s", str(e))
         raise e
 
+def get_random_songs(count: int) -> list[Song]:
+    """
+    Retrieves several different random songs from the catalog, with one random.org request in the usual case.
+
+    Random IDs between the lowest and highest live ID are probed with one IN (...) query, and
+    IDs that are repeats, gaps or deleted songs are replaced from a local generator seeded by
+    get_random_seed. Every live song is equally likely. If the IDs are too sparse for
+    RANDOM_SONG_PROBES rounds to find enough songs, the rest are sampled from the live IDs
+    read in one scan of the (deleted, id) index.
+
+    Args:
+        count (int): The number of songs to retrieve, at most MAX_RANDOM_SONGS.
+
+    Returns:
+        list[Song]: The randomly selected Song objects.
+
+    Raises:
+        ValueError: If count is not between 1 and MAX_RANDOM_SONGS or the catalog has fewer than count songs.
+    """
+    try:
+        if not isinstance(count, int) or count < 1 or count > MAX_RANDOM_SONGS:
+            raise ValueError(f"Invalid number of songs: {count} (must be an integer between 1 and {MAX_RANDOM_SONGS}).")
+
+        song_count = get_song_count()
+        if song_count < count:
+            logger.info("Cannot retrieve %d random songs from a catalog of %d songs.", count, song_count)
+            raise ValueError(f"The song catalog only has {song_count} songs.")
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MIN(id), MAX(id) FROM songs WHERE deleted = FALSE")
+            min_id, max_id = cursor.fetchone()
+            if min_id is None:
+                _invalidate_song_count()
+                raise ValueError("The song catalog changed while picking random songs, please try again.")
+
+            songs: dict[int, Song] = {}
+            candidates = [min_id - 1 + random_id for random_id in get_random_batch(max_id - min_id + 1, count)]
+            rng: Optional[random.Random] = None
+            for _ in range(RANDOM_SONG_PROBES):
+                _add_live_songs(cursor, candidates, songs, count)
+                if len(songs) == count:
+                    break
+                rng = rng or random.Random(get_random_seed())
+                candidates = [rng.randint(min_id, max_id) for _ in range(2 * (count - len(songs)))]
+
+            if len(songs) < count:
+                cursor.execute("SELECT id FROM songs WHERE deleted = FALSE ORDER BY id")
+                live_ids = [row[0] for row in cursor.fetchall() if row[0] not in songs]
+                if len(live_ids) < count - len(songs):
+                    _invalidate_song_count()
+                    raise ValueError("The song catalog changed while picking random songs, please try again.")
+                rng = rng or random.Random(get_random_seed())
+                _add_live_songs(cursor, rng.sample(live_ids, count - len(songs)), songs, count)
+
+        logger.info("Random songs selected: %s (total songs: %d)", list(songs), song_count)
+        return list(songs.values())
+
+    except Exception as e:
+        logger.error("Error while retrieving random songs: %s", str(e))
+        raise e
+
+def _add_live_songs(cursor: sqlite3.Cursor, song_ids: list[int], songs: dict[int, Song], count: int) -> None:
+    """
+    Adds the non-deleted songs among song_ids to songs, in the order of song_ids, until it holds count songs.
+    They are read in chunks below SQLite's parameter limit.
+    """
+    wanted = [song_id for song_id in dict.fromkeys(song_ids) if song_id not in songs]
+    rows = {}
+    for start in range(0, len(wanted), 500):
+        chunk = wanted[start:start + 500]
+        cursor.execute(f"""
+            SELECT id, artist, title, year, genre, duration
+            FROM songs
+            WHERE id IN ({', '.join('?' * len(chunk))}) AND deleted = FALSE
+        """, chunk)
+        rows.update((row[0], row) for row in cursor.fetchall())
+    for song_id in wanted:
+        if len(songs) == count:
+            return
+        row = rows.get(song_id)
+        if row is not None:
+            songs[song_id] = Song(id=row[0], artist=row[1], title=row[2], year=row[3], genre=row[4], duration=row[5])
+
+def _get_songs_at_offsets(offsets: list[int]) -> list[Song]:
+    """
+    Fetches the non-deleted songs at the given 0-based offsets in id order, one row per offset.
+
+    Raises:
+        ValueError: If an offset is past the end of the catalog, meaning the cached count was stale.
+    """
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            songs = []
+            for offset in offsets:
+                cursor.execute("""
+                    SELECT id, artist, title, year, genre, duration
+                    FROM songs
+                    WHERE deleted = FALSE
+                    ORDER BY id
+                    LIMIT 1 OFFSET ?
+                """, (offset,))
+                row = cursor.fetchone()
+                if row is None:
+                    _invalidate_song_count()
+                    logger.info("No song at offset %d, the song catalog has changed", offset)
+                    raise ValueError("The song catalog changed while picking a random song, please try again.")
+                songs.append(Song(id=row[0], artist=row[1], title=row[2], year=row[3], genre=row[4], duration=row[5]))
+            return songs
+
+    except sqlite3.Error as e:
+        logger.error("Database error while retrieving songs by offset: %s", str(e))
+        raise e
+
+def generate_songs_for_duration(target_duration: int, tolerance: int = 60, genre: Optional[str] = None,
+                                min_year: Optional[int] = None, max_year: Optional[int] = None) -> list[Song]:
+    """
+    Picks random non-deleted songs whose total duration is within tolerance of target_duration.
+
+    Only the number of candidate songs of each duration is read to solve the subset sum, so the
+    cost depends on the number of distinct durations, not on the number of candidates. The songs
+    of each chosen duration are then drawn at random.
+
+    Args:
+        target_duration (int): The total duration wanted, in seconds, up to MAX_GENERATED_DURATION.
+        tolerance (int): How far off the total may be, in seconds, up to target_duration. Default is one minute.
+        genre (str, optional): Only pick songs of this genre (case-insensitive).
+        min_year (int, optional): Only pick songs released in or after this year.
+        max_year (int, optional): Only pick songs released in or before this year.
+
+    Returns:
+        list[Song]: The songs, in random order, as close to target_duration as the candidates allow.
+
+    Raises:
+        ValueError: If a parameter is invalid, no combination of candidate songs is long enough
+            but not too long, or fewer songs of a duration were found than were counted.
+        sqlite3.Error: For any database errors.
+    """
+    if (not isinstance(target_duration, int) or isinstance(target_duration, bool)
+            or target_duration < 1 or target_duration > MAX_GENERATED_DURATION):
+        logger.error("Invalid target duration: %s", target_duration)
+        raise ValueError(f"Invalid target duration: {target_duration} (must be an integer between 1 and {MAX_GENERATED_DURATION}).")
+    # The solver's table is as long as the upper bound, so the tolerance must not stretch it
+    if not isinstance(tolerance, int) or isinstance(tolerance, bool) or tolerance < 0 or tolerance > target_duration:
+        logger.error("Invalid tolerance: %s", tolerance)
+        raise ValueError(f"Invalid tolerance: {tolerance} (must be an integer between 0 and the target duration).")
+    for name, year in (("min_year", min_year), ("max_year", max_year)):
+        if year is not None and (not isinstance(year, int) or isinstance(year, bool)):
+            logger.error("Invalid %s: %s", name, year)
+            raise ValueError(f"Invalid {name}: {year} (must be an integer).")
+
+    conditions = ["deleted = FALSE"]
+    params: list[Any] = []
+    if genre:
+        conditions.append("genre = ? COLLATE NOCASE")
+        params.append(genre)
+    if min_year is not None:
+        conditions.append("year >= ?")
+        params.append(min_year)
+    if max_year is not None:
+        conditions.append("year <= ?")
+        params.append(max_year)
+    where = " AND ".join(conditions)
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            # One read transaction, so the draws see the same songs as the counts the solver used
+            cursor.execute("BEGIN")
+            cursor.execute(f"SELECT duration, COUNT(*) FROM songs WHERE {where} GROUP BY duration", params)
+            duration_counts = dict(cursor.fetchall())
+            logger.info("Found %d candidate songs with %d distinct durations",
+                        sum(duration_counts.values()), len(duration_counts))
+
+            taken = solve_bounded_subset_sum(duration_counts, max(target_duration - tolerance, 0),
+                                             target_duration + tolerance, random.Random())
+            if not taken:
+                logger.info("No combination of songs lasts %d seconds (+/- %d)", target_duration, tolerance)
+                raise ValueError(f"No combination of songs lasts {target_duration} seconds (+/- {tolerance}).")
+
+            songs = []
+            for duration, count in taken.items():
+                cursor.execute(f"""
+                    SELECT id, artist, title, year, genre, duration
+                    FROM songs
+                    WHERE {where} AND duration = ?
+                    ORDER BY RANDOM()
+                    LIMIT ?
+                """, (*params, duration, count))
+                rows = cursor.fetchall()
+                if len(rows) < count:
+                    logger.info("Found %d songs lasting %d seconds instead of %d", len(rows), duration, count)
+                    raise ValueError("The song catalog changed while generating songs, please try again.")
+                songs.extend(Song(id=row[0], artist=row[1], title=row[2], year=row[3], genre=row[4], duration=row[5])
+                             for row in rows)
+
+        random.shuffle(songs)
+        logger.info("Generated %d songs lasting %d seconds", len(songs), sum(song.duration for song in songs))
+        return songs
+
+    except sqlite3.Error as e:
+        logger.error("Database error while generating songs: %s", str(e))
+        raise e
+
+def _invalidate_song_count() -> None:
+    """
+    Drops the cached number of non-deleted songs.
+    """
+    global _live_song_count, _song_count_generation
+    with _song_count_lock:
+        _live_song_count = None
+        _song_count_generation += 1
+
+def get_catalog_version() -> str:
+    """
+    Returns the catalog version, which changes whenever a song is created, changed, deleted or played.
+
+    It is kept in the database by triggers on the songs table, so every process serving the same
+    database returns the same version, and writes made outside this module are counted too.
+
+    Raises:
+        sqlite3.Error: For any database errors.
+    """
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT epoch, version FROM songs_version")
+            epoch, version = cursor.fetchone()
+            return f"{epoch}-{version}"
+
+    except sqlite3.Error as e:
+        logger.error("Database error while reading the catalog version: %s", str(e))
+        raise e
+
 def update_play_count(song_id: int) -> None:
     """
     Increments the play count of a song by song ID.
@@ -301,11 +1172,64 @@ def update_play_count(song_id: int) -> None:
                 raise ValueError(f"Song with ID {song_id} not found")
 
             # Increment the play count
-            cursor.execute("UPDATE songs SET play_count = play_count + 1 WHERE id = ?", (song_id,))
+            cursor.execute("UPDATE songs SET play_count = play_count + 1 WHERE id = ? RETURNING play_count", (song_id,))
+            play_count = cursor.fetchone()[0]
             conn.commit()
+            _update_top_songs({song_id: play_count})
+            record_plays({song_id: 1})
 
             logger.info("Play count incremented for song with ID: %d", song_id)
 
     except sqlite3.Error as e:
         logger.error("Database error while updating play count for song with ID %d: %s", song_id, str(e))
         raise e
+
+def update_play_counts(play_counts: dict[int, int]) -> None:
+    """
+    Increments the play counts of many songs in a single transaction.
+
+    Args:
+        play_counts (dict[int, int]): The number of plays to add, by song ID.
+
+    Raises:
+        ValueError: If any of the songs does not exist or is marked as deleted. No play count is updated then.
+        sqlite3.Error: If there is a database error.
+    """
+    if not play_counts:
+        return
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            logger.info("Attempting to update play counts for %d songs", len(play_counts))
+
+            cursor.executemany(
+                "UPDATE songs SET play_count = play_count + ? WHERE id = ? AND deleted = FALSE",
+                [(count, song_id) for song_id, count in play_counts.items()]
+            )
+
+            # Deleted or missing songs are skipped by the WHERE clause, so a short count means
+            # the batch must be rolled back. Only then are the songs checked one by one.
+            if cursor.rowcount != len(play_counts):
+                conn.rollback()
+                for song_id in play_counts:
+                    cursor.execute("SELECT deleted FROM songs WHERE id = ?", (song_id,))
+                    row = cursor.fetchone()
+                    if row is None:
+                        logger.info("Song with ID %d not found", song_id)
+                        raise ValueError(f"Song with ID {song_id} not found")
+                    if row[0]:
+                        logger.info("Song with ID %d has been deleted", song_id)
+                        raise ValueError(f"Song with ID {song_id} has been deleted")
+                raise ValueError("Play counts changed while updating, no play counts were updated")
+
+            new_play_counts = _fetch_play_counts(cursor, list(play_counts)) if _top_songs is not None else None
+            conn.commit()
+            _update_top_songs(new_play_counts)
+            record_plays(play_counts)
+
+            logger.info("Play counts incremented for %d songs", len(play_counts))
+
+    except sqlite3.Error as e:
+        logger.error("Database error while updating play counts: %s", str(e))
+        raise e
@@ -0,0 +1,60 @@
+import csv
+import json
+import logging
+from typing import Any, Iterable, Iterator
+
+from music_collection.utils.logger import configure_logger
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+SONG_FIELDS = ("artist", "title", "year", "genre", "duration")
+
+
+def read_csv_songs(lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """
+    Reads songs from CSV lines, one song per row, without loading the whole file.
+
+    The first row must be a header naming at least the artist, title, year, genre and duration columns.
+
+    Args:
+        lines (Iterable[str]): The lines of the CSV file, e.g. an open text file.
+
+    Yields:
+        dict[str, Any]: Each row, keyed by column name. Values are left as strings.
+
+    Raises:
+        ValueError: If the header is missing a required column.
+    """
+    reader = csv.DictReader(lines)
+    missing = [field for field in SONG_FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        logger.error("CSV header is missing columns: %s", ", ".join(missing))
+        raise ValueError(f"CSV header is missing columns: {', '.join(missing)}")
+    yield from reader
+
+
+def read_ndjson_songs(lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """
+    Reads songs from newline-delimited JSON, one object per line, without loading the whole file.
+
+    Blank lines are skipped.
+
+    Args:
+        lines (Iterable[str]): The lines of the NDJSON file, e.g. an open text file.
+
+    Yields:
+        dict[str, Any]: Each decoded object.
+
+    Raises:
+        ValueError: If a line is not valid JSON.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.error("Invalid JSON on line %d: %s", line_number, str(e))
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}")
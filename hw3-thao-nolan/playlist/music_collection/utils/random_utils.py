@@ -1,4 +1,6 @@
 import logging
+import os
+
 import requests
 
 from music_collection.utils.logger import configure_logger
@@ -7,6 +9,10 @@ logger = logging.getLogger(__name__)
 configure_logger(logger)
 
 
+# Where get_random_seed gets its entropy: 'os' (os.urandom) or 'random.org' (one request)
+ENTROPY_PROVIDER = os.getenv("ENTROPY_PROVIDER", "os")
+
+
 def get_random(num_songs: int) -> int:
     """
     Fetches a random int between 1 and the number of songs in the catalog from random.org.
@@ -46,3 +52,75 @@ def get_random(num_songs: int) -> int:
     except requests.exceptions.RequestException as e:
         logger.error("Request to random.org failed: %s", e)
         raise RuntimeError("Request to random.org failed: %s" % e)
+
+
+def get_random_batch(num_songs: int, count: int) -> list[int]:
+    """
+    Fetches many random ints between 1 and the number of songs in the catalog from random.org in one request.
+
+    Args:
+        num_songs (int): The largest number to return.
+        count (int): How many numbers to fetch, at most 10000 (the random.org limit).
+
+    Returns:
+        list[int]: The random numbers fetched from random.org. They may repeat.
+
+    Raises:
+        RuntimeError: If the request to random.org fails.
+        ValueError: If count is out of range or the response from random.org is invalid.
+    """
+    if not isinstance(count, int) or count < 1 or count > 10000:
+        raise ValueError("Invalid count: %s. Must be an integer between 1 and 10000." % count)
+
+    url = f"https://www.random.org/integers/?num={count}&min=1&max={num_songs}&col=1&base=10&format=plain&rnd=new"
+
+    try:
+        logger.info("Fetching %d random numbers from %s", count, url)
+
+        response = requests.get(url, timeout=5)
+        response.raise_for_status()
+
+        try:
+            random_numbers = [int(random_number_str) for random_number_str in response.text.split()]
+        except ValueError:
+            raise ValueError("Invalid response from random.org: %s" % response.text.strip())
+
+        if len(random_numbers) != count:
+            raise ValueError("Expected %d random numbers from random.org, got %d" % (count, len(random_numbers)))
+
+        logger.info("Received %d random numbers", len(random_numbers))
+        return random_numbers
+
+    except requests.exceptions.Timeout:
+        logger.error("Request to random.org timed out.")
+        raise RuntimeError("Request to random.org timed out.")
+
+    except requests.exceptions.RequestException as e:
+        logger.error("Request to random.org failed: %s", e)
+        raise RuntimeError("Request to random.org failed: %s" % e)
+
+
+def get_random_seed() -> int:
+    """
+    Gets a 64-bit seed for a local random number generator from the configured ENTROPY_PROVIDER.
+
+    With 'random.org' this makes a single request for four 16-bit numbers; with 'os' it makes none.
+
+    Returns:
+        int: The seed.
+
+    Raises:
+        RuntimeError: If the request to random.org fails.
+        ValueError: If ENTROPY_PROVIDER is unknown or the response from random.org is invalid.
+    """
+    if ENTROPY_PROVIDER == "os":
+        return int.from_bytes(os.urandom(8), "big")
+    if ENTROPY_PROVIDER != "random.org":
+        logger.error("Unknown entropy provider: %s", ENTROPY_PROVIDER)
+        raise ValueError("Unknown entropy provider: %s. Must be 'os' or 'random.org'." % ENTROPY_PROVIDER)
+
+    seed = 0
+    for chunk in get_random_batch(65536, 4):
+        seed = (seed << 16) | (chunk - 1)
+    logger.info("Seeded from random.org")
+    return seed
@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+import threading
+from typing import Iterator
+
+
+class RWLock:
+    """
+    A reader-writer lock: any number of threads can read at once, and a writer has the lock to itself.
+
+    Writers are preferred: once a writer is waiting, new readers wait behind it, so a steady
+    stream of readers cannot starve it. The lock is reentrant, and the thread holding it for
+    writing may also take it for reading. A reader cannot upgrade to writing.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers: dict[int, int] = {}
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read_lock(self) -> Iterator[None]:
+        """Holds the lock for reading for the duration of the with block."""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        """Holds the lock for writing for the duration of the with block."""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+    def acquire_read(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me and me not in self._readers:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+
+    def release_read(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            self._readers[me] -= 1
+            if not self._readers[me]:
+                del self._readers[me]
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            if me in self._readers:
+                raise RuntimeError("Cannot take a write lock while holding a read lock.")
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._cond.notify_all()
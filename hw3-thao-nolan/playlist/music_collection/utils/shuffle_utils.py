@@ -0,0 +1,49 @@
+import random
+from typing import Iterator, Optional
+
+
+class LazyShuffle:
+    """
+    A random order of the numbers 0 to n - 1, generated one number at a time.
+
+    It runs Fisher–Yates over a virtual list of range(n) and only stores the swapped slots,
+    so each step is O(1) and memory grows with the steps taken, not with n.
+    """
+
+    def __init__(self, n: int, rng: random.Random, not_first: Optional[int] = None):
+        """
+        Args:
+            n (int): The number of items to order.
+            rng (random.Random): The random number generator to draw from.
+            not_first (int, optional): A number that must not come first, unless it is the only one.
+        """
+        self.n = n
+        self._rng = rng
+        self._not_first = not_first
+        self._next = 0
+        self._swapped: dict[int, int] = {}
+
+    def __iter__(self) -> Iterator[int]:
+        return self
+
+    def __next__(self) -> int:
+        if self._next >= self.n:
+            raise StopIteration
+        i = self._next
+        if i == 0 and self._not_first is not None and 0 <= self._not_first < self.n and self.n > 1:
+            # Nothing is swapped yet, so slot j holds j; skip over the excluded slot
+            j = self._rng.randrange(self.n - 1)
+            j += j >= self._not_first
+        else:
+            j = self._rng.randrange(i, self.n)
+        value = self._swapped.get(j, j)
+        # Slot j now holds what slot i held; slot i is never read again
+        self._swapped[j] = self._swapped.pop(i, i)
+        self._next += 1
+        return value
+
+    def remaining(self) -> int:
+        """
+        Returns how many numbers are still to come.
+        """
+        return self.n - self._next
@@ -0,0 +1,81 @@
+import random
+from typing import Mapping, Optional
+
+import numpy as np
+
+
+def solve_bounded_subset_sum(counts: Mapping[int, int], low: int, high: int,
+                             rng: Optional[random.Random] = None) -> Optional[dict[int, int]]:
+    """
+    Picks how many items of each value to take so that their total falls between low and high,
+    as close to the middle of the range as possible.
+
+    This is a bounded subset sum over the distinct values, not the items: each value's count
+    is split into powers of two (1, 2, 4, ... and the rest), and every part is added to a
+    boolean table of reachable totals with one vectorized shift. The cost is about
+    O(distinct values * log(count) * high), whatever the number of items. The table never grows
+    past the total of all the items, however large high is.
+
+    Taking nothing is not a solution, even when low is 0 or less.
+
+    Args:
+        counts (Mapping[int, int]): The number of items of each positive integer value.
+        low (int): The smallest acceptable total.
+        high (int): The largest acceptable total.
+        rng (random.Random, optional): If given, the values are tried in a random order,
+            so repeated calls can find different solutions.
+
+    Returns:
+        Optional[dict[int, int]]: The number of items to take of each value (only values
+            taken at least once), or None if no positive total between low and high can be reached.
+    """
+    target = (low + high) // 2
+    low = max(low, 1)
+    if low > high:
+        return None
+    # No total can be larger than all the items together, so the table need not be either
+    high = min(high, sum(value * min(count, high // value) for value, count in counts.items() if value > 0))
+    if low > high:
+        return None
+
+    # Split every count into parts of 1, 2, 4, ... items, so any number up to the count is a sum of parts
+    values = [value for value in counts if 0 < value <= high]
+    if rng is not None:
+        rng.shuffle(values)
+    part_values = []
+    part_sizes = []
+    for value in values:
+        remaining = min(counts[value], high // value)
+        size = 1
+        while remaining > 0:
+            size = min(size, remaining)
+            part_values.append(value)
+            part_sizes.append(size)
+            remaining -= size
+            size *= 2
+
+    # reachable[t]: some parts add up to t. first_part[t]: the part that first reached t
+    reachable = np.zeros(high + 1, dtype=bool)
+    reachable[0] = True
+    first_part = np.full(high + 1, -1, dtype=np.int64)
+    for part, (value, size) in enumerate(zip(part_values, part_sizes)):
+        shift = value * size
+        if shift > high:
+            continue
+        # Computed from the table before this part, so each part is used at most once
+        new_totals = np.flatnonzero(reachable[:high + 1 - shift] & ~reachable[shift:]) + shift
+        reachable[new_totals] = True
+        first_part[new_totals] = part
+
+    candidates = np.flatnonzero(reachable[low:]) + low
+    if not len(candidates):
+        return None
+    total = int(candidates[np.argmin(np.abs(candidates - target))])
+
+    # Walk back through the parts that first reached each total; each comes from an earlier part
+    taken: dict[int, int] = {}
+    while total:
+        part = int(first_part[total])
+        taken[part_values[part]] = taken.get(part_values[part], 0) + part_sizes[part]
+        total -= part_values[part] * part_sizes[part]
+    return taken
@@ -0,0 +1,80 @@
+import heapq
+from typing import Iterable, Optional
+
+
+class TopK:
+    """
+    The k keys with the highest scores among those reported, for scores that only ever increase
+    (like play counts). Ties are broken by the lower key, as in ORDER BY score DESC, key.
+
+    The current top k are kept in a min-heap, so each update is O(log k) and reading them is
+    O(k log k), whatever the number of keys. Replaced heap entries are skipped when they
+    reach the top instead of being searched for.
+
+    It is not thread-safe; callers sharing one between threads must hold a lock around every call.
+    """
+
+    def __init__(self, k: int, scores: Iterable[tuple[int, int]] = ()):
+        """
+        Args:
+            k (int): The number of keys to keep.
+            scores (Iterable[tuple[int, int]]): Initial (key, score) pairs.
+        """
+        if not isinstance(k, int) or k < 1:
+            raise ValueError(f"Invalid k: {k} (must be a positive integer).")
+        self.k = k
+        self._scores: dict[int, int] = {}
+        self._heap: list[tuple[int, int, int]] = []
+        for key, score in scores:
+            self.update(key, score)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._scores
+
+    def update(self, key: int, score: int) -> None:
+        """
+        Reports the current score of a key. A score lower than the one already kept for the key is
+        ignored, since it was read before the kept one.
+        """
+        if key in self._scores:
+            if score <= self._scores[key]:
+                return
+            self._scores[key] = score
+            self._push(key, score)
+            return
+
+        if len(self._scores) < self.k:
+            self._scores[key] = score
+            self._push(key, score)
+            return
+
+        lowest = self._lowest()
+        if (score, -key) > (lowest[0], lowest[1]):
+            heapq.heappop(self._heap)
+            del self._scores[lowest[2]]
+            self._scores[key] = score
+            self._push(key, score)
+
+    def items(self, limit: Optional[int] = None) -> list[tuple[int, int]]:
+        """
+        Returns up to limit (default k) (key, score) pairs, highest score first.
+        """
+        return heapq.nsmallest(limit or self.k, self._scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def _lowest(self) -> tuple[int, int, int]:
+        """Drops replaced entries from the top of the heap and returns the lowest current one."""
+        while True:
+            score, _, key = self._heap[0]
+            if self._scores.get(key) == score:
+                return self._heap[0]
+            heapq.heappop(self._heap)
+
+    def _push(self, key: int, score: int) -> None:
+        heapq.heappush(self._heap, (score, -key, key))
+        # Rebuild from the current scores once replaced entries make up most of the heap
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(score, -key, key) for key, score in self._scores.items()]
+            heapq.heapify(self._heap)
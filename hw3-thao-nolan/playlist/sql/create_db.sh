@@ -3,12 +3,20 @@
 # Check if the database file already exists
 if [ -f "$DB_PATH" ]; then
     echo "Recreating database at $DB_PATH."
-    # Drop and recreate the tables
+    # Drop and recreate the song tables; the playlist and play log tables are only created if missing
     sqlite3 "$DB_PATH" < /app/sql/create_song_table.sql
+    sqlite3 "$DB_PATH" < /app/sql/create_playlist_tables.sql
+    sqlite3 "$DB_PATH" < /app/sql/create_play_tables.sql
+    # Playlists stored before shuffle play was saved lack its column
+    if [ -z "$(sqlite3 "$DB_PATH" "SELECT 1 FROM pragma_table_info('playlists') WHERE name = 'shuffle_play'")" ]; then
+        sqlite3 "$DB_PATH" "ALTER TABLE playlists ADD COLUMN shuffle_play BOOLEAN NOT NULL DEFAULT FALSE"
+    fi
     echo "Database recreated successfully."
 else
     echo "Creating database at $DB_PATH."
     # Create the database for the first time
     sqlite3 "$DB_PATH" < /app/sql/create_song_table.sql
+    sqlite3 "$DB_PATH" < /app/sql/create_playlist_tables.sql
+    sqlite3 "$DB_PATH" < /app/sql/create_play_tables.sql
     echo "Database created successfully."
 fi
\ No newline at end of file
@@ -0,0 +1,23 @@
+-- Created only if missing, so the play log survives every run of create_db.sh
+
+-- Every play, appended in batches (ts is seconds since the epoch)
+CREATE TABLE IF NOT EXISTS plays (
+    song_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL
+);
+
+-- Plays per song per minute and per hour (bucket = ts / 60 and ts / 3600), rolled up as plays
+-- are written, so trending queries read a few buckets instead of the plays table
+CREATE TABLE IF NOT EXISTS play_counts_minute (
+    bucket INTEGER NOT NULL,
+    song_id INTEGER NOT NULL,
+    plays INTEGER NOT NULL,
+    PRIMARY KEY (bucket, song_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS play_counts_hour (
+    bucket INTEGER NOT NULL,
+    song_id INTEGER NOT NULL,
+    plays INTEGER NOT NULL,
+    PRIMARY KEY (bucket, song_id)
+) WITHOUT ROWID;
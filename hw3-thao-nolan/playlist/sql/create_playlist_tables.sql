@@ -0,0 +1,15 @@
+-- Created only if missing, so stored playlists survive every run of create_db.sh
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    current_track_number INTEGER NOT NULL DEFAULT 1,
+    shuffle_play BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+-- One row per track, keyed by its 0-indexed position, so a change only rewrites the positions it moved
+CREATE TABLE IF NOT EXISTS playlist_tracks (
+    playlist_id INTEGER NOT NULL REFERENCES playlists (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL CHECK(position >= 0),
+    song_id INTEGER NOT NULL REFERENCES songs (id),
+    PRIMARY KEY (playlist_id, position)
+) WITHOUT ROWID;
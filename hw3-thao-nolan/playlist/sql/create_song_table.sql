@@ -1,3 +1,6 @@
+DROP TABLE IF EXISTS songs_fts;
+DROP TABLE IF EXISTS songs_fts_sync;
+DROP TABLE IF EXISTS songs_version;
 DROP TABLE IF EXISTS songs;
 CREATE TABLE songs (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -9,4 +12,66 @@ CREATE TABLE songs (
     play_count INTEGER DEFAULT 0,
     deleted BOOLEAN DEFAULT FALSE,
     UNIQUE(artist, title, year)
-);
\ No newline at end of file
+);
+
+-- Lets random selection read the live song IDs (get_random_songs) and skip to the n-th one
+-- (get_random_song, LIMIT 1 OFFSET n) through the index alone
+CREATE INDEX idx_songs_deleted_id ON songs (deleted, id);
+
+-- Serves pages sorted by play count (ORDER BY play_count DESC, id) straight from the index
+CREATE INDEX idx_songs_deleted_play_count_id ON songs (deleted, play_count DESC, id);
+
+-- Counts the live songs of each duration (optionally by genre and year) for generate_songs_for_duration
+-- from the index alone, and finds the songs of one duration without scanning the table
+CREATE INDEX idx_songs_deleted_duration ON songs (deleted, duration, genre COLLATE NOCASE, year);
+
+-- Full-text index over artist, title and genre for search_songs. It stores no copy of the
+-- text (content='songs') and keeps 2 and 3 character prefix indexes for type-ahead queries.
+CREATE VIRTUAL TABLE songs_fts USING fts5(
+    artist, title, genre,
+    content='songs', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+-- Keep songs_fts in sync with songs. Play count and soft-delete updates do not touch it,
+-- deleted songs are filtered out when searching.
+--
+-- create_songs sets paused inside its own transaction and indexes each chunk with one
+-- INSERT ... SELECT, which is about twice as fast as a trigger per row. Other connections
+-- never see paused set, since it is reset before the transaction commits.
+CREATE TABLE songs_fts_sync (paused BOOLEAN NOT NULL);
+INSERT INTO songs_fts_sync (paused) VALUES (FALSE);
+
+CREATE TRIGGER songs_fts_after_insert AFTER INSERT ON songs
+WHEN NOT (SELECT paused FROM songs_fts_sync) BEGIN
+    INSERT INTO songs_fts (rowid, artist, title, genre) VALUES (new.id, new.artist, new.title, new.genre);
+END;
+
+CREATE TRIGGER songs_fts_after_delete AFTER DELETE ON songs BEGIN
+    INSERT INTO songs_fts (songs_fts, rowid, artist, title, genre) VALUES ('delete', old.id, old.artist, old.title, old.genre);
+END;
+
+CREATE TRIGGER songs_fts_after_update AFTER UPDATE OF artist, title, genre ON songs BEGIN
+    INSERT INTO songs_fts (songs_fts, rowid, artist, title, genre) VALUES ('delete', old.id, old.artist, old.title, old.genre);
+    INSERT INTO songs_fts (rowid, artist, title, genre) VALUES (new.id, new.artist, new.title, new.genre);
+END;
+
+-- Counts the changes to songs, for get_catalog_version. Every process serving this database reads
+-- the same version. epoch is new each time this script runs, so a version of a dropped catalog never
+-- matches. create_songs bumps it once per chunk while paused is set, instead of once per row.
+CREATE TABLE songs_version (epoch TEXT NOT NULL, version INTEGER NOT NULL);
+INSERT INTO songs_version (epoch, version) VALUES (lower(hex(randomblob(8))), 0);
+
+CREATE TRIGGER songs_version_after_insert AFTER INSERT ON songs
+WHEN NOT (SELECT paused FROM songs_fts_sync) BEGIN
+    UPDATE songs_version SET version = version + 1;
+END;
+
+CREATE TRIGGER songs_version_after_update AFTER UPDATE ON songs BEGIN
+    UPDATE songs_version SET version = version + 1;
+END;
+
+CREATE TRIGGER songs_version_after_delete AFTER DELETE ON songs BEGIN
+    UPDATE songs_version SET version = version + 1;
+END;
@@ -0,0 +1,124 @@
+import random
+
+import pytest
+
+from music_collection.models.indexed_song_list import IndexedSongList
+from music_collection.models.song_model import Song
+
+
+def make_song(song_id: int) -> Song:
+    return Song(song_id, f'Artist {song_id}', f'Song {song_id}', 2000, 'Pop', 100 + song_id)
+
+@pytest.fixture
+def song_list():
+    """Fixture providing a list of five songs with IDs 1 to 5."""
+    return IndexedSongList(make_song(song_id) for song_id in range(1, 6))
+
+
+def test_lookup_by_song_id(song_list):
+    """Test membership, lookup and position by song ID."""
+    assert song_list.has_song_id(3)
+    assert not song_list.has_song_id(6)
+    assert song_list.get_by_song_id(3).title == 'Song 3'
+    assert song_list.index_of_song_id(3) == 2
+
+def test_duplicate_song_id(song_list):
+    """Test error when adding a song whose ID is already in the list."""
+    with pytest.raises(ValueError, match="Song with ID 2 already exists in the playlist"):
+        song_list.append(make_song(2))
+
+def test_remove_song_id(song_list):
+    """Test positions after the removed song shift down."""
+    removed = song_list.remove_song_id(2)
+
+    assert removed.id == 2
+    assert not song_list.has_song_id(2)
+    assert [song.id for song in song_list] == [1, 3, 4, 5]
+    assert song_list.index_of_song_id(5) == 3
+
+def test_move_and_swap_song_ids(song_list):
+    """Test moving and swapping songs keeps the ID index in sync."""
+    song_list.move_song_id(5, 0)
+    song_list.swap_song_ids(1, 4)
+
+    assert [song.id for song in song_list] == [5, 4, 2, 3, 1]
+    assert [song_list.index_of_song_id(song_id) for song_id in (5, 4, 2, 3, 1)] == [0, 1, 2, 3, 4]
+
+def test_matches_list_under_random_edits():
+    """Test the list and its ID index agree with a plain list after many random edits."""
+    rng = random.Random(411)
+    song_list = IndexedSongList()
+    expected = []
+    next_id = 1
+
+    for _ in range(2000):
+        operation = rng.choice(['append', 'insert', 'delete', 'move', 'swap'])
+        if operation in ('append', 'insert') or len(expected) < 2:
+            song = make_song(next_id)
+            next_id += 1
+            index = rng.randint(0, len(expected)) if operation == 'insert' else len(expected)
+            song_list.insert(index, song)
+            expected.insert(index, song)
+        elif operation == 'delete':
+            index = rng.randrange(len(expected))
+            del song_list[index]
+            del expected[index]
+        elif operation == 'move':
+            song = rng.choice(expected)
+            index = rng.randrange(len(expected))
+            song_list.move_song_id(song.id, index)
+            expected.remove(song)
+            expected.insert(index, song)
+        else:
+            song1, song2 = rng.sample(expected, 2)
+            song_list.swap_song_ids(song1.id, song2.id)
+            index1, index2 = expected.index(song1), expected.index(song2)
+            expected[index1], expected[index2] = expected[index2], expected[index1]
+
+        probe = rng.choice(expected)
+        assert song_list.index_of_song_id(probe.id) == expected.index(probe)
+
+    assert list(song_list) == expected
+
+def test_extend_builds_in_order(song_list):
+    """Test extending with many songs keeps their order and positions."""
+    song_list.extend(make_song(song_id) for song_id in range(6, 1001))
+
+    assert [song.id for song in song_list] == list(range(1, 1001))
+    assert song_list[-1].id == 1000
+    assert song_list.index_of_song_id(500) == 499
+
+def test_extend_duplicate_adds_nothing(song_list):
+    """Test extending with a duplicate song ID leaves the list unchanged."""
+    with pytest.raises(ValueError, match="Song with ID 7 already exists in the playlist"):
+        song_list.extend([make_song(6), make_song(7), make_song(7)])
+
+    assert len(song_list) == 5
+    assert not song_list.has_song_id(6)
+
+def test_slice(song_list):
+    """Test slicing returns the songs in the range, like a list."""
+    assert [song.id for song in song_list[1:4]] == [2, 3, 4]
+    assert [song.id for song in song_list[-2:]] == [4, 5]
+    assert [song.id for song in song_list[::2]] == [1, 3, 5]
+    assert song_list[4:2] == []
+
+def test_running_aggregates():
+    """Test the duration, genre and year aggregates follow adds, removes and clear."""
+    song_list = IndexedSongList([
+        Song(1, 'Artist 1', 'Song 1', 2020, 'Pop', 100),
+        Song(2, 'Artist 2', 'Song 2', 2021, 'Rock', 200)
+    ])
+    song_list.insert(0, Song(3, 'Artist 3', 'Song 3', 2020, 'Pop', 50))
+    song_list.move_song_id(3, 2)
+    del song_list[1]
+
+    assert song_list.get_stats() == {
+        "length": 2,
+        "duration": 150,
+        "genres": {"Pop": {"count": 2, "duration": 150}},
+        "years": {2020: 2}
+    }
+
+    song_list.clear()
+    assert song_list.get_stats() == {"length": 0, "duration": 0, "genres": {}, "years": {}}
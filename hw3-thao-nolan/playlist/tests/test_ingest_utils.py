@@ -0,0 +1,36 @@
+import io
+
+import pytest
+
+from music_collection.utils.ingest_utils import read_csv_songs, read_ndjson_songs
+
+
+def test_read_csv_songs():
+    """Test reading songs from CSV rows keyed by the header."""
+    lines = io.StringIO("artist,title,year,genre,duration\nArtist A,Song A,2020,Rock,210\n")
+
+    songs = list(read_csv_songs(lines))
+
+    assert songs == [{"artist": "Artist A", "title": "Song A", "year": "2020", "genre": "Rock", "duration": "210"}]
+
+def test_read_csv_songs_missing_column():
+    """Test error when the CSV header is missing a required column."""
+    lines = io.StringIO("artist,title,year,genre\nArtist A,Song A,2020,Rock\n")
+
+    with pytest.raises(ValueError, match="CSV header is missing columns: duration"):
+        list(read_csv_songs(lines))
+
+def test_read_ndjson_songs():
+    """Test reading songs from NDJSON, skipping blank lines."""
+    lines = io.StringIO('{"artist": "Artist A", "year": 2020}\n\n{"artist": "Artist B", "year": 2021}\n')
+
+    songs = list(read_ndjson_songs(lines))
+
+    assert songs == [{"artist": "Artist A", "year": 2020}, {"artist": "Artist B", "year": 2021}]
+
+def test_read_ndjson_songs_invalid_line():
+    """Test error with the line number when a line is not valid JSON."""
+    lines = io.StringIO('{"artist": "Artist A"}\n{"artist": \n')
+
+    with pytest.raises(ValueError, match="Invalid JSON on line 2"):
+        list(read_ndjson_songs(lines))
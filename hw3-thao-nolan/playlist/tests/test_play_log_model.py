@@ -0,0 +1,150 @@
+from contextlib import contextmanager
+import re
+
+import pytest
+
+from music_collection.models import play_log_model
+from music_collection.models.play_log_model import (
+    _window_buckets,
+    flush_plays,
+    get_trending_songs,
+    record_plays
+)
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+def normalize_whitespace(sql_query: str) -> str:
+    return re.sub(r'\s+', ' ', sql_query).strip()
+
+# Mocking the database connection for tests
+@pytest.fixture
+def mock_cursor(mocker):
+    mock_conn = mocker.Mock()
+    mock_cursor = mocker.Mock()
+
+    # Mock the connection's cursor
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = None  # Default return for queries
+    mock_cursor.fetchall.return_value = []
+    mock_cursor.commit.return_value = None
+
+    # Mock the get_db_connection context manager from sql_utils
+    @contextmanager
+    def mock_get_db_connection():
+        yield mock_conn  # Yield the mocked connection object
+
+    mocker.patch("music_collection.models.play_log_model.get_db_connection", mock_get_db_connection)
+
+    # Start every test with no pending plays
+    mocker.patch.object(play_log_model, "_pending_plays", [])
+
+    return mock_cursor  # Return the mock cursor so we can set expectations per test
+
+
+######################################################
+#
+#    Recording plays
+#
+######################################################
+
+def test_record_plays_batches(mock_cursor, mocker):
+    """Test that plays are only written once a batch is full."""
+    mocker.patch.object(play_log_model, "PLAY_LOG_BATCH_SIZE", 3)
+
+    record_plays({1: 2}, ts=1000)
+    mock_cursor.executemany.assert_not_called()
+
+    record_plays({2: 1}, ts=1001)
+    assert mock_cursor.executemany.call_args_list[0][0] == (
+        "INSERT INTO plays (song_id, ts) VALUES (?, ?)", [(1, 1000), (1, 1000), (2, 1001)]
+    )
+    assert play_log_model._pending_plays == []
+
+def test_record_plays_flushes_old_plays(mock_cursor):
+    """Test that a small batch is written once its oldest play is old enough."""
+    record_plays({1: 1}, ts=1000)
+    record_plays({1: 1}, ts=1000 + play_log_model.PLAY_LOG_FLUSH_SECONDS)
+
+    assert mock_cursor.executemany.call_count == 3
+
+def test_flush_plays_rolls_up_buckets(mock_cursor):
+    """Test that flushing adds the plays to the minute and hour buckets."""
+    record_plays({1: 2, 2: 1}, ts=3599)
+    record_plays({1: 1}, ts=3600)
+
+    assert flush_plays() == 4
+
+    minute_args = mock_cursor.executemany.call_args_list[1][0][1]
+    hour_args = mock_cursor.executemany.call_args_list[2][0][1]
+    assert sorted(minute_args) == [(59, 1, 2), (59, 2, 1), (60, 1, 1)]
+    assert sorted(hour_args) == [(0, 1, 2), (0, 2, 1), (1, 1, 1)]
+    assert "ON CONFLICT (bucket, song_id) DO UPDATE SET plays = plays + excluded.plays" in \
+        normalize_whitespace(mock_cursor.executemany.call_args_list[1][0][0])
+
+    # Both bucket tables are pruned past the longest window, plus an hour
+    oldest_minute = 60 - play_log_model.MAX_TRENDING_WINDOW_MINUTES - 60
+    assert [call[0] for call in mock_cursor.execute.call_args_list] == [
+        ("DELETE FROM play_counts_minute WHERE bucket < ?", (oldest_minute,)),
+        ("DELETE FROM play_counts_hour WHERE bucket < ?", (oldest_minute // 60,))
+    ]
+
+def test_flush_plays_failure_keeps_plays(mock_cursor):
+    """Test that plays stay pending when writing them fails."""
+    mock_cursor.executemany.side_effect = play_log_model.sqlite3.Error("disk I/O error")
+    record_plays({1: 1}, ts=1000)
+
+    with pytest.raises(play_log_model.sqlite3.Error):
+        flush_plays()
+    assert play_log_model._pending_plays == [(1, 1000)]
+
+
+######################################################
+#
+#    Trending
+#
+######################################################
+
+def test_window_buckets_whole_hours():
+    """Test a window is split into whole hours and the minutes around them."""
+    # Minutes 90 to 250: hours 2 and 3 (minutes 120-239), plus 90-119 and 240-250
+    assert _window_buckets(90, 250) == (2, 3, [(90, 119), (240, 250)])
+
+def test_window_buckets_within_an_hour():
+    """Test a window without a whole hour is read from the minute buckets only."""
+    first_hour, last_hour, minute_ranges = _window_buckets(61, 100)
+
+    assert first_hour > last_hour
+    assert minute_ranges[0] == (61, 100)
+
+def test_get_trending_songs(mock_cursor):
+    """Test the trending query reads the buckets covering the window."""
+    mock_cursor.fetchall.return_value = [(2, "Artist B", "Song B", 2021, "Pop", 180, 7)]
+
+    trending = get_trending_songs(window_minutes=120, top_n=5, now=250 * 60)
+
+    assert trending == [
+        {"id": 2, "artist": "Artist B", "title": "Song B", "year": 2021, "genre": "Pop", "duration": 180, "plays": 7}
+    ]
+    # Minutes 131 to 250: hour 3, plus minutes 131-179 and 240-250
+    assert mock_cursor.execute.call_args[0][1] == (3, 3, 131, 179, 240, 250, 5)
+
+def test_get_trending_songs_flush_failure(mock_cursor):
+    """Test that trending songs are still served from the written buckets when pending plays cannot be written."""
+    mock_cursor.executemany.side_effect = play_log_model.sqlite3.Error("database is locked")
+    mock_cursor.fetchall.return_value = [(2, "Artist B", "Song B", 2021, "Pop", 180, 7)]
+    record_plays({1: 1}, ts=1000)
+
+    trending = get_trending_songs(window_minutes=120, top_n=5, now=250 * 60)
+
+    assert [song["id"] for song in trending] == [2]
+    assert play_log_model._pending_plays == [(1, 1000)]
+
+def test_get_trending_songs_invalid_window(mock_cursor):
+    """Test error when the window is longer than the minute buckets are kept."""
+    with pytest.raises(ValueError, match="Invalid window_minutes"):
+        get_trending_songs(window_minutes=play_log_model.MAX_TRENDING_WINDOW_MINUTES + 1)
@@ -1,3 +1,5 @@
+import threading
+
 import pytest
 
 from music_collection.models.playlist_model import PlaylistModel
@@ -14,6 +16,11 @@ def mock_update_play_count(mocker):
     """Mock the update_play_count function for testing purposes."""
     return mocker.patch("music_collection.models.playlist_model.update_play_count")
 
+@pytest.fixture
+def mock_update_play_counts(mocker):
+    """Mock the batched update_play_counts function for testing purposes."""
+    return mocker.patch("music_collection.models.playlist_model.update_play_counts")
+
 """Fixtures providing sample songs for the tests."""
 @pytest.fixture
 def sample_song1():
@@ -44,6 +51,26 @@ def test_add_duplicate_song_to_playlist(playlist_model, sample_song1):
     with pytest.raises(ValueError, match="Song with ID 1 already exists in the playlist"):
         playlist_model.add_song_to_playlist(sample_song1)
 
+def test_add_songs(playlist_model, sample_song1, sample_song2):
+    """Test adding many songs at once, skipping the ones already in the playlist or repeated."""
+    playlist_model.add_song_to_playlist(sample_song1)
+    playlist_model.mark_saved()
+
+    errors = playlist_model.add_songs([sample_song1, sample_song2, sample_song2])
+
+    assert errors == {
+        0: "Song with ID 1 already exists in the playlist",
+        2: "Song with ID 2 already exists in the playlist",
+    }
+    assert playlist_model.get_all_songs() == [sample_song1, sample_song2]
+    assert playlist_model.get_changed_tracks() == [(1, 2)]
+
+def test_add_songs_invalid(playlist_model, sample_song1):
+    """Test that nothing is added when any song is invalid."""
+    with pytest.raises(TypeError, match="Song is not a valid song"):
+        playlist_model.add_songs([sample_song1, "not a song"])
+    assert playlist_model.get_playlist_length() == 0
+
 ##################################################
 # Remove Song Management Test Cases
 ##################################################
@@ -121,6 +148,39 @@ def test_move_song_to_beginning(playlist_model, sample_playlist):
     playlist_model.move_song_to_beginning(2)  # Move Song 2 to the beginning
     assert playlist_model.playlist[0].id == 2, "Expected Song 2 to be at the beginning"
 
+def test_apply_operations(playlist_model, sample_playlist):
+    """Test applying a batch of edits in order, recording only the positions that changed."""
+    song3 = Song(3, 'Artist 3', 'Song 3', 2020, 'Jazz', 200)
+    song4 = Song(4, 'Artist 4', 'Song 4', 2019, 'Pop', 210)
+    playlist_model.playlist.extend(sample_playlist + [song3])
+    playlist_model.mark_saved()
+
+    playlist_model.apply_operations([
+        {'op': 'swap', 'song1_id': 1, 'song2_id': 2},
+        {'op': 'insert', 'song': song4, 'track_number': 1},
+        {'op': 'move', 'song_id': 3, 'track_number': 2},
+        {'op': 'remove', 'track_number': 4},
+    ])
+
+    assert [song.id for song in playlist_model.get_all_songs()] == [4, 3, 2]
+    assert playlist_model.get_changed_tracks() == [(0, 4), (1, 3), (2, 2)]
+    assert playlist_model.get_playlist_duration() == 565
+
+def test_apply_operations_invalid_rolls_back(playlist_model, sample_playlist):
+    """Test that an invalid operation undoes the ones applied before it."""
+    playlist_model.playlist.extend(sample_playlist)
+    playlist_model.mark_saved()
+
+    with pytest.raises(ValueError, match="Operation 3: Song with id 1 not found in playlist"):
+        playlist_model.apply_operations([
+            {'op': 'move', 'song_id': 2, 'track_number': 1},
+            {'op': 'remove', 'song_id': 1},
+            {'op': 'swap', 'song1_id': 1, 'song2_id': 2},
+        ])
+
+    assert playlist_model.get_all_songs() == sample_playlist
+    assert not playlist_model.has_unsaved_changes()
+
 ##################################################
 # Song Retrieval Test Cases
 ##################################################
@@ -181,6 +241,33 @@ def test_get_playlist_duration(playlist_model, sample_playlist):
     playlist_model.playlist.extend(sample_playlist)
     assert playlist_model.get_playlist_duration() == 335, "Expected playlist duration to be 360 seconds"
 
+def test_snapshot_is_immutable_and_versioned(playlist_model, sample_song1, sample_song2):
+    """Test a snapshot keeps its songs after the playlist changes, and is reused until then."""
+    playlist_model.add_song_to_playlist(sample_song1)
+    snapshot = playlist_model.get_snapshot()
+    assert playlist_model.get_snapshot() is snapshot
+
+    playlist_model.add_song_to_playlist(sample_song2)
+    new_snapshot = playlist_model.get_snapshot()
+
+    assert list(snapshot) == [sample_song1]
+    assert list(new_snapshot) == [sample_song1, sample_song2]
+    assert new_snapshot.version > snapshot.version
+    assert new_snapshot.duration == 335
+
+def test_snapshot_shares_unchanged_chunks(playlist_model):
+    """Test a new snapshot only copies the chunks that changed."""
+    playlist_model.add_songs([Song(song_id, 'Artist', 'Song', 2000, 'Pop', 100) for song_id in range(1, 1001)])
+    snapshot = playlist_model.get_snapshot()
+
+    playlist_model.swap_songs_in_playlist(1, 2)
+    new_snapshot = playlist_model.get_snapshot()
+
+    assert new_snapshot.get_chunk(0) is not snapshot.get_chunk(0)
+    assert new_snapshot.get_chunk(1) is snapshot.get_chunk(1)
+    assert [song.id for song in new_snapshot][:3] == [2, 1, 3]
+    assert new_snapshot[999].id == 1000
+
 ##################################################
 # Utility Function Test Cases
 ##################################################
@@ -251,7 +338,7 @@ def test_play_current_song(playlist_model, sample_playlist, mock_update_play_cou
     """Test playing the current song."""
     playlist_model.playlist.extend(sample_playlist)
 
-    playlist_model.play_current_song()
+    assert playlist_model.play_current_song() == sample_playlist[0], "Expected the played song to be returned"
 
     # Assert that CURRENT_TRACK_NUMBER has been updated to 2
     assert playlist_model.current_track_number == 2, f"Expected track number to be 2, but got {playlist_model.current_track_number}"
@@ -260,7 +347,7 @@ def test_play_current_song(playlist_model, sample_playlist, mock_update_play_cou
     mock_update_play_count.assert_called_once_with(1)
 
     # Get the second song from the iterator (which will increment CURRENT_TRACK_NUMBER back to 1)
-    playlist_model.play_current_song()
+    assert playlist_model.play_current_song() == sample_playlist[1]
 
     # Assert that CURRENT_TRACK_NUMBER has been updated back to 1
     assert playlist_model.current_track_number == 1, f"Expected track number to be 1, but got {playlist_model.current_track_number}"
@@ -268,6 +355,32 @@ def test_play_current_song(playlist_model, sample_playlist, mock_update_play_cou
     # Assert that update_play_count was called with the id of the second song
     mock_update_play_count.assert_called_with(2)
 
+def test_play_current_song_failure_keeps_track(playlist_model, sample_playlist, mock_update_play_count):
+    """Test the current track number is unchanged when the play count update fails."""
+    playlist_model.playlist.extend(sample_playlist)
+    mock_update_play_count.side_effect = ValueError("Song with ID 1 has been deleted")
+
+    with pytest.raises(ValueError, match="Song with ID 1 has been deleted"):
+        playlist_model.play_current_song()
+
+    assert playlist_model.current_track_number == 1
+
+def test_play_current_song_does_not_block_readers(playlist_model, sample_playlist, mock_update_play_count):
+    """Test the playlist can be read from another thread while the play count is written."""
+    playlist_model.playlist.extend(sample_playlist)
+    lengths = []
+
+    def read_length(song_id):
+        thread = threading.Thread(target=lambda: lengths.append(playlist_model.get_playlist_length()))
+        thread.start()
+        thread.join(1)
+
+    mock_update_play_count.side_effect = read_length
+
+    playlist_model.play_current_song()
+
+    assert lengths == [2], "Expected the reader not to wait for the play count"
+
 def test_rewind_playlist(playlist_model, sample_playlist):
     """Test rewinding the iterator to the beginning of the playlist."""
     playlist_model.playlist.extend(sample_playlist)
@@ -283,29 +396,179 @@ def test_go_to_track_number(playlist_model, sample_playlist):
     playlist_model.go_to_track_number(2)
     assert playlist_model.current_track_number == 2, "Expected to be at track 2 after moving song"
 
-def test_play_entire_playlist(playlist_model, sample_playlist, mock_update_play_count):
+def test_play_entire_playlist(playlist_model, sample_playlist, mock_update_play_counts):
     """Test playing the entire playlist."""
     playlist_model.playlist.extend(sample_playlist)
 
     playlist_model.play_entire_playlist()
 
-    # Check that all play counts were updated
-    mock_update_play_count.assert_any_call(1)
-    mock_update_play_count.assert_any_call(2)
-    assert mock_update_play_count.call_count == len(playlist_model.playlist)
+    # Check that all play counts were updated in one batch
+    mock_update_play_counts.assert_called_once_with({1: 1, 2: 1})
 
     # Check that the current track number was updated back to the first song
     assert playlist_model.current_track_number == 1, "Expected to loop back to the beginning of the playlist"
 
-def test_play_rest_of_playlist(playlist_model, sample_playlist, mock_update_play_count):
+def test_play_rest_of_playlist(playlist_model, sample_playlist, mock_update_play_counts):
     """Test playing from the current position to the end of the playlist."""
     playlist_model.playlist.extend(sample_playlist)
     playlist_model.current_track_number = 2
 
     playlist_model.play_rest_of_playlist()
 
-    # Check that play counts were updated for the remaining songs
-    mock_update_play_count.assert_any_call(2)
-    assert mock_update_play_count.call_count == 1
+    # Check that play counts were updated for the remaining songs only
+    mock_update_play_counts.assert_called_once_with({2: 1})
+
+    assert playlist_model.current_track_number == 1, "Expected to loop back to the beginning of the playlist"
 
-    assert playlist_model.current_track_number == 1, "Expected to loop back to the beginning of the playlist"
\ No newline at end of file
+def test_play_entire_playlist_deleted_song(playlist_model, sample_playlist, mock_update_play_counts):
+    """Test the current track number is unchanged when the batched play count update fails."""
+    playlist_model.playlist.extend(sample_playlist)
+    playlist_model.current_track_number = 2
+    mock_update_play_counts.side_effect = ValueError("Song with ID 2 has been deleted")
+
+    with pytest.raises(ValueError, match="Song with ID 2 has been deleted"):
+        playlist_model.play_entire_playlist()
+
+    assert playlist_model.current_track_number == 1, "Expected the track number to stay at the reset position"
+
+def test_play_entire_playlist_does_not_block_readers(playlist_model, sample_playlist, mock_update_play_counts):
+    """Test the playlist can be read from another thread while the play counts are written."""
+    playlist_model.playlist.extend(sample_playlist)
+    lengths = []
+
+    def read_length(play_counts):
+        thread = threading.Thread(target=lambda: lengths.append(playlist_model.get_playlist_length()))
+        thread.start()
+        thread.join(1)
+
+    mock_update_play_counts.side_effect = read_length
+
+    playlist_model.play_entire_playlist()
+
+    assert lengths == [2], "Expected the reader not to wait for the play counts"
+
+##################################################
+# Change Tracking Test Cases
+##################################################
+
+def test_changed_tracks_after_move(playlist_model, sample_playlist):
+    """Test that moving a song only marks the positions it shifted as changed."""
+    sample_song3 = Song(3, 'Artist 3', 'Song 3', 2020, 'Jazz', 200)
+    for song in sample_playlist + [sample_song3]:
+        playlist_model.add_song_to_playlist(song)
+    playlist_model.mark_saved()
+    assert not playlist_model.has_unsaved_changes()
+
+    playlist_model.move_song_to_track_number(2, 1)
+
+    assert playlist_model.has_unsaved_changes()
+    assert playlist_model.get_changed_tracks() == [(0, 2), (1, 1)]
+
+def test_changed_tracks_after_remove(playlist_model, sample_playlist):
+    """Test that removing a song marks the following positions as changed and drops the last one."""
+    for song in sample_playlist:
+        playlist_model.add_song_to_playlist(song)
+    playlist_model.mark_saved()
+
+    playlist_model.remove_song_by_song_id(1)
+
+    assert playlist_model.get_changed_tracks() == [(0, 2)]
+    assert playlist_model.has_unsaved_changes()
+
+def test_changed_tracks_after_swap_and_play(playlist_model, sample_playlist, mock_update_play_count):
+    """Test that swapping marks both positions and playing only changes the track number."""
+    for song in sample_playlist:
+        playlist_model.add_song_to_playlist(song)
+    playlist_model.mark_saved()
+
+    playlist_model.play_current_song()
+    assert playlist_model.has_unsaved_changes()
+    assert playlist_model.get_changed_tracks() == []
+
+    playlist_model.swap_songs_in_playlist(1, 2)
+    assert playlist_model.get_changed_tracks() == [(0, 2), (1, 1)]
+
+def test_mark_saved_keeps_later_changes(playlist_model, sample_playlist):
+    """Test that marking a copy of the changes as saved keeps what changed after the copy was taken."""
+    for song in sample_playlist:
+        playlist_model.add_song_to_playlist(song)
+    changes = playlist_model.get_unsaved_changes()
+    assert changes["tracks"] == [(0, 1), (1, 2)]
+
+    playlist_model.swap_songs_in_playlist(1, 2)
+    playlist_model.mark_saved(changes)
+
+    assert playlist_model.get_changed_tracks() == [(0, 2), (1, 1)]
+    playlist_model.mark_saved(playlist_model.get_unsaved_changes())
+    assert playlist_model.get_unsaved_changes() is None
+
+##################################################
+# Shuffle Test Cases
+##################################################
+
+@pytest.fixture
+def mock_random_seed(mocker):
+    """Mock the entropy provider with a fixed seed."""
+    return mocker.patch("music_collection.models.playlist_model.get_random_seed", return_value=42)
+
+def test_shuffle_playlist(playlist_model, mock_random_seed):
+    """Test shuffling keeps every song, indexed by ID, and rewinds to the first track."""
+    songs = [Song(song_id, f'Artist {song_id}', f'Song {song_id}', 2020, 'Pop', 180) for song_id in range(1, 51)]
+    playlist_model.playlist.extend(songs)
+    playlist_model.current_track_number = 10
+    playlist_model.mark_saved()
+
+    playlist_model.shuffle_playlist()
+    playlist_model.shuffle_playlist()
+
+    shuffled = playlist_model.get_all_songs()
+    assert shuffled != songs, "Expected the order to change."
+    assert sorted(song.id for song in shuffled) == list(range(1, 51))
+    assert all(playlist_model.playlist.index_of_song_id(song.id) == index for index, song in enumerate(shuffled))
+    assert playlist_model.current_track_number == 1
+    assert len(playlist_model.get_changed_tracks()) == 50
+
+    # The generator is seeded once per playlist, not once per shuffle
+    mock_random_seed.assert_called_once()
+
+def test_play_current_song_shuffle_play(playlist_model, mock_update_play_count, mock_random_seed):
+    """Test shuffle play visits every track once per round without changing the playlist order."""
+    songs = [Song(song_id, f'Artist {song_id}', f'Song {song_id}', 2020, 'Pop', 180) for song_id in range(1, 11)]
+    playlist_model.playlist.extend(songs)
+    playlist_model.set_shuffle_play(True)
+
+    track_numbers = []
+    for _ in range(10):
+        playlist_model.play_current_song()
+        track_numbers.append(playlist_model.current_track_number)
+
+    assert sorted(track_numbers) == list(range(1, 11))
+    assert track_numbers != list(range(2, 11)) + [1]
+    assert playlist_model.get_all_songs() == songs
+
+def test_shuffle_play_round_does_not_repeat_last_track(playlist_model, mock_update_play_count, mock_random_seed):
+    """Test a new shuffle round never starts with the track that was just played."""
+    playlist_model.playlist.extend(Song(song_id, f'Artist {song_id}', f'Song {song_id}', 2020, 'Pop', 180)
+                                   for song_id in range(1, 4))
+    playlist_model.set_shuffle_play(True)
+
+    track_numbers = [playlist_model.current_track_number]
+    for _ in range(60):
+        playlist_model.play_current_song()
+        track_numbers.append(playlist_model.current_track_number)
+
+    assert all(first != second for first, second in zip(track_numbers, track_numbers[1:]))
+
+def test_get_playlist_stats(playlist_model, sample_playlist):
+    """Test the playlist stats follow songs being added and removed."""
+    for song in sample_playlist:
+        playlist_model.add_song_to_playlist(song)
+    playlist_model.remove_song_by_song_id(2)
+
+    assert playlist_model.get_playlist_stats() == {
+        "length": 1,
+        "duration": 180,
+        "genres": {"Pop": {"count": 1, "duration": 180}},
+        "years": {2022: 1}
+    }
+    assert playlist_model.get_playlist_duration() == 180
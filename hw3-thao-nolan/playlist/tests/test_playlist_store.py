@@ -0,0 +1,218 @@
+from contextlib import contextmanager
+import re
+import sqlite3
+import threading
+
+import pytest
+
+from music_collection.models import playlist_store
+from music_collection.models.playlist_model import PlaylistModel
+from music_collection.models.playlist_store import (
+    create_playlist,
+    delete_playlist,
+    get_playlist,
+    release_playlist,
+    save_playlist
+)
+from music_collection.models.song_model import Song
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+def normalize_whitespace(sql_query: str) -> str:
+    return re.sub(r'\s+', ' ', sql_query).strip()
+
+# Mocking the database connection for tests
+@pytest.fixture
+def mock_cursor(mocker):
+    mock_conn = mocker.Mock()
+    mock_cursor = mocker.Mock()
+
+    # Mock the connection's cursor
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = None  # Default return for queries
+    mock_cursor.fetchall.return_value = []
+    mock_cursor.commit.return_value = None
+
+    # Mock the get_db_connection context manager from sql_utils
+    @contextmanager
+    def mock_get_db_connection():
+        yield mock_conn  # Yield the mocked connection object
+
+    mocker.patch("music_collection.models.playlist_store.get_db_connection", mock_get_db_connection)
+
+    # Start every test with no playlists loaded
+    mocker.patch.object(playlist_store, "_hot_playlists", playlist_store.OrderedDict())
+    mocker.patch.object(playlist_store, "_evicting", {})
+    mocker.patch.object(playlist_store, "_pins", playlist_store.Counter())
+
+    return mock_cursor  # Return the mock cursor so we can set expectations per test
+
+@pytest.fixture
+def stored_playlist():
+    """A saved playlist with three songs."""
+    playlist_model = PlaylistModel(playlist_id=7, name="road trip")
+    for song_id in (1, 2, 3):
+        playlist_model.add_song_to_playlist(Song(song_id, f"Artist {song_id}", f"Song {song_id}", 2020, "Pop", 180))
+    playlist_model.mark_saved()
+    return playlist_model
+
+
+######################################################
+#
+#    Load and save
+#
+######################################################
+
+def test_get_playlist_loads_once(mock_cursor):
+    """Test that a playlist is loaded with its tracks in order and then served from memory."""
+
+    mock_cursor.fetchone.return_value = (7, 2, 1)
+    mock_cursor.fetchall.return_value = [
+        (2, "Artist 2", "Song 2", 2021, "Rock", 155),
+        (1, "Artist 1", "Song 1", 2022, "Pop", 180)
+    ]
+
+    playlist_model = get_playlist("road trip")
+
+    assert [song.id for song in playlist_model.get_all_songs()] == [2, 1]
+    assert playlist_model.current_track_number == 2
+    assert playlist_model.shuffle_play
+    assert not playlist_model.has_unsaved_changes()
+
+    assert get_playlist("road trip") is playlist_model
+    assert mock_cursor.execute.call_count == 2, "Expected the second lookup to be served from memory."
+
+def test_get_playlist_not_found(mock_cursor):
+    """Test error when no playlist has the name."""
+
+    with pytest.raises(ValueError, match="Playlist 'missing' not found"):
+        get_playlist("missing")
+
+def test_get_playlist_create(mock_cursor):
+    """Test that a missing playlist is created when asked to."""
+
+    mock_cursor.lastrowid = 3
+
+    playlist_model = get_playlist("new", create=True)
+
+    assert (playlist_model.playlist_id, playlist_model.name) == (3, "new")
+    assert mock_cursor.execute.call_args[0] == ("INSERT INTO playlists (name) VALUES (?)", ("new",))
+
+def test_save_playlist_writes_changed_positions(mock_cursor, stored_playlist):
+    """Test that saving only rewrites the positions that changed and trims removed ones."""
+
+    stored_playlist.remove_song_by_song_id(2)
+    save_playlist(stored_playlist)
+
+    insert_query, insert_args = mock_cursor.executemany.call_args[0]
+    assert normalize_whitespace(insert_query) == normalize_whitespace("""
+        INSERT OR REPLACE INTO playlist_tracks (playlist_id, position, song_id)
+        VALUES (?, ?, ?)
+    """)
+    assert insert_args == [(7, 1, 3)]
+    assert mock_cursor.execute.call_args_list[0][0] == (
+        "DELETE FROM playlist_tracks WHERE playlist_id = ? AND position >= ?", (7, 2)
+    )
+    assert not stored_playlist.has_unsaved_changes()
+
+def test_save_playlist_shuffle_play(mock_cursor, stored_playlist):
+    """Test that turning on shuffle play is saved with the current track number."""
+
+    stored_playlist.set_shuffle_play(True)
+    assert stored_playlist.has_unsaved_changes()
+    save_playlist(stored_playlist)
+
+    assert mock_cursor.execute.call_args[0] == (
+        "UPDATE playlists SET current_track_number = ?, shuffle_play = ? WHERE id = ?", (1, True, 7)
+    )
+    assert not stored_playlist.has_unsaved_changes()
+
+def test_save_playlist_without_changes(mock_cursor, stored_playlist):
+    """Test that saving an unchanged playlist does not touch the database."""
+
+    save_playlist(stored_playlist)
+
+    mock_cursor.executemany.assert_not_called()
+    mock_cursor.execute.assert_not_called()
+
+def test_save_playlist_does_not_lock_out_readers(mock_cursor, stored_playlist):
+    """Test that the playlist can be read and changed while it is written, and the change stays unsaved."""
+
+    stored_playlist.remove_song_by_song_id(3)
+
+    def change_while_saving(*args):
+        thread = threading.Thread(target=stored_playlist.go_to_track_number, args=(2,))
+        thread.start()
+        thread.join(1)
+        assert not thread.is_alive(), "Expected the change not to wait for the save."
+
+    mock_cursor.executemany.side_effect = change_while_saving
+    save_playlist(stored_playlist)
+
+    assert mock_cursor.execute.call_args[0][1] == (1, False, 7)
+    assert stored_playlist.has_unsaved_changes()
+    assert stored_playlist.get_changed_tracks() == []
+
+def test_eviction_saves_playlist(mock_cursor, mocker, stored_playlist):
+    """Test that the least recently used playlist is saved after it is dropped from memory, outside the store lock."""
+
+    mocker.patch.object(playlist_store, "PLAYLIST_CACHE_SIZE", 1)
+    def save_unlocked(playlist_model):
+        assert playlist_store._store_lock._is_owned() is False, "Expected the store lock not to be held."
+        assert list(playlist_store._hot_playlists) == ["party"]
+    mock_save = mocker.patch("music_collection.models.playlist_store.save_playlist", side_effect=save_unlocked)
+    playlist_store._remember(stored_playlist)
+
+    mock_cursor.lastrowid = 8
+    create_playlist("party")
+
+    mock_save.assert_called_once_with(stored_playlist)
+    assert list(playlist_store._hot_playlists) == ["party"]
+    assert playlist_store._evicting == {}
+
+def test_eviction_skips_pinned_playlist(mock_cursor, mocker, stored_playlist):
+    """Test that a pinned playlist stays loaded past the cache size and is evicted once released."""
+
+    mocker.patch.object(playlist_store, "PLAYLIST_CACHE_SIZE", 1)
+    playlist_store._remember(stored_playlist)
+    assert get_playlist("road trip", pin=True) is stored_playlist
+
+    mock_cursor.lastrowid = 8
+    create_playlist("party")
+    assert list(playlist_store._hot_playlists) == ["road trip", "party"]
+
+    release_playlist(stored_playlist)
+    assert list(playlist_store._hot_playlists) == ["party"]
+
+def test_get_playlist_takes_back_unsaved_evicted_playlist(mock_cursor, stored_playlist):
+    """Test that an evicted playlist whose save failed is returned instead of being reloaded."""
+
+    stored_playlist.remove_song_by_song_id(2)
+    playlist_store._evicting["road trip"] = stored_playlist
+    mock_cursor.executemany.side_effect = sqlite3.OperationalError("database is locked")
+
+    playlist_store._save_evicted()
+
+    assert playlist_store._evicting == {"road trip": stored_playlist}
+    assert get_playlist("road trip") is stored_playlist
+    mock_cursor.fetchone.assert_not_called()
+
+def test_delete_playlist(mock_cursor, stored_playlist):
+    """Test deleting a playlist removes its tracks and drops it from memory."""
+
+    playlist_store._remember(stored_playlist)
+    mock_cursor.fetchone.return_value = (7,)
+
+    delete_playlist("road trip")
+
+    executed = [call[0] for call in mock_cursor.execute.call_args_list[1:]]
+    assert executed == [
+        ("DELETE FROM playlist_tracks WHERE playlist_id = ?", (7,)),
+        ("DELETE FROM playlists WHERE id = ?", (7,))
+    ]
+    assert "road trip" not in playlist_store._hot_playlists
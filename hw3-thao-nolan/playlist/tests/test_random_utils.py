@@ -1,7 +1,7 @@
 import pytest
 import requests
 
-from music_collection.utils.random_utils import get_random
+from music_collection.utils.random_utils import get_random, get_random_batch, get_random_seed
 
 
 RANDOM_NUMBER = 42
@@ -47,4 +47,40 @@ def test_get_random_invalid_response(mock_random_org):
     mock_random_org.text = "invalid_response"
 
     with pytest.raises(ValueError, match="Invalid response from random.org: invalid_response"):
-        get_random(NUM_SONGS)
\ No newline at end of file
+        get_random(NUM_SONGS)
+
+def test_get_random_batch(mock_random_org):
+    """Test retrieving several random numbers from random.org in one request."""
+    mock_random_org.text = "42\n7\n42\n"
+
+    result = get_random_batch(NUM_SONGS, 3)
+
+    assert result == [42, 7, 42], f"Expected [42, 7, 42], but got {result}"
+    requests.get.assert_called_once_with("https://www.random.org/integers/?num=3&min=1&max=100&col=1&base=10&format=plain&rnd=new", timeout=5)
+
+def test_get_random_batch_short_response(mock_random_org):
+    """Simulate random.org returning fewer numbers than requested."""
+    mock_random_org.text = "42\n7\n"
+
+    with pytest.raises(ValueError, match="Expected 3 random numbers from random.org, got 2"):
+        get_random_batch(NUM_SONGS, 3)
+
+def test_get_random_batch_invalid_count():
+    """Test error when asking for more numbers than random.org allows."""
+    with pytest.raises(ValueError, match="Invalid count: 10001"):
+        get_random_batch(NUM_SONGS, 10001)
+
+def test_get_random_seed_from_random_org(mock_random_org, mocker):
+    """Test building a 64-bit seed from one random.org request."""
+    mocker.patch("music_collection.utils.random_utils.ENTROPY_PROVIDER", "random.org")
+    mock_random_org.text = "1\n2\n3\n65536\n"
+
+    assert get_random_seed() == (0 << 48) | (1 << 32) | (2 << 16) | 65535
+    requests.get.assert_called_once_with("https://www.random.org/integers/?num=4&min=1&max=65536&col=1&base=10&format=plain&rnd=new", timeout=5)
+
+def test_get_random_seed_from_os(mocker):
+    """Test the default entropy provider does not call random.org."""
+    mock_get = mocker.patch("requests.get")
+
+    assert 0 <= get_random_seed() < 2 ** 64
+    mock_get.assert_not_called()
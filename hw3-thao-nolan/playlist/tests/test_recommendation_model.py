@@ -0,0 +1,129 @@
+from contextlib import contextmanager
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+from music_collection.models import recommendation_model
+from music_collection.models.recommendation_model import (
+    add_song_features,
+    get_similar_songs,
+    recommend_songs,
+    remove_song_features
+)
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def song_db(mocker, tmp_path):
+    """Fixture providing a real in-memory catalog, with the feature matrix saved under tmp_path."""
+    conn = sqlite3.connect(":memory:")
+    with open(os.path.join(os.path.dirname(__file__), "..", "sql", "create_song_table.sql")) as schema:
+        conn.executescript(schema.read())
+    conn.executemany(
+        "INSERT INTO songs (artist, title, year, genre, duration, play_count) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            ("Artist 1", "Song 1", 1990, "Rock", 200, 10),
+            ("Artist 2", "Song 2", 1991, "Rock", 210, 12),
+            ("Artist 3", "Song 3", 2020, "Rock", 400, 500),
+            ("Artist 4", "Song 4", 1990, "Jazz", 200, 10),
+            ("Artist 5", "Song 5", 2015, "Pop", 180, 1000),
+        ]
+    )
+    conn.commit()
+
+    @contextmanager
+    def memory_db_connection():
+        yield conn
+
+    mocker.patch("music_collection.models.recommendation_model.get_db_connection", memory_db_connection)
+    mocker.patch("music_collection.models.recommendation_model.SONG_FEATURES_PATH", str(tmp_path / "features"))
+    mocker.patch("music_collection.models.recommendation_model._features", None)
+    yield conn
+    conn.close()
+
+
+######################################################
+#
+#    Recommendations
+#
+######################################################
+
+def test_get_similar_songs(song_db):
+    """Test similar songs are the closest in year, duration and popularity, with a bonus for the same genre."""
+    songs = get_similar_songs(1, k=3)
+
+    # Song 4 matches every feature but the genre, song 3 only the genre
+    assert [song["id"] for song in songs] == [2, 4, 5]
+    assert songs[0]["score"] > songs[1]["score"] > songs[2]["score"]
+
+def test_recommend_songs_excludes_seeds_and_deleted(song_db):
+    """Test the seed songs and deleted songs are never recommended."""
+    get_similar_songs(1)
+    song_db.execute("UPDATE songs SET deleted = TRUE WHERE id = 2")
+    remove_song_features(2)
+
+    songs = recommend_songs([1, 4], k=10)
+
+    assert 1 not in [song["id"] for song in songs]
+    assert 4 not in [song["id"] for song in songs]
+    assert 2 not in [song["id"] for song in songs]
+
+def test_recommend_songs_invalid(song_db):
+    """Test errors for an invalid k and for a song that does not exist."""
+    with pytest.raises(ValueError, match="Invalid k: 0"):
+        recommend_songs([1], k=0)
+    with pytest.raises(ValueError, match="Song with ID 99 not found"):
+        recommend_songs([99])
+    with pytest.raises(ValueError, match="None of the songs was found"):
+        recommend_songs([98, 99])
+
+def test_recommend_songs_skips_missing_seeds(song_db):
+    """Test deleted and missing songs, as a stored playlist may hold, are skipped instead of failing."""
+    song_db.execute("UPDATE songs SET deleted = TRUE WHERE id = 4")
+
+    assert recommend_songs([1, 4, 99], k=3) == recommend_songs([1], k=3)
+
+def test_recommend_songs_many_seeds(song_db):
+    """Test more seeds than SQLite takes parameters in one query are read in chunks."""
+    songs = recommend_songs([1] + list(range(1000, 40000)), k=2)
+
+    assert len(songs) == 2
+
+def test_added_song_is_recommended(song_db):
+    """Test a song added to the loaded matrix is recommended without rebuilding it."""
+    get_similar_songs(1)
+    song_db.execute("INSERT INTO songs (artist, title, year, genre, duration, play_count) VALUES ('Artist 6', 'Song 6', 1990, 'Rock', 200, 10)")
+    add_song_features(6, "Rock", 1990, 200, 10)
+
+    assert get_similar_songs(1, k=1)[0]["id"] == 6
+
+def test_added_song_replaces_blocks(song_db):
+    """Test adding a song of a new genre replaces the blocks instead of changing the dict a query may be iterating."""
+    get_similar_songs(1)
+    blocks = recommendation_model._features.blocks
+    genres = list(blocks)
+
+    add_song_features(6, "Polka", 1990, 200, 10)
+
+    assert list(blocks) == genres
+    assert "polka" in recommendation_model._features.blocks
+
+def test_saved_matrix_is_memory_mapped(song_db):
+    """Test the saved matrix is memory-mapped on the next load, and rebuilt once the catalog changed."""
+    get_similar_songs(1)
+    recommendation_model._features = None
+
+    get_similar_songs(1)
+    assert isinstance(recommendation_model._features.blocks["rock"].vectors, np.memmap)
+
+    song_db.execute("UPDATE songs SET deleted = TRUE WHERE id = 3")
+    recommendation_model._features = None
+    assert [song["id"] for song in get_similar_songs(1, k=2)] == [2, 4]
+    assert not isinstance(recommendation_model._features.blocks["rock"].vectors, np.memmap)
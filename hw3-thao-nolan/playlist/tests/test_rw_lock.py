@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from music_collection.utils.rw_lock import RWLock
+
+
+def test_readers_share_the_lock():
+    """Test a second thread can read while the lock is held for reading."""
+    lock = RWLock()
+    acquired = threading.Event()
+
+    def read():
+        with lock.read_lock():
+            acquired.set()
+
+    with lock.read_lock():
+        thread = threading.Thread(target=read)
+        thread.start()
+        assert acquired.wait(1)
+    thread.join()
+
+def test_writer_excludes_readers():
+    """Test a reader waits until the writer releases the lock."""
+    lock = RWLock()
+    acquired = threading.Event()
+
+    def read():
+        with lock.read_lock():
+            acquired.set()
+
+    with lock.write_lock():
+        thread = threading.Thread(target=read)
+        thread.start()
+        assert not acquired.wait(0.1)
+    assert acquired.wait(1)
+    thread.join()
+
+def test_writer_is_reentrant_and_may_read():
+    """Test the writing thread can take the lock again, for writing or reading."""
+    lock = RWLock()
+
+    with lock.write_lock():
+        with lock.write_lock():
+            with lock.read_lock():
+                pass
+
+    # Fully released: another thread can write
+    thread = threading.Thread(target=lambda: lock.write_lock().__enter__())
+    thread.start()
+    thread.join(1)
+    assert not thread.is_alive()
+
+def test_reader_cannot_upgrade():
+    """Test taking the write lock while reading raises instead of deadlocking."""
+    lock = RWLock()
+
+    with lock.read_lock():
+        with pytest.raises(RuntimeError, match="Cannot take a write lock while holding a read lock."):
+            lock.acquire_write()
@@ -0,0 +1,33 @@
+import random
+
+from music_collection.utils.shuffle_utils import LazyShuffle
+
+
+def test_lazy_shuffle_is_a_permutation():
+    """Test every number from 0 to n - 1 comes out exactly once."""
+    order = list(LazyShuffle(1000, random.Random(1)))
+
+    assert sorted(order) == list(range(1000))
+    assert order != list(range(1000))
+
+def test_lazy_shuffle_remaining():
+    """Test the count of numbers still to come, and that the order stops after n."""
+    shuffle = LazyShuffle(3, random.Random(1))
+
+    next(shuffle)
+    assert shuffle.remaining() == 2
+    assert len(list(shuffle)) == 2
+    assert shuffle.remaining() == 0
+
+def test_lazy_shuffle_not_first():
+    """Test the excluded number never comes first but still comes once."""
+    for seed in range(50):
+        order = list(LazyShuffle(3, random.Random(seed), not_first=1))
+        assert order[0] != 1
+        assert sorted(order) == [0, 1, 2]
+
+    assert list(LazyShuffle(1, random.Random(1), not_first=0)) == [0]
+
+def test_lazy_shuffle_empty():
+    """Test an empty order yields nothing."""
+    assert list(LazyShuffle(0, random.Random(1))) == []
@@ -1,18 +1,32 @@
 from contextlib import contextmanager
+import os
 import re
 import sqlite3
 
 import pytest
 
+from music_collection.models import song_model
 from music_collection.models.song_model import (
+    clear_song_cache,
     Song,
     create_song,
+    create_songs,
     delete_song,
     get_song_by_id,
     get_song_by_compound_key,
+    get_songs_by_compound_keys,
+    generate_songs_for_duration,
     get_all_songs,
+    get_songs_page,
     get_random_song,
-    update_play_count
+    get_song_cache_stats,
+    get_random_songs,
+    get_song_count,
+    get_top_songs,
+    iter_songs,
+    search_songs,
+    update_play_count,
+    update_play_counts
 )
 
 ######################################################
@@ -43,6 +57,14 @@ def mock_cursor(mocker):
 
     mocker.patch("music_collection.models.song_model.get_db_connection", mock_get_db_connection)
 
+    # Start every test without a song count cached by a previous test
+    mocker.patch("music_collection.models.song_model._live_song_count", None)
+    clear_song_cache()
+    mocker.patch("music_collection.models.song_model._top_songs", None)
+
+    # Keep plays out of the play log, which has its own tests
+    mocker.patch("music_collection.models.song_model.record_plays")
+
     return mock_cursor  # Return the mock cursor so we can set expectations per test
 
 ######################################################
@@ -106,6 +128,77 @@ def test_create_song_invalid_year():
     with pytest.raises(ValueError, match="Invalid year provided: invalid \(must be an integer greater than or equal to 1900\)."):
         create_song(artist="Artist Name", title="Song Title", year="invalid", genre="Pop", duration=180)
 
+def test_create_songs(mock_cursor):
+    """Test bulk creating songs, skipping invalid rows and reporting duplicates."""
+
+    mock_cursor.fetchone.return_value = (10,)  # highest existing song ID
+    mock_cursor.rowcount = 1
+    mock_cursor.fetchall.return_value = [("Artist B", "Song B", 2021)]
+
+    report = create_songs([
+        {"artist": "Artist A", "title": "Song A", "year": "2020", "genre": "Rock", "duration": "210"},
+        {"artist": "Artist B", "title": "Song B", "year": 2021, "genre": "Pop", "duration": 180},
+        {"artist": "Artist B", "title": "Song B", "year": 2021, "genre": "Pop", "duration": 180},
+        {"artist": "Artist C", "title": "Song C", "year": 1800, "genre": "Jazz", "duration": 200},
+        {"artist": "Artist D", "title": "Song D", "year": 2022, "genre": "Jazz"}
+    ])
+
+    assert report["inserted"] == 1
+    assert report["duplicate_count"] == 2
+    assert sorted(duplicate["row"] for duplicate in report["duplicates"]) == [1, 3]
+    assert report["invalid"] == [
+        {"row": 4, "error": "Year must be greater than 1900, got 1800"},
+        {"row": 5, "error": "Missing fields: duration"}
+    ]
+
+    # Only the two distinct valid songs are sent to the database, with year and duration as integers
+    insert_query, insert_args = mock_cursor.executemany.call_args[0]
+    assert normalize_whitespace(insert_query) == normalize_whitespace("""
+        INSERT OR IGNORE INTO songs (artist, title, year, genre, duration)
+        VALUES (?, ?, ?, ?, ?)
+    """)
+    assert insert_args == [
+        ("Artist A", "Song A", 2020, "Rock", 210),
+        ("Artist B", "Song B", 2021, "Pop", 180)
+    ]
+
+    # The new rows are indexed for search, and the skipped song found among them, by ID above the highest existing one
+    new_row_args = [call[0][1] for call in mock_cursor.execute.call_args_list if len(call[0]) > 1]
+    assert new_row_args == [(10,), (10,)]
+
+def test_create_songs_in_chunks(mock_cursor):
+    """Test that bulk creation commits once per chunk and skips the duplicate lookup when nothing was skipped."""
+
+    mock_cursor.fetchone.return_value = (0,)
+    mock_cursor.rowcount = 2
+    songs = [
+        {"artist": "Artist", "title": f"Song {i}", "year": 2020, "genre": "Pop", "duration": 100}
+        for i in range(4)
+    ]
+    report = create_songs(songs, chunk_size=2)
+
+    assert report["inserted"] == 4
+    assert mock_cursor.executemany.call_count == 2
+    mock_cursor.fetchall.assert_not_called()
+
+    # The highest ID is read only after the first write has opened the chunk's transaction
+    queries = [normalize_whitespace(call[0][0]) for call in mock_cursor.execute.call_args_list]
+    assert queries.index("SELECT COALESCE(MAX(id), 0) FROM songs") > queries.index("UPDATE songs_fts_sync SET paused = TRUE")
+
+def test_create_songs_rejects_fractional_and_boolean_numbers(mock_cursor):
+    """Test that bulk creation only takes whole numbers for year and duration, like Song."""
+
+    mock_cursor.fetchone.return_value = (0,)
+    mock_cursor.rowcount = 1
+    report = create_songs([
+        {"artist": "Artist A", "title": "Song A", "year": 2020, "genre": "Rock", "duration": 215.7},
+        {"artist": "Artist B", "title": "Song B", "year": 2020, "genre": "Rock", "duration": True},
+        {"artist": "Artist C", "title": "Song C", "year": 2020.0, "genre": "Rock", "duration": 215.0}
+    ])
+
+    assert [invalid["row"] for invalid in report["invalid"]] == [1, 2]
+    assert mock_cursor.executemany.call_args[0][1] == [("Artist C", "Song C", 2020, "Rock", 215)]
+
 def test_delete_song(mock_cursor):
     """Test soft deleting a song from the catalog by song ID."""
 
@@ -225,6 +318,88 @@ def test_get_song_by_compound_key(mock_cursor):
     expected_arguments = ("Artist Name", "Song Title", 2022)
     assert actual_arguments == expected_arguments, f"The SQL query arguments did not match. Expected {expected_arguments}, got {actual_arguments}."
 
+def test_get_songs_by_compound_keys(mock_cursor):
+    """Test resolving many compound keys in one query, with errors for missing and deleted songs."""
+    mock_cursor.fetchall.return_value = [
+        (0, 1, "Artist Name", "Song Title", 2022, "Pop", 180, False),
+        (1, None, None, None, None, None, None, None),
+        (2, 3, "Artist 3", "Song 3", 2020, "Rock", 200, True),
+    ]
+
+    result = get_songs_by_compound_keys([
+        ("Artist Name", "Song Title", 2022),
+        ("Missing", "Song", 2000),
+        ("Artist 3", "Song 3", 2020),
+    ])
+
+    assert result == [
+        Song(1, "Artist Name", "Song Title", 2022, "Pop", 180),
+        "Song with artist 'Missing', title 'Song', and year 2000 not found",
+        "Song with artist 'Artist 3', title 'Song 3', and year 2020 has been deleted",
+    ]
+
+    inserted = mock_cursor.executemany.call_args[0][1]
+    assert inserted == [(0, "Artist Name", "Song Title", 2022), (1, "Missing", "Song", 2000), (2, "Artist 3", "Song 3", 2020)]
+
+    expected_query = normalize_whitespace("""
+        SELECT k.position, s.id, s.artist, s.title, s.year, s.genre, s.duration, s.deleted
+        FROM lookup_keys k
+        LEFT JOIN songs s ON s.artist = k.artist AND s.title = k.title AND s.year = k.year
+        ORDER BY k.position
+    """)
+    assert normalize_whitespace(mock_cursor.execute.call_args_list[1][0][0]) == expected_query
+
+def test_get_song_by_id_cached(mock_cursor):
+    """Test that a song looked up by ID is served from the cache for both ID and compound key lookups."""
+
+    mock_cursor.fetchone.return_value = (1, "Artist Name", "Song Title", 2022, "Pop", 180, False)
+
+    first = get_song_by_id(1)
+    assert get_song_by_id(1) == first
+    assert get_song_by_compound_key("Artist Name", "Song Title", 2022) == first
+
+    assert mock_cursor.execute.call_count == 1, "Expected only the first lookup to query the database."
+    stats = get_song_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+    assert stats["hit_rate"] == 0.6667
+
+def test_delete_song_invalidates_cache(mock_cursor):
+    """Test that deleting a song removes it from the cache."""
+
+    mock_cursor.fetchone.return_value = (1, "Artist Name", "Song Title", 2022, "Pop", 180, False)
+    get_song_by_id(1)
+
+    mock_cursor.fetchone.return_value = [False]
+    delete_song(1)
+
+    mock_cursor.fetchone.return_value = (1, "Artist Name", "Song Title", 2022, "Pop", 180, True)
+    with pytest.raises(ValueError, match="Song with ID 1 has been deleted"):
+        get_song_by_id(1)
+
+def test_song_cache_evicts_least_recently_used(mock_cursor, mocker):
+    """Test that the cache evicts the least recently used song once it is full."""
+
+    mocker.patch("music_collection.models.song_model.SONG_CACHE_SIZE", 2)
+    mock_cursor.fetchone.side_effect = [
+        (1, "Artist A", "Song A", 2020, "Rock", 210, False),
+        (2, "Artist B", "Song B", 2021, "Pop", 180, False),
+        (3, "Artist C", "Song C", 2022, "Jazz", 200, False)
+    ]
+
+    get_song_by_id(1)
+    get_song_by_id(2)
+    get_song_by_id(1)  # song 1 is now more recently used than song 2
+    get_song_by_id(3)
+
+    stats = get_song_cache_stats()
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+
+    # Song 2 was evicted, so looking it up by compound key has to query again
+    mock_cursor.fetchone.side_effect = [(2, "Artist B", "Song B", 2021, "Pop", 180, False)]
+    get_song_by_compound_key("Artist B", "Song B", 2021)
+    assert mock_cursor.execute.call_count == 4
+
 def test_get_all_songs(mock_cursor):
     """Test retrieving all songs that are not marked as deleted."""
 
@@ -312,14 +487,188 @@ def test_get_all_songs_ordered_by_play_count(mock_cursor):
 
     assert actual_query == expected_query, "The SQL query did not match the expected structure."
 
-def test_get_random_song(mock_cursor, mocker):
-    """Test retrieving a random song from the catalog."""
+def test_get_songs_page_by_play_count(mock_cursor):
+    """Test retrieving a page of songs sorted by play count after a cursor."""
+
+    mock_cursor.fetchall.return_value = [
+        (2, "Artist B", "Song B", 2021, "Pop", 180, 20),
+        (1, "Artist A", "Song A", 2020, "Rock", 210, 10)
+    ]
+
+    page = get_songs_page(sort_by_play_count=True, limit=2, cursor="20:1")
+
+    assert [song["id"] for song in page["songs"]] == [2, 1]
+    assert page["next_cursor"] == "10:1", f"Expected next cursor '10:1', got {page['next_cursor']}"
+
+    expected_query = normalize_whitespace("""
+        SELECT id, artist, title, year, genre, duration, play_count
+        FROM songs
+        WHERE deleted = FALSE
+        AND play_count <= ? AND (play_count < ? OR id > ?)
+        ORDER BY play_count DESC, id LIMIT ?
+    """)
+    actual_query = normalize_whitespace(mock_cursor.execute.call_args[0][0])
+
+    assert actual_query == expected_query, "The SQL query did not match the expected structure."
+    assert mock_cursor.execute.call_args[0][1] == [20, 20, 1, 2]
+
+def test_get_songs_page_last_page(mock_cursor):
+    """Test that a page shorter than the limit has no next cursor."""
+
+    mock_cursor.fetchall.return_value = [(3, "Artist C", "Song C", 2022, "Jazz", 200, 5)]
+
+    page = get_songs_page(limit=2, cursor="2")
+
+    assert page["next_cursor"] is None
+    assert mock_cursor.execute.call_args[0][1] == [2, 2]
+
+def test_get_songs_page_invalid_cursor(mock_cursor):
+    """Test error when the cursor does not match the sort order."""
+
+    with pytest.raises(ValueError, match="Invalid page cursor: 20"):
+        get_songs_page(sort_by_play_count=True, cursor="20")
+
+def test_iter_songs(mock_cursor):
+    """Test iterating over the whole catalog one page at a time."""
+
+    mock_cursor.fetchall.side_effect = [
+        [(1, "Artist A", "Song A", 2020, "Rock", 210, 10), (2, "Artist B", "Song B", 2021, "Pop", 180, 20)],
+        [(3, "Artist C", "Song C", 2022, "Jazz", 200, 5)]
+    ]
+
+    songs = list(iter_songs(page_size=2))
+
+    assert [song["id"] for song in songs] == [1, 2, 3]
+    assert mock_cursor.execute.call_count == 2, "Expected one query per page."
+
+def test_search_songs(mock_cursor):
+    """Test a ranked type-ahead search, with one extra row fetched to detect the next page."""
 
-    # Simulate that there are multiple songs in the database
     mock_cursor.fetchall.return_value = [
         (1, "Artist A", "Song A", 2020, "Rock", 210, 10),
+        (2, "Artist B", "Song B", 2021, "Pop", 180, 20)
+    ]
+
+    results = search_songs("rock: son", prefix=True, limit=1)
+
+    assert [song["id"] for song in results["songs"]] == [1]
+    assert results["next_offset"] == 1
+
+    expected_query = normalize_whitespace("""
+        SELECT s.id, s.artist, s.title, s.year, s.genre, s.duration, s.play_count
+        FROM songs_fts
+        JOIN songs s ON s.id = songs_fts.rowid
+        WHERE songs_fts MATCH ? AND s.deleted = FALSE
+        ORDER BY bm25(songs_fts, 2.0, 3.0, 1.0), s.id
+        LIMIT ? OFFSET ?
+    """)
+    actual_query = normalize_whitespace(mock_cursor.execute.call_args[0][0])
+
+    assert actual_query == expected_query, "The SQL query did not match the expected structure."
+    # Words are quoted so punctuation cannot be read as FTS5 syntax, and only the last one is a prefix
+    assert mock_cursor.execute.call_args[0][1] == ('"rock" "son"*', 2, 0)
+
+def test_search_songs_no_words(mock_cursor):
+    """Test error when the search query has no words."""
+
+    with pytest.raises(ValueError, match="Search query must contain at least one word."):
+        search_songs(" - ")
+
+def test_search_index_follows_songs(mocker):
+    """Test that the search index triggers follow inserts, bulk loads, edits and deletes on a real database."""
+
+    conn = sqlite3.connect(":memory:")
+    with open(os.path.join(os.path.dirname(__file__), "..", "sql", "create_song_table.sql")) as schema:
+        conn.executescript(schema.read())
+
+    @contextmanager
+    def memory_db_connection():
+        yield conn
+
+    mocker.patch("music_collection.models.song_model.get_db_connection", memory_db_connection)
+    mocker.patch("music_collection.models.song_model._live_song_count", None)
+    clear_song_cache()
+
+    create_song(artist="Miles Davis", title="So What", year=1959, genre="Jazz", duration=562)
+    create_songs([{"artist": "Nirvana", "title": "Lithium", "year": 1991, "genre": "Rock", "duration": 257}])
+
+    assert [song["title"] for song in search_songs("miles")["songs"]] == ["So What"]
+    assert [song["title"] for song in search_songs("lith", prefix=True)["songs"]] == ["Lithium"]
+
+    conn.execute("UPDATE songs SET title = 'Blue in Green' WHERE title = 'So What'")
+    assert search_songs("what")["songs"] == []
+    assert [song["title"] for song in search_songs("blue green")["songs"]] == ["Blue in Green"]
+
+    # Soft-deleted songs stay indexed but are not returned
+    delete_song(1)
+    assert search_songs("miles")["songs"] == []
+    conn.close()
+
+def test_get_top_songs_from_tracker(mock_cursor, mocker):
+    """Test the top songs are seeded once from the index and then follow play count updates in memory."""
+
+    mocker.patch("music_collection.models.song_model.TOP_SONGS_TRACKED", 2)
+    mock_cursor.fetchall.return_value = [
         (2, "Artist B", "Song B", 2021, "Pop", 180, 20),
-        (3, "Artist C", "Song C", 2022, "Jazz", 200, 5)
+        (1, "Artist A", "Song A", 2020, "Rock", 210, 10)
+    ]
+
+    assert [song["id"] for song in get_top_songs(2)] == [2, 1]
+    seed_query = normalize_whitespace(mock_cursor.execute.call_args[0][0])
+    assert seed_query.endswith("ORDER BY play_count DESC, id LIMIT ?")
+    assert mock_cursor.execute.call_args[0][1] == [2]
+
+    # Song 3 is played up to 25 plays and takes the top spot from outside the top songs
+    mock_cursor.fetchone.side_effect = [
+        [False], (25,),
+        (3, "Artist C", "Song C", 2022, "Jazz", 200, False)
+    ]
+    update_play_count(3)
+    mock_cursor.execute.reset_mock()
+
+    top_songs = get_top_songs(2)
+
+    assert [(song["id"], song["play_count"]) for song in top_songs] == [(3, 25), (2, 20)]
+    assert mock_cursor.execute.call_count == 1, "Expected only song 3's details to be read."
+
+def test_update_play_counts_drops_top_songs_seeded_meanwhile(mock_cursor, mocker):
+    """Test that top songs seeded while a batch of plays was committing are dropped instead of missing the plays."""
+
+    mock_cursor.rowcount = 1
+    top_songs = mocker.Mock()
+
+    # The top songs are not seeded when the play counts could be read, but are by the commit
+    def seed_top_songs():
+        mocker.patch("music_collection.models.song_model._top_songs", top_songs)
+    mock_fetch_play_counts = mocker.patch("music_collection.models.song_model._fetch_play_counts")
+    with song_model.get_db_connection() as conn:
+        conn.commit.side_effect = seed_top_songs
+
+    update_play_counts({1: 1})
+
+    mock_fetch_play_counts.assert_not_called()
+    top_songs.update.assert_not_called()
+    assert song_model._top_songs is None
+
+def test_get_top_songs_beyond_tracker(mock_cursor, mocker):
+    """Test that asking for more songs than are tracked reads exactly k rows from the index."""
+
+    mocker.patch("music_collection.models.song_model.TOP_SONGS_TRACKED", 1)
+    mock_cursor.fetchall.return_value = [
+        (2, "Artist B", "Song B", 2021, "Pop", 180, 20),
+        (1, "Artist A", "Song A", 2020, "Rock", 210, 10)
+    ]
+
+    assert [song["id"] for song in get_top_songs(2)] == [2, 1]
+    assert mock_cursor.execute.call_args[0][1] == [2]
+
+def test_get_random_song(mock_cursor, mocker):
+    """Test retrieving a random song from the catalog."""
+
+    # Simulate a catalog of 3 songs, then the song found at the random offset
+    mock_cursor.fetchone.side_effect = [
+        (3,),
+        (2, "Artist B", "Song B", 2021, "Pop", 180)
     ]
 
     # Mock random number generation to return the 2nd song
@@ -328,7 +677,7 @@ def test_get_random_song(mock_cursor, mocker):
     # Call the get_random_song method
     result = get_random_song()
 
-    # Expected result based on the mock random number and fetchall return value
+    # Expected result based on the mock random number and the fetched row
     expected_result = Song(2, "Artist B", "Song B", 2021, "Pop", 180)
 
     # Ensure the result matches the expected output
@@ -337,32 +686,147 @@ def test_get_random_song(mock_cursor, mocker):
     # Ensure that the random number was called with the correct number of songs
     mock_random.assert_called_once_with(3)
 
-    # Ensure the SQL query was executed correctly
-    expected_query = normalize_whitespace("SELECT id, artist, title, year, genre, duration, play_count FROM songs WHERE deleted = FALSE")
+    # Ensure only the live songs were counted and exactly one row was fetched
+    count_query = normalize_whitespace(mock_cursor.execute.call_args_list[0][0][0])
+    assert count_query == "SELECT COUNT(*) FROM songs WHERE deleted = FALSE"
+
+    expected_query = normalize_whitespace("""
+        SELECT id, artist, title, year, genre, duration
+        FROM songs
+        WHERE deleted = FALSE
+        ORDER BY id
+        LIMIT 1 OFFSET ?
+    """)
     actual_query = normalize_whitespace(mock_cursor.execute.call_args[0][0])
 
-    # Assert that the SQL query was correct
+    # Assert that the SQL query was correct, using the 0-based offset
     assert actual_query == expected_query, "The SQL query did not match the expected structure."
+    assert mock_cursor.execute.call_args[0][1] == (1,)
 
 def test_get_random_song_empty_catalog(mock_cursor, mocker):
     """Test retrieving a random song when the catalog is empty."""
 
     # Simulate that the catalog is empty
-    mock_cursor.fetchall.return_value = []
+    mock_cursor.fetchone.return_value = (0,)
+    mock_random = mocker.patch("music_collection.models.song_model.get_random")
 
     # Expect a ValueError to be raised when calling get_random_song with an empty catalog
     with pytest.raises(ValueError, match="The song catalog is empty"):
         get_random_song()
 
     # Ensure that the random number was not called since there are no songs
-    mocker.patch("music_collection.models.song_model.get_random").assert_not_called()
+    mock_random.assert_not_called()
 
-    # Ensure the SQL query was executed correctly
-    expected_query = normalize_whitespace("SELECT id, artist, title, year, genre, duration, play_count FROM songs WHERE deleted = FALSE")
-    actual_query = normalize_whitespace(mock_cursor.execute.call_args[0][0])
+def test_get_song_count_cached(mock_cursor):
+    """Test the number of live songs is only counted once until the catalog changes."""
 
-    # Assert that the SQL query was correct
-    assert actual_query == expected_query, "The SQL query did not match the expected structure."
+    mock_cursor.fetchone.return_value = (3,)
+
+    assert get_song_count() == 3
+    assert get_song_count() == 3
+    assert mock_cursor.execute.call_count == 1, "Expected the second count to come from the cache."
+
+    create_song(artist="Artist Name", title="Song Title", year=2022, genre="Pop", duration=180)
+    mock_cursor.fetchone.return_value = (4,)
+    assert get_song_count() == 4, "Expected create_song to reset the cached count."
+
+def test_generate_songs_for_duration(mock_cursor, mocker):
+    """Test songs are picked by duration counts and drawn for each duration chosen."""
+    mocker.patch("music_collection.models.song_model.solve_bounded_subset_sum", return_value={200: 1, 100: 2})
+    mock_cursor.fetchall.side_effect = [
+        [(100, 4), (200, 3)],
+        [(1, "Artist 1", "Song 1", 2001, "Jazz", 200)],
+        [(2, "Artist 2", "Song 2", 2002, "Jazz", 100), (3, "Artist 3", "Song 3", 2003, "Jazz", 100)],
+    ]
+
+    songs = generate_songs_for_duration(400, tolerance=10, genre="jazz", min_year=2000)
+
+    assert sorted(song.id for song in songs) == [1, 2, 3]
+    song_model.solve_bounded_subset_sum.assert_called_once()
+    assert song_model.solve_bounded_subset_sum.call_args[0][:3] == ({100: 4, 200: 3}, 390, 410)
+
+    expected_query = normalize_whitespace(
+        "SELECT duration, COUNT(*) FROM songs WHERE deleted = FALSE AND genre = ? COLLATE NOCASE AND year >= ? GROUP BY duration"
+    )
+    assert mock_cursor.execute.call_args_list[0][0] == ("BEGIN",)
+    assert normalize_whitespace(mock_cursor.execute.call_args_list[1][0][0]) == expected_query
+    assert mock_cursor.execute.call_args_list[2][0][1] == ("jazz", 2000, 200, 1)
+
+def test_generate_songs_for_duration_short_draw(mock_cursor, mocker):
+    """Test an error is raised when a duration has fewer songs than were counted for it."""
+    mocker.patch("music_collection.models.song_model.solve_bounded_subset_sum", return_value={100: 2})
+    mock_cursor.fetchall.side_effect = [
+        [(100, 2)],
+        [(2, "Artist 2", "Song 2", 2002, "Jazz", 100)],
+    ]
+
+    with pytest.raises(ValueError, match="The song catalog changed while generating songs, please try again."):
+        generate_songs_for_duration(200)
+
+def test_generate_songs_for_duration_no_fit(mock_cursor):
+    """Test an error is raised when no combination of songs fits the target."""
+    mock_cursor.fetchall.return_value = [(300, 2)]
+
+    with pytest.raises(ValueError, match=r"No combination of songs lasts 400 seconds \(\+/- 60\)."):
+        generate_songs_for_duration(400)
+
+@pytest.mark.parametrize("target_duration", [0, True])
+def test_generate_songs_for_duration_invalid_target(target_duration):
+    """Test an error is raised for a target duration that is not a positive integer."""
+    with pytest.raises(ValueError, match=f"Invalid target duration: {target_duration}"):
+        generate_songs_for_duration(target_duration)
+
+def test_generate_songs_for_duration_bool_tolerance():
+    """Test an error is raised for a boolean tolerance, even though bool is an int."""
+    with pytest.raises(ValueError, match="Invalid tolerance: False"):
+        generate_songs_for_duration(600, tolerance=False)
+
+def test_generate_songs_for_duration_tolerance_too_large():
+    """Test an error is raised for a tolerance larger than the target, which would size the solver's table."""
+    with pytest.raises(ValueError, match="Invalid tolerance: 10000000000"):
+        generate_songs_for_duration(600, tolerance=10 ** 10)
+
+@pytest.mark.parametrize("probes", [4, 0])
+def test_get_random_songs(mock_cursor, mocker, probes):
+    """Test retrieving several different random songs, replacing repeats, gaps and deleted songs."""
+
+    # Songs 1, 2 and 4 are live; 3 is deleted
+    live_songs = {song_id: (song_id, f"Artist {song_id}", f"Song {song_id}", 2020, "Rock", 210) for song_id in (1, 2, 4)}
+    mock_cursor.fetchone.side_effect = [(3,), (1, 4)]
+
+    def fetch_live_songs():
+        query, *params = mock_cursor.execute.call_args[0]
+        if "IN" not in query:
+            return [(song_id,) for song_id in live_songs]
+        return [live_songs[song_id] for song_id in params[0] if song_id in live_songs]
+
+    mock_cursor.fetchall.side_effect = fetch_live_songs
+    mock_random_batch = mocker.patch(
+        "music_collection.models.song_model.get_random_batch", side_effect=[[4, 4, 3]]
+    )
+    mocker.patch("music_collection.models.song_model.get_random_seed", return_value=42)
+    mocker.patch("music_collection.models.song_model.RANDOM_SONG_PROBES", probes)
+
+    result = get_random_songs(3)
+
+    assert sorted(song.id for song in result) == [1, 2, 4]
+    mock_random_batch.assert_called_once_with(4, 3)
+    if probes:
+        assert result[0].id == 4, "Expected the first random.org draw to be kept first"
+    assert "OFFSET" not in str(mock_cursor.execute.call_args_list)
+
+def test_get_random_songs_count_too_large():
+    """Test error when asking for more random songs than one call may return."""
+    with pytest.raises(ValueError, match="Invalid number of songs: 1001"):
+        get_random_songs(1001)
+
+def test_get_random_songs_catalog_too_small(mock_cursor):
+    """Test error when asking for more random songs than the catalog has."""
+
+    mock_cursor.fetchone.return_value = (1,)
+
+    with pytest.raises(ValueError, match="The song catalog only has 1 songs."):
+        get_random_songs(2)
 
 def test_update_play_count(mock_cursor):
     """Test updating the play count of a song."""
@@ -376,7 +840,7 @@ def test_update_play_count(mock_cursor):
 
     # Normalize the expected SQL query
     expected_query = normalize_whitespace("""
-        UPDATE songs SET play_count = play_count + 1 WHERE id = ?
+        UPDATE songs SET play_count = play_count + 1 WHERE id = ? RETURNING play_count
     """)
 
     # Ensure the SQL query was executed correctly
@@ -405,3 +869,68 @@ def test_update_play_count_deleted_song(mock_cursor):
 
     # Ensure that no SQL query for updating play count was executed
     mock_cursor.execute.assert_called_once_with("SELECT deleted FROM songs WHERE id = ?", (1,))
+
+def test_catalog_version_changes_on_writes(mocker):
+    """Test that creating, bulk loading, playing and deleting songs each change the catalog version on a real database."""
+
+    conn = sqlite3.connect(":memory:")
+    with open(os.path.join(os.path.dirname(__file__), "..", "sql", "create_song_table.sql")) as schema:
+        conn.executescript(schema.read())
+
+    @contextmanager
+    def memory_db_connection():
+        yield conn
+
+    mocker.patch("music_collection.models.song_model.get_db_connection", memory_db_connection)
+    mocker.patch("music_collection.models.song_model.record_plays")
+    clear_song_cache()
+
+    versions = [song_model.get_catalog_version()]
+    song_model.create_song(artist="Artist Name", title="Song Title", year=2022, genre="Pop", duration=180)
+    versions.append(song_model.get_catalog_version())
+    create_songs([{"artist": f"Artist {n}", "title": "Song", "year": 2020, "genre": "Rock", "duration": 200} for n in range(3)])
+    versions.append(song_model.get_catalog_version())
+    song_model.update_play_count(1)
+    versions.append(song_model.get_catalog_version())
+    song_model.delete_song(1)
+    versions.append(song_model.get_catalog_version())
+
+    assert len(set(versions)) == 5, "Every write should give a new catalog version."
+    assert versions[2].split("-")[1] == "2", "Expected a bulk load to bump the version once per chunk."
+
+    # A play of a deleted song changes nothing
+    with pytest.raises(ValueError):
+        song_model.update_play_count(1)
+    assert song_model.get_catalog_version() == versions[-1]
+    conn.close()
+
+def test_update_play_counts(mock_cursor):
+    """Test incrementing the play counts of many songs with one executemany and one commit."""
+
+    # Simulate that every song was updated
+    mock_cursor.rowcount = 2
+
+    update_play_counts({1: 3, 2: 1})
+
+    expected_query = normalize_whitespace("""
+        UPDATE songs SET play_count = play_count + ? WHERE id = ? AND deleted = FALSE
+    """)
+    actual_query = normalize_whitespace(mock_cursor.executemany.call_args[0][0])
+    assert actual_query == expected_query, "The SQL query did not match the expected structure."
+
+    actual_arguments = mock_cursor.executemany.call_args[0][1]
+    expected_arguments = [(3, 1), (1, 2)]
+    assert actual_arguments == expected_arguments, f"The SQL query arguments did not match. Expected {expected_arguments}, got {actual_arguments}."
+
+    # The plays are also recorded in the play log, after the commit
+    song_model.record_plays.assert_called_once_with({1: 3, 2: 1})
+
+def test_update_play_counts_deleted_song(mock_cursor):
+    """Test the batch is rolled back when one of the songs is deleted."""
+
+    # Simulate that only one of the two songs was updated, and that song 2 is deleted
+    mock_cursor.rowcount = 1
+    mock_cursor.fetchone.side_effect = [[False], [True]]
+
+    with pytest.raises(ValueError, match="Song with ID 2 has been deleted"):
+        update_play_counts({1: 1, 2: 1})
@@ -0,0 +1,38 @@
+import random
+
+from music_collection.utils.subset_sum import solve_bounded_subset_sum
+
+
+def test_subset_sum_hits_range():
+    """Test the chosen counts add up to a total in range, within the available counts."""
+    counts = {180: 3, 240: 2, 300: 5}
+
+    taken = solve_bounded_subset_sum(counts, 1190, 1210, random.Random(1))
+
+    assert 1190 <= sum(value * count for value, count in taken.items()) <= 1210
+    assert all(count <= counts[value] for value, count in taken.items())
+
+def test_subset_sum_prefers_middle_of_range():
+    """Test the total closest to the middle of the range is chosen."""
+    taken = solve_bounded_subset_sum({100: 10, 7: 1}, 690, 710)
+
+    assert taken == {100: 7}
+
+def test_subset_sum_respects_counts():
+    """Test a value is never taken more often than it is available."""
+    assert solve_bounded_subset_sum({100: 2}, 300, 300) is None
+    assert solve_bounded_subset_sum({100: 3}, 300, 300) == {100: 3}
+
+def test_subset_sum_never_takes_nothing():
+    """Test a window including 0 still picks a positive total when one is in range."""
+    assert solve_bounded_subset_sum({5: 1}, -10, 10) == {5: 1}
+    assert solve_bounded_subset_sum({50: 1}, 0, 10) is None
+
+def test_subset_sum_huge_upper_bound():
+    """Test the table is sized by the items, not by an upper bound far past their total."""
+    assert solve_bounded_subset_sum({100: 2}, 150, 10 ** 12) == {100: 2}
+
+def test_subset_sum_unreachable():
+    """Test None is returned when no total falls in the range."""
+    assert solve_bounded_subset_sum({200: 5, 300: 5}, 450, 480) is None
+    assert solve_bounded_subset_sum({}, 10, 20) is None
@@ -0,0 +1,46 @@
+import pytest
+
+from music_collection.utils.top_k import TopK
+
+
+def test_top_k_keeps_highest_scores():
+    """Test only the k highest scores are kept, highest first."""
+    top = TopK(2, [(1, 5), (2, 3), (3, 4)])
+
+    assert top.items() == [(1, 5), (3, 4)]
+    assert 2 not in top
+
+def test_top_k_update_promotes_key():
+    """Test a key outside the top k replaces the lowest one once its score passes it."""
+    top = TopK(2, [(1, 5), (2, 4)])
+
+    top.update(3, 4)
+    assert top.items() == [(1, 5), (2, 4)], "Expected the tie to go to the lower key."
+
+    top.update(3, 6)
+    assert top.items() == [(3, 6), (1, 5)]
+    assert len(top) == 2
+
+def test_top_k_update_member_many_times():
+    """Test repeated updates of kept keys do not leave stale entries in the result."""
+    top = TopK(2, [(1, 1), (2, 2)])
+
+    for score in range(3, 50):
+        top.update(1, score)
+    top.update(3, 3)
+
+    assert top.items() == [(1, 49), (3, 3)]
+    assert top.items(1) == [(1, 49)]
+
+def test_top_k_ignores_lower_score():
+    """Test a score read before the kept one does not lower it."""
+    top = TopK(2, [(1, 5), (2, 4)])
+
+    top.update(1, 3)
+
+    assert top.items() == [(1, 5), (2, 4)]
+
+def test_top_k_invalid_k():
+    """Test error when k is not positive."""
+    with pytest.raises(ValueError, match="Invalid k: 0"):
+        TopK(0)